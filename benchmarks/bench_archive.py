@@ -0,0 +1,82 @@
+"""Archiving: daily list time against history size, before and after.
+
+    python -m benchmarks.bench_archive --deliveries 2000000 --days 1000 --keep-days 90
+
+Times the latest day's delivery list with the whole history in the live
+table, moves everything older than ``--keep-days`` into the yearly
+archives, and times the same list again along with a patient's history
+read back through the archives.
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import create_sqlite_engine
+from src.database.models import Base, Delivery
+from src.services.delivery_archive import DeliveryArchive
+from src.services.delivery_list import DeliveryListService
+from .synthetic import populate
+
+
+def median_time(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--deliveries", type=int, default=2000000)
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--streets", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=1000)
+    parser.add_argument("--keep-days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(Path(tmp) / "bench.sqlite")
+        Base.metadata.create_all(engine)
+        days = populate(engine, streets=args.streets, patients=args.patients,
+                        deliveries=args.deliveries, days=args.days)
+        service = DeliveryListService(sessionmaker(bind=engine))
+        archive = DeliveryArchive(engine, Path(tmp) / "archive")
+
+        def daily_list():
+            service.generate(days[-1], van_count=4)
+
+        def live_rows():
+            with engine.connect() as connection:
+                return connection.execute(select(func.count()).select_from(Delivery)).scalar()
+
+        before = median_time(daily_list, args.repeat)
+        rows_before = live_rows()
+
+        started = time.perf_counter()
+        result = archive.archive(days[-1] - timedelta(days=args.keep_days))
+        moved_in = time.perf_counter() - started
+
+        after = median_time(daily_list, args.repeat)
+        rows_after = live_rows()
+        history = median_time(lambda: archive.patient_history(1), args.repeat)
+        engine.dispose()
+
+    print(f"daily list with {rows_before} live rows: {before * 1000:7.1f} ms")
+    print(f"archived {result.total} rows into {len(result.moved)} yearly files in {moved_in:.1f}s")
+    print(f"daily list with {rows_after} live rows: {after * 1000:7.1f} ms")
+    print(f"patient history across live table and archives: {history * 1000:7.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Planning a day on ORM objects against the columnar DeliveryDay.
+
+    python -m benchmarks.bench_delivery_day --deliveries 20000
+
+For one day of ``--deliveries`` parcels, loads the day both as
+``Delivery`` objects with their ``patient`` and ``parcel_type`` and as a
+:class:`DeliveryDay`, then times a planning pass on each (list order,
+grouping by van, counting signature parcels) and writing a new van for
+every parcel back. Memory is what the loaded day still holds, measured
+with tracemalloc in a separate load so tracing does not skew the timings.
+"""
+import argparse
+import gc
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from src.database.database import create_sqlite_engine
+from src.database.models import Base, Delivery
+from src.services.delivery_day import DeliveryDayService
+from src.services.delivery_list import house_number_key
+from src.services.street_index import StreetIndex
+from .synthetic import populate
+
+
+def median_time(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def retained_bytes(load):
+    """Bytes still allocated once ``load()`` has returned, with its result alive"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = load()
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0] - before, result
+    finally:
+        tracemalloc.stop()
+
+
+def orm_order(delivery):
+    house = delivery.patient.house_number or "" if delivery.patient else ""
+    return (
+        delivery.van_number is None, delivery.van_number or 0,
+        delivery.route_order is None, delivery.route_order or 0,
+        delivery.patient.street_name or "" if delivery.patient else "",
+        house_number_key(house),
+        house,
+    )
+
+
+def orm_plan(deliveries):
+    vans, signatures = {}, {}
+    for delivery in sorted(deliveries, key=orm_order):
+        vans.setdefault(delivery.van_number, []).append(delivery)
+        if delivery.parcel_type is not None and delivery.parcel_type.requires_signature:
+            signatures[delivery.van_number] = signatures.get(delivery.van_number, 0) + 1
+    return vans, signatures
+
+
+def columnar_plan(day):
+    groups = day.by_van()
+    signatures = {van: int(day.requires_signature[indices].sum()) for van, indices in groups.items()}
+    return [day.entries(indices) for indices in groups.values()], signatures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--deliveries", type=int, default=20000)
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--streets", type=int, default=3000)
+    parser.add_argument("--vans", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    # pandas 2.2 warns about pyarrow on import
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(Path(tmp) / "bench.sqlite")
+        Base.metadata.create_all(engine)
+        days = populate(engine, streets=args.streets, patients=args.patients,
+                        deliveries=args.deliveries, days=1, parcel_types=3)
+        delivery_date = days[0]
+        session_factory = sessionmaker(bind=engine)
+        service = DeliveryDayService(session_factory, StreetIndex(session_factory))
+        service.load(delivery_date)  # warm the street index
+
+        def load_orm():
+            session = session_factory()
+            deliveries = session.scalars(
+                select(Delivery)
+                .options(joinedload(Delivery.patient), joinedload(Delivery.parcel_type))
+                .where(Delivery.delivery_date == delivery_date)
+            ).all()
+            return session, deliveries
+
+        def load_orm_closed():
+            session, deliveries = load_orm()
+            session.close()
+            return deliveries
+
+        orm_bytes, _ = retained_bytes(load_orm)
+        day_bytes, _ = retained_bytes(lambda: service.load(delivery_date))
+
+        orm_load = median_time(load_orm_closed, args.repeat)
+        day_load = median_time(lambda: service.load(delivery_date), args.repeat)
+
+        deliveries = load_orm_closed()
+        day = service.load(delivery_date)
+        orm_planning = median_time(lambda: orm_plan(deliveries), args.repeat)
+        day_planning = median_time(lambda: columnar_plan(day), args.repeat)
+
+        def reset():
+            with engine.begin() as connection:
+                connection.execute(update(Delivery).values(van_number=None, route_order=None))
+
+        def write_orm():
+            session, deliveries = load_orm()
+            try:
+                for position, delivery in enumerate(deliveries):
+                    delivery.van_number = position % args.vans + 1
+                session.commit()
+            finally:
+                session.close()
+
+        def write_columns():
+            day = service.load(delivery_date)
+            day.assign(slice(None), day.ids % args.vans + 1)
+            service.save(day)
+
+        writes = {}
+        for name, write in (("orm", write_orm), ("day", write_columns)):
+            timings = []
+            for _ in range(args.repeat):
+                reset()
+                started = time.perf_counter()
+                write()
+                timings.append(time.perf_counter() - started)
+            writes[name] = statistics.median(timings)
+        engine.dispose()
+
+    print(f"{len(day)} deliveries on {delivery_date}")
+    print(f"{'':>22} {'ORM objects':>12} {'DeliveryDay':>12} {'ratio':>7}")
+    for label, orm_value, day_value in (
+        ("memory held (MB)", orm_bytes / 2**20, day_bytes / 2**20),
+        ("load (ms)", orm_load * 1000, day_load * 1000),
+        ("plan (ms)", orm_planning * 1000, day_planning * 1000),
+        ("load + write all (ms)", writes["orm"] * 1000, writes["day"] * 1000),
+    ):
+        print(f"{label:>22} {orm_value:>12.1f} {day_value:>12.1f} {orm_value / day_value:>6.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
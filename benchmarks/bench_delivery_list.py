@@ -0,0 +1,60 @@
+"""Daily delivery-list generation against a target time.
+
+Builds a synthetic day of deliveries and fails (exit status 1) if the
+median time to generate the list exceeds the target:
+
+    python -m benchmarks.bench_delivery_list --deliveries 20000 --target 1.0
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import create_sqlite_engine
+from src.database.models import Base
+from src.services.delivery_list import DeliveryListService
+from .synthetic import populate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--deliveries", type=int, default=20000)
+    parser.add_argument("--patients", type=int, default=50000)
+    parser.add_argument("--streets", type=int, default=2000)
+    parser.add_argument("--history-days", type=int, default=30,
+                        help="days of deliveries in the table; one of them is listed")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--target", type=float, default=1.0, help="seconds")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(Path(tmp) / "bench.sqlite")
+        Base.metadata.create_all(engine)
+        days = populate(engine, streets=args.streets, patients=args.patients,
+                        deliveries=args.deliveries * args.history_days,
+                        days=args.history_days)
+        service = DeliveryListService(sessionmaker(bind=engine))
+        day = days[len(days) // 2]
+
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            rows = service.generate(day, van_count=4)
+            timings.append(time.perf_counter() - started)
+        engine.dispose()
+
+    median = statistics.median(timings)
+    print(f"{len(rows)} deliveries listed in {median * 1000:.1f} ms "
+          f"(median of {args.repeat}, target {args.target * 1000:.0f} ms)")
+    if median > args.target:
+        print("FAIL: delivery list generation is slower than the target")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Delivery sheet and label rendering throughput by worker count.
+
+    python -m benchmarks.bench_delivery_sheets --deliveries 20000 --vans 4
+
+Renders one synthetic day with 1, 2, 4 ... workers up to the core count
+and reports pages/sec. Work is split one van per worker, so scaling stops
+at the number of vans.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import create_sqlite_engine
+from src.database.models import Base, ParcelType
+from src.services.delivery_list import DeliveryListService
+from src.services.delivery_sheets import DeliverySheetRenderer
+from .synthetic import populate
+
+PARCEL_TYPES = [
+    {"id": 1, "code": "STD", "description": "Standard", "requires_signature": False},
+    {"id": 2, "code": "CD", "description": "Controlled drug", "requires_signature": True},
+    {"id": 3, "code": "FRG", "description": "Fridge", "requires_signature": False},
+]
+
+
+def worker_counts(limit):
+    counts, count = [], 1
+    while count < limit:
+        counts.append(count)
+        count *= 2
+    return counts + [limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--deliveries", type=int, default=20000)
+    parser.add_argument("--patients", type=int, default=50000)
+    parser.add_argument("--streets", type=int, default=2000)
+    parser.add_argument("--vans", type=int, choices=[3, 4], default=4)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(Path(tmp) / "bench.sqlite")
+        Base.metadata.create_all(engine)
+        days = populate(engine, streets=args.streets, patients=args.patients,
+                        deliveries=args.deliveries, days=1)
+        with engine.begin() as connection:
+            connection.execute(insert(ParcelType), PARCEL_TYPES)
+            connection.execute(text("UPDATE deliveries SET parcel_type_id = id % 3 + 1"))
+        service = DeliveryListService(sessionmaker(bind=engine))
+
+        print(f"{'workers':>7} {'pages':>6} {'seconds':>8} {'pages/s':>8} {'speed-up':>8}")
+        baseline = None
+        for workers in worker_counts(args.max_workers):
+            with DeliverySheetRenderer(service, max_workers=workers) as renderer:
+                # The first run starts the pool; time a second, warm run
+                renderer.render_day(days[0], Path(tmp) / "warm", van_count=args.vans)
+                result = renderer.render_day(days[0], Path(tmp) / "out", van_count=args.vans)
+            baseline = baseline or result.pages_per_sec
+            print(f"{workers:>7} {result.pages:>6} {result.elapsed:>8.2f} "
+                  f"{result.pages_per_sec:>8.1f} {result.pages_per_sec / baseline:>7.2f}x")
+
+        merged = result.merged_path
+        print(f"{result.deliveries} parcels on {len(result.vans)} vans; merged file: "
+              f"{merged.name if merged else 'not written (pypdf not installed)'}")
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
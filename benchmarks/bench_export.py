@@ -0,0 +1,75 @@
+"""Delivery history export: rows/sec and peak memory.
+
+    python -m benchmarks.bench_export --deliveries 1000000 --days 250 --format csv
+
+Each export runs in a fresh process so its peak RSS is its own. One day
+is exported first as the baseline, then the whole history; the run fails
+(exit status 1) if the full export's peak RSS grows more than the
+tolerance over the single day's, i.e. if memory is not flat.
+"""
+import argparse
+import multiprocessing
+import resource
+import sys
+import tempfile
+from pathlib import Path
+
+from src.database.database import create_sqlite_engine
+from src.database.models import Base
+from .synthetic import populate
+
+
+def run_export(db_path, output, start_date, end_date):
+    """Export in this process and return (rows, seconds, peak RSS in MB)"""
+    from sqlalchemy.orm import sessionmaker
+    from src.services.delivery_export import DeliveryExporter
+    from src.services.delivery_list import DeliveryListService
+
+    engine = create_sqlite_engine(db_path)
+    exporter = DeliveryExporter(DeliveryListService(sessionmaker(bind=engine)))
+    result = exporter.export(output, start_date, end_date)
+    engine.dispose()
+    # ru_maxrss is in KiB on Linux
+    return result.rows, result.elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--deliveries", type=int, default=1000000)
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--streets", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=250)
+    parser.add_argument("--format", choices=["csv", "xlsx"], default="csv")
+    parser.add_argument("--rss-tolerance", type=float, default=50.0,
+                        help="MB the full export may use over a single day's")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.sqlite"
+        engine = create_sqlite_engine(db_path)
+        Base.metadata.create_all(engine)
+        days = populate(engine, streets=args.streets, patients=args.patients,
+                        deliveries=args.deliveries, days=args.days)
+        engine.dispose()
+
+        context = multiprocessing.get_context("spawn")
+        results = {}
+        for label, start, end in [("one day", days[0], days[0]), ("all days", days[0], days[-1])]:
+            output = Path(tmp) / f"export-{len(results)}.{args.format}"
+            with context.Pool(1) as pool:
+                results[label] = pool.apply(run_export, (db_path, output, start, end))
+
+    for label, (rows, seconds, rss) in results.items():
+        print(f"{label:<9} {rows:>9} rows in {seconds:7.2f}s "
+              f"({rows / seconds if seconds else 0:9.0f} rows/s), peak RSS {rss:6.1f} MB")
+
+    growth = results["all days"][2] - results["one day"][2]
+    if growth > args.rss_tolerance:
+        print(f"FAIL: peak RSS grew by {growth:.1f} MB exporting the whole history "
+              f"(tolerance {args.rss_tolerance:.0f} MB)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
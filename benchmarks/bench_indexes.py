@@ -0,0 +1,126 @@
+"""Query plans and timings for the delivery-list hot queries, before and
+after the indexes declared in ``src/database/models.py``.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_indexes --deliveries 1000000
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+from src.database.models import Base
+from .synthetic import populate
+
+QUERIES = {
+    "daily list": (
+        "SELECT d.id, d.van_number, p.house_number, p.street_name, s.route_order "
+        "FROM deliveries d JOIN patients p ON p.patient_id = d.patient_id "
+        "LEFT JOIN streets s ON s.road_name = p.street_name AND s.town = p.town "
+        "WHERE d.delivery_date = :day ORDER BY d.van_number, s.route_order"
+    ),
+    "van list": (
+        "SELECT d.id FROM deliveries d WHERE d.delivery_date = :day AND d.van_number = :van"
+    ),
+    "patient history": (
+        "SELECT d.id, d.delivery_date FROM deliveries d WHERE d.patient_id = :patient "
+        "ORDER BY d.delivery_date DESC"
+    ),
+    "pending since": (
+        "SELECT COUNT(*) FROM deliveries d WHERE d.status = 'pending' AND d.delivery_date >= :day"
+    ),
+    "street lookup": (
+        "SELECT id, route_order FROM streets WHERE road_name = :road AND town = :town"
+    ),
+    "patients on street": (
+        "SELECT patient_id FROM patients WHERE street_name = :road AND town = :town"
+    ),
+}
+
+
+def query_params(connection, days):
+    street = connection.execute(text("SELECT road_name, town FROM streets LIMIT 1 OFFSET 7")).one()
+    return {
+        "day": days[len(days) // 2].isoformat(),
+        "van": 1,
+        "patient": 4242,
+        "road": street.road_name,
+        "town": street.town,
+    }
+
+
+def measure(connection, params, repeat):
+    results = {}
+    for name, sql in QUERIES.items():
+        plan = [row[-1] for row in connection.execute(text("EXPLAIN QUERY PLAN " + sql), params)]
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            connection.execute(text(sql), params).all()
+            timings.append(time.perf_counter() - started)
+        results[name] = (statistics.median(timings), plan)
+    return results
+
+
+def drop_declared_indexes(connection):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.drop(connection)
+
+
+def create_declared_indexes(connection):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection)
+    connection.exec_driver_sql("ANALYZE")
+
+
+def print_results(label, results):
+    print(f"\n== {label}")
+    for name, (elapsed, plan) in results.items():
+        print(f"{name:<20} {elapsed * 1000:9.2f} ms")
+        for step in plan:
+            print(f"{'':<22}{step}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--deliveries", type=int, default=1000000)
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--streets", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.sqlite'}")
+        Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            drop_declared_indexes(connection)
+
+        started = time.perf_counter()
+        days = populate(engine, streets=args.streets, patients=args.patients,
+                        deliveries=args.deliveries)
+        print(f"populated {args.deliveries} deliveries in {time.perf_counter() - started:.1f}s")
+
+        with engine.connect() as connection:
+            params = query_params(connection, days)
+            before = measure(connection, params, args.repeat)
+        with engine.begin() as connection:
+            create_declared_indexes(connection)
+        with engine.connect() as connection:
+            after = measure(connection, params, args.repeat)
+        engine.dispose()
+
+    print_results("without indexes", before)
+    print_results("with declared indexes", after)
+    print("\nspeed-up")
+    for name in QUERIES:
+        print(f"{name:<20} {before[name][0] / max(after[name][0], 1e-9):9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
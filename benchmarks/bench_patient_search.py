@@ -0,0 +1,60 @@
+"""Type-ahead patient search latency.
+
+    python -m benchmarks.bench_patient_search --patients 500000 --target 0.05
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from src.database.database import create_sqlite_engine
+from src.database.models import Base
+from src.services.patient_search import PatientSearch
+from .synthetic import populate
+
+QUERIES = ["123456", "42", "mill 12", "church lane", "ashford", "south 14 road", "4242 bex"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=500000)
+    parser.add_argument("--streets", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--target", type=float, default=0.05,
+                        help="seconds allowed for the slowest query's median")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(Path(tmp) / "bench.sqlite")
+        Base.metadata.create_all(engine)
+        populate(engine, streets=args.streets, patients=args.patients, deliveries=0, days=1)
+        search = PatientSearch(engine)
+
+        started = time.perf_counter()
+        search.ensure_index()
+        print(f"indexed {args.patients} patients in {time.perf_counter() - started:.1f}s")
+
+        medians = {}
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                search.search(query, limit=20)
+                timings.append(time.perf_counter() - started)
+            medians[query] = statistics.median(timings)
+        engine.dispose()
+
+    for query, median in medians.items():
+        print(f"{query!r:<18} {median * 1000:7.2f} ms")
+    slowest = max(medians.values())
+    if slowest > args.target:
+        print(f"FAIL: slowest search took {slowest * 1000:.1f} ms "
+              f"(target {args.target * 1000:.0f} ms)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""Cold start: import cost, time to first window and the schema check.
+
+    python -m benchmarks.bench_startup --repeat 5 --target 1.0
+
+Each run starts a fresh interpreter. Import times come from
+``python -X importtime``; the window is created on the offscreen Qt
+platform so the benchmark also runs without a display.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that should not be loaded before the main window is shown.
+# numpy is left out: PySide6 imports it itself when it is installed.
+HEAVY_MODULES = ["sqlalchemy", "openpyxl", "pandas", "reportlab"]
+
+WINDOW_SCRIPT = """
+import sys, time
+from PySide6.QtWidgets import QApplication
+from main import MainWindow
+app = QApplication(sys.argv)
+window = MainWindow()
+window.show()
+app.processEvents()
+shown = time.perf_counter()
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(shown, ",".join(heavy))
+"""
+
+
+def child_env():
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return env
+
+
+def import_times():
+    """Return the total for ``import main`` and ``{module: us}`` for its direct imports"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True
+    )
+    total, direct, children = 0, {}, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nesting is two spaces per level; children are listed before their parent
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children[name.strip()] = int(cumulative)
+        elif depth == 0:
+            if name.strip() == "main":
+                total, direct = int(cumulative), children
+            children = {}
+    return total, direct
+
+
+def time_to_window():
+    """Seconds from process start to a shown main window, and heavy modules loaded"""
+    script = WINDOW_SCRIPT.format(heavy=HEAVY_MODULES)
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True
+    )
+    # perf_counter is system-wide on Linux, so the child's clock is comparable
+    parts = result.stdout.strip().split(" ", 1)
+    shown = float(parts[0])
+    heavy = parts[1] if len(parts) > 1 else ""
+    return shown - started, [name for name in heavy.split(",") if name]
+
+
+def schema_check_times(repeat):
+    """Median seconds for create_all and for the version stamp on a ready database"""
+    from sqlalchemy import create_engine
+    from src.database.models import Base
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'startup.sqlite'}")
+        Base.metadata.create_all(engine)
+
+        create_all, stamp = [], []
+        for _ in range(repeat):
+            engine.dispose()
+            started = time.perf_counter()
+            Base.metadata.create_all(engine)
+            create_all.append(time.perf_counter() - started)
+
+            engine.dispose()
+            started = time.perf_counter()
+            with engine.connect() as connection:
+                connection.exec_driver_sql("PRAGMA user_version").scalar()
+            stamp.append(time.perf_counter() - started)
+        engine.dispose()
+    return statistics.median(create_all), statistics.median(stamp)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="heaviest imports to list")
+    parser.add_argument("--target", type=float, default=1.0,
+                        help="seconds allowed for the median time to first window")
+    args = parser.parse_args(argv)
+
+    total, imports = import_times()
+    print(f"import main: {total / 1000:.1f} ms")
+    for name, cumulative in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<32} {cumulative / 1000:8.1f} ms")
+
+    timings, heavy = [], set()
+    for _ in range(args.repeat):
+        elapsed, loaded = time_to_window()
+        timings.append(elapsed)
+        heavy.update(loaded)
+    window = statistics.median(timings)
+    print(f"time to first window: {window * 1000:.0f} ms (median of {args.repeat})")
+    if heavy:
+        print(f"loaded before the window was shown: {', '.join(sorted(heavy))}")
+
+    create_all, stamp = schema_check_times(args.repeat)
+    print(f"schema check: create_all {create_all * 1000:.2f} ms, "
+          f"user_version {stamp * 1000:.2f} ms")
+
+    if window > args.target:
+        print(f"FAIL: first window took {window * 1000:.0f} ms "
+              f"(target {args.target * 1000:.0f} ms)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Sync server: cold and cached reads from several dispatchers.
+
+    python -m benchmarks.bench_sync --scale 100k --clients 4
+
+Starts ``src.sync.server`` as a separate local process on a synthetic
+database, then has each client thread read every patient and the day's
+delivery list twice: once cold and once revalidating with ETags, where
+unchanged pages come back as 304 with no body.
+"""
+import argparse
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from src.database.database import create_sqlite_engine
+from src.database.models import Base
+from src.sync.client import SyncClient
+from .synthetic import SCALES, populate
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_listening(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"sync server did not start on port {port}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="100k")
+    parser.add_argument("--clients", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.sqlite"
+        engine = create_sqlite_engine(db_path)
+        Base.metadata.create_all(engine)
+        days = populate(engine, **SCALES[args.scale])
+        engine.dispose()
+
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "src.sync.server", "--db", str(db_path), "--port", str(port)],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_listening(port)
+            results = [None] * args.clients
+
+            def dispatcher(index):
+                with SyncClient(f"http://127.0.0.1:{port}", timeout=60) as client:
+                    timings = []
+                    for _ in range(2):
+                        received = client.bytes_received
+                        started = time.perf_counter()
+                        patients = client.rows("patients")
+                        client.delivery_list(days[-1], van_count=4)
+                        timings.append((time.perf_counter() - started, client.bytes_received - received))
+                    results[index] = (len(patients), timings, client.not_modified)
+
+            threads = [threading.Thread(target=dispatcher, args=(index,)) for index in range(args.clients)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            wall = time.perf_counter() - started
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{'client':>6} {'rows':>8} {'cold s':>7} {'cold KB':>8} {'warm s':>7} {'warm KB':>8} {'304s':>5}")
+    for index, (rows, ((cold, cold_bytes), (warm, warm_bytes)), not_modified) in enumerate(results):
+        print(f"{index:>6} {rows:>8} {cold:>7.2f} {cold_bytes / 1024:>8.0f} "
+              f"{warm:>7.2f} {warm_bytes / 1024:>8.0f} {not_modified:>5}")
+    print(f"{args.clients} dispatchers finished in {wall:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Van-load balancing for one day against a target time.
+
+    python -m benchmarks.bench_van_balance --deliveries 50000 --vans 20 --target 1.0
+
+Every repetition clears the day's assignments first, so each run writes
+all of its rows back. A final run over an already balanced day shows the
+cost when nothing changes.
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import warnings
+from pathlib import Path
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import create_sqlite_engine
+from src.database.models import Base, Delivery, Vehicle
+from src.services.street_index import StreetIndex
+from src.services.van_balancer import VanBalancer
+from .synthetic import populate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--deliveries", type=int, default=50000)
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--streets", type=int, default=3000)
+    parser.add_argument("--vans", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--target", type=float, default=1.0, help="seconds")
+    args = parser.parse_args(argv)
+    # pandas 2.2 warns about pyarrow on import
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(Path(tmp) / "bench.sqlite")
+        Base.metadata.create_all(engine)
+        days = populate(engine, streets=args.streets, patients=args.patients,
+                        deliveries=args.deliveries, days=1)
+        with engine.begin() as connection:
+            connection.execute(insert(Vehicle), [
+                {"registration": f"VAN {number:03d}", "active": True}
+                for number in range(1, args.vans + 1)
+            ])
+        session_factory = sessionmaker(bind=engine)
+        balancer = VanBalancer(session_factory, StreetIndex(session_factory))
+
+        runs = []
+        for _ in range(args.repeat):
+            with engine.begin() as connection:
+                connection.execute(update(Delivery).values(van_number=None, route_order=None))
+            runs.append(balancer.balance(days[0]))
+        unchanged = balancer.balance(days[0])
+        engine.dispose()
+
+    def median(field):
+        return statistics.median(getattr(run, field) for run in runs) * 1000
+
+    result = runs[-1]
+    loads = list(result.parcels.values())
+    print(f"{result.deliveries} deliveries over {len(loads)} vans: "
+          f"{min(loads)}-{max(loads)} parcels per van")
+    print(f"load {median('load_time'):.0f} ms, balance {median('compute_time'):.0f} ms, "
+          f"write {median('write_time'):.0f} ms, total {median('elapsed'):.0f} ms "
+          f"(median of {args.repeat})")
+    print(f"re-run with nothing to change: {unchanged.elapsed * 1000:.0f} ms, "
+          f"{unchanged.updated} rows written")
+
+    if median("elapsed") / 1000 > args.target:
+        print(f"FAIL: balancing took longer than {args.target * 1000:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""Benchmark suite over a synthetic dataset, checked against a baseline.
+
+    python -m benchmarks.suite --scale 10k --output results.json
+    python -m benchmarks.suite --scale 100k --update-baseline
+
+Generates a deterministic dataset at the chosen scale (see
+``synthetic.SCALES``) and times patient import, delivery-list generation,
+patient lookup, settings reads, the dashboard's daily figures and a CSV
+export of the whole history. Each case's median is written to
+``--output`` as JSON. The run fails (exit status 1) if any case is
+slower than the stored baseline for the same scale by more than
+``--tolerance``.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import create_sqlite_engine, db_manager
+from src.database.delivery_counts import DeliveryCounts
+from src.database.models import Base
+from src.import_service.importer import StreamingImporter
+from src.services.delivery_export import DeliveryExporter
+from src.services.delivery_list import DeliveryListService
+from src.services.patient_search import PatientSearch
+from src.services.settings_manager import SettingsCache, SettingsManager
+from .synthetic import SCALES, populate, write_patients_csv
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+LOOKUPS = ["4242", "42", "mill 12", "church lane", "ashford", "south 14 road", "1234 bex"]
+SYSTEM_SETTINGS = {"archive_keep_days": "365", "default_van_count": "4", "depot_postcode": "DA1 1AA"}
+
+
+def timed(fn, repeat):
+    """Run ``fn`` ``repeat`` times; return (median seconds, runs, last result)"""
+    runs, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs), runs, result
+
+
+class Suite:
+    def __init__(self, tmp, scale, repeat, seed=0):
+        self.tmp = Path(tmp)
+        self.sizes = SCALES[scale]
+        self.repeat = repeat
+        self.seed = seed
+        self.engine = create_sqlite_engine(self.tmp / "bench.sqlite")
+        Base.metadata.create_all(self.engine)
+        started = time.perf_counter()
+        self.days = populate(self.engine, seed=seed, **self.sizes)
+        self.populate_seconds = time.perf_counter() - started
+        self.session_factory = sessionmaker(bind=self.engine)
+
+    def close(self):
+        self.engine.dispose()
+
+    def case_import(self):
+        """Patients CSV into an empty database, one fresh file per run"""
+        source = write_patients_csv(self.tmp / "patients.csv", self.sizes["patients"],
+                                    self.sizes["streets"], self.seed)
+        runs = []
+
+        def run():
+            engine = create_sqlite_engine(self.tmp / f"import-{len(runs)}.sqlite")
+            Base.metadata.create_all(engine)
+            try:
+                importer = StreamingImporter(sessionmaker(bind=engine), resume=False)
+                started = time.perf_counter()
+                result = importer.import_file(source, "patients")
+                runs.append(time.perf_counter() - started)
+                return result.rows_written
+            finally:
+                engine.dispose()
+
+        _, _, rows = timed(run, self.repeat)
+        return statistics.median(runs), runs, rows
+
+    def case_delivery_list(self):
+        """The busiest day's list for four vans"""
+        service = DeliveryListService(self.session_factory)
+        seconds, runs, rows = timed(lambda: service.generate(self.days[-1], van_count=4), self.repeat)
+        return seconds, runs, len(rows)
+
+    def case_patient_lookup(self):
+        """Every query in LOOKUPS once per run"""
+        search = PatientSearch(self.engine)
+        search.ensure_index()
+        seconds, runs, found = timed(
+            lambda: sum(len(search.search(query, limit=20)) for query in LOOKUPS), self.repeat)
+        return seconds, runs, found
+
+    def case_settings_reads(self):
+        """Vehicles, drivers, parcel types and system settings from a cold cache"""
+        db_manager.use_engine(self.engine)
+        cache = SettingsCache()
+        manager = SettingsManager(cache)
+        with manager.batch():
+            for key, value in SYSTEM_SETTINGS.items():
+                manager.set_system_setting(key, value)
+
+        def run():
+            cache.invalidate()
+            return (len(manager.get_active_vehicles()) + len(manager.get_active_drivers())
+                    + len(manager.get_parcel_types()) + len(manager.get_system_settings()))
+
+        return timed(run, self.repeat)
+
+    def case_dashboard(self):
+        """The busiest day's figures from the daily counts"""
+        counts = DeliveryCounts(self.engine)
+        seconds, runs, summary = timed(lambda: counts.summary(self.days[-1], van_count=4), self.repeat)
+        return seconds, runs, summary.total
+
+    def case_export(self):
+        """The whole delivery history to CSV"""
+        exporter = DeliveryExporter(DeliveryListService(self.session_factory))
+        output = self.tmp / "export.csv"
+        seconds, runs, result = timed(
+            lambda: exporter.export(output, self.days[0], self.days[-1], van_count=4), self.repeat)
+        return seconds, runs, result.rows
+
+
+CASES = {
+    "import": Suite.case_import,
+    "delivery_list": Suite.case_delivery_list,
+    "patient_lookup": Suite.case_patient_lookup,
+    "settings_reads": Suite.case_settings_reads,
+    "dashboard": Suite.case_dashboard,
+    "export": Suite.case_export,
+}
+
+
+def compare(results, baseline, tolerance, slack):
+    """Return (case, seconds, baseline seconds) for every regression
+
+    ``slack`` seconds are allowed on top of the tolerance so that timer
+    noise on millisecond cases is not reported as a regression.
+    """
+    regressions = []
+    for case, result in results.items():
+        expected = baseline.get(case)
+        if expected is not None and result["seconds"] > expected * (1 + tolerance) + slack:
+            regressions.append((case, result["seconds"], expected))
+    return regressions
+
+
+def load_baseline(path):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results here as JSON")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="fraction a case may exceed its baseline by")
+    parser.add_argument("--slack", type=float, default=0.005,
+                        help="seconds allowed over the tolerance for very short cases")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store these results as the baseline for the scale")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        suite = Suite(tmp, args.scale, args.repeat, args.seed)
+        print(f"populated {args.scale} in {suite.populate_seconds:.1f}s")
+        try:
+            for case in args.cases:
+                seconds, runs, rows = CASES[case](suite)
+                results[case] = {"seconds": seconds, "runs": runs, "rows": rows}
+                print(f"{case:<15} {seconds * 1000:10.1f} ms  ({rows} rows)")
+        finally:
+            suite.close()
+
+    report = {
+        "scale": args.scale,
+        "sizes": SCALES[args.scale],
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+    baselines = load_baseline(args.baseline)
+    if args.update_baseline:
+        stored = baselines.setdefault(args.scale, {})
+        stored.update({case: round(result["seconds"], 4) for case, result in results.items()})
+        with open(args.baseline, "w", encoding="utf-8") as handle:
+            json.dump(baselines, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        print(f"baseline for {args.scale} written to {args.baseline}")
+        return 0
+
+    baseline = baselines.get(args.scale)
+    if not baseline:
+        print(f"no baseline for {args.scale} in {args.baseline}; nothing to compare")
+        return 0
+    regressions = compare(results, baseline, args.tolerance, args.slack)
+    for case, seconds, expected in regressions:
+        print(f"FAIL: {case} took {seconds * 1000:.1f} ms against a baseline of "
+              f"{expected * 1000:.1f} ms (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""Deterministic synthetic data for benchmarks.
+
+The same ``seed`` and sizes always produce the same rows, so timings from
+different runs and machines compare like for like.
+"""
+import random
+from datetime import date, timedelta
+
+import csv
+
+from sqlalchemy import insert, update
+
+from src.database.models import Patient, Street, Delivery, Vehicle, Driver, ParcelType
+
+TOWNS = ["Ashford", "Bexley", "Crayford", "Dartford", "Erith", "Foots Cray", "Greenhithe", "Hextable"]
+ROAD_SUFFIXES = ["Road", "Street", "Avenue", "Lane", "Close", "Drive", "Gardens", "Way"]
+STATUSES = ["pending", "pending", "pending", "out_for_delivery", "delivered", "delivered", "failed"]
+START_DATE = date(2025, 1, 6)
+INSERT_CHUNK = 20000
+FIRST_NAMES = ["Amir", "Beth", "Chidi", "Dana", "Eilidh", "Femi", "Grace", "Hamza", "Ines", "Jon"]
+SURNAMES = ["Ahmed", "Brown", "Clarke", "Davies", "Evans", "Fraser", "Green", "Hughes", "Iqbal", "Jones"]
+PARCEL_TYPES = [
+    ("STD", "Standard", False),
+    ("CD", "Controlled drug", True),
+    ("FRG", "Fridge", False),
+    ("BLK", "Bulky", False),
+    ("SIG", "Signed for", True),
+]
+
+# Named sizes for the benchmark suite: keyword arguments for populate()
+SCALES = {
+    "10k": dict(streets=300, patients=10000, deliveries=10000, days=25,
+                vehicles=4, drivers=6, parcel_types=3),
+    "100k": dict(streets=1000, patients=100000, deliveries=100000, days=50,
+                 vehicles=8, drivers=12, parcel_types=3),
+    "1m": dict(streets=3000, patients=1000000, deliveries=1000000, days=250,
+               vehicles=20, drivers=30, parcel_types=5),
+}
+
+
+def generate_streets(count, seed=1):
+    rng = random.Random(seed)
+    for index in range(count):
+        yield {
+            "id": index + 1,
+            "road_name": f"{rng.choice(['North', 'South', 'Mill', 'Church', 'Park', 'Station'])} "
+                         f"{index} {rng.choice(ROAD_SUFFIXES)}",
+            "town": TOWNS[index % len(TOWNS)],
+            "route_order": index + 1,
+            "van_3_assignment": index * 3 // count + 1,
+            "van_4_assignment": index * 4 // count + 1,
+        }
+
+
+def generate_patients(count, streets, seed=2):
+    """``streets`` is the list of street dicts the patients live on"""
+    rng = random.Random(seed)
+    for patient_id in range(1, count + 1):
+        street = streets[rng.randrange(len(streets))]
+        yield {
+            "patient_id": patient_id,
+            "house_number": str(rng.randint(1, 250)),
+            "street_name": street["road_name"],
+            "town": street["town"],
+            "exemption_category": rng.choice("ABCDE"),
+        }
+
+
+def generate_deliveries(count, patient_count, days, seed=3, start=START_DATE):
+    rng = random.Random(seed)
+    for delivery_id in range(1, count + 1):
+        yield {
+            "id": delivery_id,
+            "patient_id": rng.randint(1, patient_count),
+            "delivery_date": start + timedelta(days=(delivery_id - 1) % days),
+            "van_number": None,
+            "route_order": None,
+            "notes": None,
+            "status": rng.choice(STATUSES),
+            "parcel_type_id": None,
+        }
+
+
+def generate_vehicles(count, seed=4):
+    rng = random.Random(seed)
+    for vehicle_id in range(1, count + 1):
+        letters = "".join(rng.choice("ABCDEFGHJKLMNPRSTVWXY") for _ in range(3))
+        yield {
+            "id": vehicle_id,
+            "registration": f"BX{vehicle_id:02d} {letters}",
+            "active": vehicle_id % 10 != 0,
+        }
+
+
+def generate_drivers(count, seed=5):
+    rng = random.Random(seed)
+    for driver_id in range(1, count + 1):
+        yield {
+            "id": driver_id,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)} {driver_id}",
+            "active": driver_id % 10 != 0,
+        }
+
+
+def generate_parcel_types(count):
+    for index in range(count):
+        code, description, requires_signature = PARCEL_TYPES[index % len(PARCEL_TYPES)]
+        if index >= len(PARCEL_TYPES):
+            code = f"{code}{index}"
+        yield {"id": index + 1, "code": code, "description": description,
+               "requires_signature": requires_signature}
+
+
+def write_patients_csv(path, count, streets=300, seed=0):
+    """Write ``count`` patients as an import file and return ``path``
+
+    The rows are the ones :func:`populate` would insert for the same seed.
+    """
+    street_rows = list(generate_streets(streets, seed + 1))
+    columns = ["patient_id", "house_number", "street_name", "town", "exemption_category"]
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(columns)
+        for patient in generate_patients(count, street_rows, seed + 2):
+            writer.writerow([patient[column] for column in columns])
+    return path
+
+
+def _insert_chunked(connection, table, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= INSERT_CHUNK:
+            connection.execute(insert(table), chunk)
+            chunk = []
+    if chunk:
+        connection.execute(insert(table), chunk)
+
+
+def populate(engine, streets=2000, patients=100000, deliveries=1000000, days=250,
+             vehicles=0, drivers=0, parcel_types=0, seed=0):
+    """Fill an empty database and return the list of delivery dates used
+
+    With ``parcel_types`` set, deliveries cycle through the types by id;
+    otherwise they have none.
+    """
+    street_rows = list(generate_streets(streets, seed + 1))
+    with engine.begin() as connection:
+        _insert_chunked(connection, Street.__table__, street_rows)
+        _insert_chunked(connection, Patient.__table__,
+                        generate_patients(patients, street_rows, seed + 2))
+        _insert_chunked(connection, Delivery.__table__,
+                        generate_deliveries(deliveries, patients, days, seed + 3))
+        _insert_chunked(connection, Vehicle.__table__, generate_vehicles(vehicles, seed + 4))
+        _insert_chunked(connection, Driver.__table__, generate_drivers(drivers, seed + 5))
+        if parcel_types:
+            _insert_chunked(connection, ParcelType.__table__, generate_parcel_types(parcel_types))
+            connection.execute(
+                update(Delivery.__table__)
+                .values(parcel_type_id=Delivery.__table__.c.id % parcel_types + 1)
+            )
+    return [START_DATE + timedelta(days=offset) for offset in range(days)]
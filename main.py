@@ -1,13 +1,34 @@
 import sys
+from PySide6.QtCore import QTimer
 from PySide6.QtWidgets import QApplication
-from src.database.database import db_manager
 from src.ui.main_window import MainWindow
+from src.ui.workers import get_task_runner
+
+def open_database():
+    """Check the schema and start taking reporting snapshots if configured"""
+    # Imported here so SQLAlchemy loads after the window is on screen
+    from src.database.database import db_manager
+    from src.database.snapshot import INTERVAL_SETTING
+    from src.services.settings_manager import SettingsManager
+    
+    db_manager.ensure_schema()
+    minutes = float(SettingsManager().get_system_setting(INTERVAL_SETTING, 0) or 0)
+    if minutes > 0:
+        db_manager.schedule_snapshots(
+            minutes * 60,
+            on_error=lambda e: print(f"Snapshot failed: {e}", file=sys.stderr)
+        )
+
+def prepare_database(on_ready=None):
+    """Open the database off the GUI thread, then call ``on_ready``"""
+    get_task_runner().submit(
+        open_database,
+        on_result=on_ready,
+        on_error=lambda e: print(f"Database setup failed: {e}", file=sys.stderr)
+    )
 
 def main():
     """Main application entry point"""
-    # Initialize database
-    db_manager  # This triggers table creation
-    
     # Create application
     app = QApplication(sys.argv)
     
@@ -15,6 +36,9 @@ def main():
     main_window = MainWindow()
     main_window.show()
     
+    # Warm up the database once the event loop is running
+    QTimer.singleShot(0, lambda: prepare_database(main_window.on_database_ready))
+    
     # Run application
     sys.exit(app.exec())
 
@@ -0,0 +1,52 @@
+"""Indexes for the delivery-list hot queries
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+Databases created by ``Base.metadata.create_all`` after this change already
+have these indexes, so every index is created with ``if_not_exists``.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT road_name, town FROM streets "
+        "GROUP BY road_name, town HAVING COUNT(*) > 1 LIMIT 5"
+    )).all()
+    if duplicates:
+        raise RuntimeError(
+            "Streets must be unique on (road_name, town) before this migration "
+            f"can run; duplicates include {duplicates}"
+        )
+
+    op.create_index('ix_deliveries_delivery_date_van_number', 'deliveries',
+                    ['delivery_date', 'van_number'], if_not_exists=True)
+    op.create_index('ix_deliveries_patient_id_delivery_date', 'deliveries',
+                    ['patient_id', 'delivery_date'], if_not_exists=True)
+    op.create_index('ix_deliveries_status_delivery_date', 'deliveries',
+                    ['status', 'delivery_date'], if_not_exists=True)
+    op.create_index('uq_streets_road_name_town', 'streets',
+                    ['road_name', 'town'], unique=True, if_not_exists=True)
+    op.create_index('ix_patients_street_name_town', 'patients',
+                    ['street_name', 'town'], if_not_exists=True)
+    op.execute('ANALYZE')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_patients_street_name_town', table_name='patients')
+    op.drop_index('uq_streets_road_name_town', table_name='streets')
+    op.drop_index('ix_deliveries_status_delivery_date', table_name='deliveries')
+    op.drop_index('ix_deliveries_patient_id_delivery_date', table_name='deliveries')
+    op.drop_index('ix_deliveries_delivery_date_van_number', table_name='deliveries')
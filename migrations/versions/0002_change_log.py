@@ -0,0 +1,50 @@
+"""Change log table and the triggers that fill it
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 18:00:00.000000
+
+The triggers are the ones ``create_all`` installs (see
+``src/database/change_log.py``) and are created with ``IF NOT EXISTS``,
+so databases that already have the table are left as they are.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.database.change_log import TRACKED, trigger_ddl
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases created by create_all after this change already have it
+    if sa.inspect(op.get_bind()).has_table('change_log'):
+        for ddl in trigger_ddl():
+            op.execute(ddl)
+        return
+    op.create_table(
+        'change_log',
+        sa.Column('version', sa.Integer(), primary_key=True),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('operation', sa.String(), nullable=False),
+        sa.Column('changed_at', sa.DateTime()),
+        sqlite_autoincrement=True,
+    )
+    for ddl in trigger_ddl():
+        op.execute(ddl)
+
+
+def downgrade() -> None:
+    for model in TRACKED.values():
+        table = model.__table__.name
+        for suffix in ('ai', 'au', 'ad'):
+            op.execute(f'DROP TRIGGER IF EXISTS change_log_{table}_{suffix}')
+    op.drop_table('change_log')
@@ -0,0 +1,46 @@
+"""Daily delivery counts table, filled from existing deliveries
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 19:00:00.000000
+
+The triggers that keep it current are the ones ``create_all`` installs
+(see ``src/database/delivery_counts.py``). The existing deliveries are
+counted before the triggers are created, so nothing is counted twice.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.database.delivery_counts import add_counts, trigger_ddl
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases created by create_all after this change already have it
+    if not sa.inspect(op.get_bind()).has_table('delivery_day_counts'):
+        op.create_table(
+            'delivery_day_counts',
+            sa.Column('delivery_date', sa.Date(), primary_key=True),
+            sa.Column('van_number', sa.Integer(), primary_key=True),
+            sa.Column('status', sa.String(), primary_key=True),
+            sa.Column('parcel_type_id', sa.Integer(), primary_key=True),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sqlite_with_rowid=False,
+        )
+        add_counts(op.get_bind())
+    for ddl in trigger_ddl():
+        op.execute(ddl)
+
+
+def downgrade() -> None:
+    for suffix in ('ai', 'ad', 'au'):
+        op.execute(f'DROP TRIGGER IF EXISTS delivery_counts_{suffix}')
+    op.drop_table('delivery_day_counts')
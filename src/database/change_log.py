@@ -0,0 +1,175 @@
+"""Change feed: which rows changed since a given version.
+
+Every insert, update and delete on the tracked tables appends a row to
+``change_log`` with the entity name, its id, the operation and a version
+that only ever increases. The rows are written by SQLite triggers rather
+than session events, so Core statements, bulk updates, the importers and
+other processes sharing the file are all recorded, in the same
+transaction as the change itself. Updates that leave every column as it
+was are not recorded.
+
+Consumers remember the last version they saw and ask for
+:meth:`ChangeFeed.changes_since`; the query is a range scan on the
+primary key. SQLite has a single writer, so versions are assigned in
+commit order and a poll never skips a change that commits later.
+"""
+from collections import namedtuple
+
+from sqlalchemy import event, func, select, text
+
+from .models import Base, ChangeLog, Delivery, Driver, ParcelType, Patient, Street, Vehicle
+
+# Entity name recorded in the log -> model
+TRACKED = {
+    "Patient": Patient,
+    "Street": Street,
+    "Delivery": Delivery,
+    "Vehicle": Vehicle,
+    "Driver": Driver,
+    "ParcelType": ParcelType,
+}
+
+# Versions kept when the log is pruned
+DEFAULT_KEEP = 1000000
+
+Change = namedtuple("Change", ["version", "entity", "entity_id", "operation"])
+
+
+def trigger_ddl():
+    """CREATE TRIGGER statements for every tracked table"""
+    statements = []
+    for entity, model in TRACKED.items():
+        table = model.__table__
+        key = next(iter(table.primary_key.columns)).name
+        log = ("INSERT INTO change_log(entity, entity_id, operation, changed_at) "
+               "VALUES ('{entity}', {row}.{key}, '{operation}', CURRENT_TIMESTAMP);")
+        changed = " OR ".join(f'OLD."{column.name}" IS NOT NEW."{column.name}"' for column in table.columns)
+        statements.extend([
+            f"CREATE TRIGGER IF NOT EXISTS change_log_{table.name}_ai AFTER INSERT ON {table.name} "
+            f"BEGIN {log.format(entity=entity, row='NEW', key=key, operation='insert')} END",
+            f"CREATE TRIGGER IF NOT EXISTS change_log_{table.name}_au AFTER UPDATE ON {table.name} "
+            f"WHEN {changed} "
+            f"BEGIN {log.format(entity=entity, row='NEW', key=key, operation='update')} END",
+            f"CREATE TRIGGER IF NOT EXISTS change_log_{table.name}_ad AFTER DELETE ON {table.name} "
+            f"BEGIN {log.format(entity=entity, row='OLD', key=key, operation='delete')} END",
+        ])
+    return statements
+
+
+def install_triggers(connection):
+    for ddl in trigger_ddl():
+        connection.execute(text(ddl))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_triggers(metadata, connection, **kw):
+    # Runs after create_all, once every tracked table exists
+    if connection.dialect.name == "sqlite":
+        install_triggers(connection)
+
+
+class ChangeSet:
+    def __init__(self, since, version, changes, complete, more):
+        self.since = since
+        # Pass this to the next changes_since call
+        self.version = version
+        self.changes = changes
+        # False when changes after ``since`` have been pruned; reload everything
+        self.complete = complete
+        # True when ``limit`` cut the set short; poll again straight away
+        self.more = more
+
+    def by_entity(self):
+        """``{entity: {id: last operation}}``, later changes winning"""
+        latest = {}
+        for change in self.changes:
+            latest.setdefault(change.entity, {})[change.entity_id] = change.operation
+        return latest
+
+
+class ChangeFeed:
+    """Reads the change log of the database behind ``engine``"""
+
+    def __init__(self, engine=None):
+        self.engine = engine
+
+    def _engine(self):
+        if self.engine is not None:
+            return self.engine
+        from .database import db_manager
+        return db_manager.engine
+
+    def current_version(self, connection=None):
+        """The newest version ever assigned, or 0"""
+        if connection is None:
+            with self._engine().connect() as connection:
+                return self.current_version(connection)
+        return connection.execute(
+            text("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")
+        ).scalar() or 0
+
+    def changes_since(self, version, entities=None, limit=5000):
+        """Return a :class:`ChangeSet` of changes after ``version``, oldest first"""
+        log = ChangeLog.__table__
+        stmt = (
+            select(log.c.version, log.c.entity, log.c.entity_id, log.c.operation)
+            .where(log.c.version > version)
+            .order_by(log.c.version)
+            .limit(limit + 1)
+        )
+        if entities:
+            stmt = stmt.where(log.c.entity.in_(list(entities)))
+
+        with self._engine().connect() as connection:
+            # Read first and capped below, so a change committed during
+            # the select is left for the next poll rather than skipped
+            latest = self.current_version(connection)
+            rows = connection.execute(stmt.where(log.c.version <= latest)).all()
+            oldest = connection.execute(select(func.min(log.c.version))).scalar()
+
+        more = len(rows) > limit
+        changes = [Change(*row) for row in rows[:limit]]
+        if oldest is None:
+            complete = version >= latest
+        else:
+            complete = version >= oldest - 1
+        # Everything up to ``latest`` has been seen unless the limit cut
+        # in, even if ``entities`` filtered it all out; without this a
+        # filtered cursor would rescan the same newer changes every poll
+        new_version = changes[-1].version if more else max(version, latest)
+        return ChangeSet(version, new_version, changes, complete, more)
+
+    def prune(self, keep=DEFAULT_KEEP):
+        """Delete all but the newest ``keep`` versions; returns rows deleted
+
+        Consumers that had not caught up get ``complete=False`` and reload.
+        Run after each scheduled snapshot and each archive run.
+        """
+        log = ChangeLog.__table__
+        with self._engine().begin() as connection:
+            cutoff = self.current_version(connection) - keep
+            if cutoff <= 0:
+                return 0
+            return connection.execute(log.delete().where(log.c.version <= cutoff)).rowcount
+
+
+class ChangeCursor:
+    """Remembers the last version a consumer saw
+
+    The first :meth:`poll` only records the current version and returns
+    None, since whatever the consumer loaded at start-up is already up to
+    date; later polls return the :class:`ChangeSet` since the previous one.
+    """
+
+    def __init__(self, feed=None, entities=None):
+        self.feed = feed or ChangeFeed()
+        self.entities = entities
+        self.version = None
+
+    def poll(self, limit=5000):
+        if self.version is None:
+            self.version = self.feed.current_version()
+            return None
+        changes = self.feed.changes_since(self.version, self.entities, limit)
+        self.version = changes.version
+        return changes
@@ -1,8 +1,130 @@
-from sqlalchemy import create_engine
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import QueuePool, StaticPool
 from pathlib import Path
 from .models import Base
+# Register the triggers that create_all adds for the change log and the
+# daily delivery counts
+from . import change_log, delivery_counts  # noqa: F401
+from .instrumentation import ENABLE_VARIABLE, SQLInstrumentation
+from .snapshot import SnapshotStore
+
+# Stamped into ``PRAGMA user_version`` once the tables and indexes for this
+# version of the models exist. Bump it whenever a model gains a table or
+# index so the next start creates them (indexes on existing tables too);
+# other changes to existing tables need a migration.
+SCHEMA_VERSION = 3
+
+def default_db_path() -> Path:
+    """Location of the application database"""
+    return Path.home() / ".delivery_system" / "delivery_system.sqlite"
+
+class SQLiteProfile:
+    """Pragmas and pool settings applied to every SQLite connection
+
+    The defaults favour a desktop workload: WAL so readers never wait for
+    the writer, ``synchronous=NORMAL`` (safe under WAL), a 64 MB page cache
+    and a memory-mapped read path.
+    """
+
+    def __init__(self, journal_mode="WAL", synchronous="NORMAL",
+                 cache_size=-64000, mmap_size=256 * 1024 * 1024,
+                 temp_store="MEMORY", busy_timeout=5000,
+                 pool_size=5, max_overflow=10):
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        # Negative values are KiB, positive values are pages
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.temp_store = temp_store
+        # Milliseconds a connection waits on a lock before failing
+        self.busy_timeout = busy_timeout
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+
+    def pragmas(self):
+        """Return the pragma statements for a new connection"""
+        settings = [
+            ("journal_mode", self.journal_mode),
+            ("synchronous", self.synchronous),
+            ("cache_size", self.cache_size),
+            ("mmap_size", self.mmap_size),
+            ("temp_store", self.temp_store),
+            ("busy_timeout", self.busy_timeout),
+        ]
+        return [f"PRAGMA {name}={value}" for name, value in settings if value is not None]
+
+DEFAULT_PROFILE = SQLiteProfile()
+
+def create_sqlite_engine(db_path, profile=None, read_only=False):
+    """Create an engine for ``db_path`` configured with ``profile``
+
+    File databases get a real connection pool so that concurrent readers
+    each have their own connection; ``":memory:"`` keeps a single shared
+    connection because every connection would otherwise see an empty
+    database. ``read_only`` opens the file with ``mode=ro`` so that any
+    write fails, and leaves its journal mode as it is.
+    """
+    profile = profile or DEFAULT_PROFILE
+    in_memory = str(db_path) == ":memory:"
+
+    if in_memory:
+        pool_options = {'poolclass': StaticPool}
+    else:
+        pool_options = {
+            'poolclass': QueuePool,
+            'pool_size': profile.pool_size,
+            'max_overflow': profile.max_overflow,
+        }
+
+    if read_only:
+        url = f"sqlite:///file:{Path(db_path).as_posix()}?mode=ro&uri=true"
+    else:
+        url = f"sqlite:///{db_path}"
+    engine = create_engine(
+        url,
+        connect_args={'check_same_thread': False},
+        **pool_options
+    )
+
+    pragmas = [
+        pragma for pragma in profile.pragmas()
+        if not ((in_memory or read_only) and pragma.startswith("PRAGMA journal_mode"))
+    ]
+
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    return engine
+
+def create_indexes(engine):
+    """Create every model index missing from ``engine``'s database
+    
+    Returns False if a unique index could not be built because existing
+    rows break it; the other indexes are still created.
+    """
+    complete = True
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with engine.begin() as connection:
+                    index.create(connection, checkfirst=True)
+            except IntegrityError:
+                complete = False
+                print(f"Could not create {index.name}: {table.name} has duplicate rows for it",
+                      file=sys.stderr)
+    return complete
 
 class DatabaseManager:
     _instance = None
@@ -14,37 +136,173 @@ class DatabaseManager:
         return cls._instance
     
     def _initialize(self):
-        # Ensure data directory exists
-        data_dir = Path.home() / ".delivery_system"
-        data_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Create database path
-        self.db_path = data_dir / "delivery_system.sqlite"
-        
-        # Create engine with SQLite
-        self.engine = create_engine(
-            f"sqlite:///{self.db_path}",
-            connect_args={'check_same_thread': False},
-            poolclass=StaticPool
-        )
+        # Create database path and ensure data directory exists
+        self.db_path = default_db_path()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Create engine with SQLite; nothing connects until first use
+        self.profile = DEFAULT_PROFILE
+        self._engine = create_sqlite_engine(self.db_path, self.profile)
         
         # Create session factory
         self.SessionLocal = sessionmaker(
             autocommit=False, 
             autoflush=False, 
-            bind=self.engine
+            bind=self._engine
         )
         
-        # Create tables
-        Base.metadata.create_all(bind=self.engine)
+        # Tables are checked on first use rather than at import
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        
+        # Read-only copies for reports; see src/database/snapshot.py
+        self.snapshots = SnapshotStore(self.db_path.parent / "snapshots")
+        
+        # SQL statistics are opt-in; see src/database/instrumentation.py
+        self.instrumentation = None
+        if os.environ.get(ENABLE_VARIABLE, "") not in ("", "0"):
+            self.instrument(SQLInstrumentation(slow_log=self.db_path.parent / "slow_queries.log"))
+            self.instrumentation.save_at_exit(self.db_path.parent / "sql_stats.json")
+    
+    @property
+    def engine(self):
+        """The engine, with the schema checked before it is handed out"""
+        self.ensure_schema()
+        return self._engine
+    
+    def ensure_schema(self):
+        """Create missing tables and indexes unless the database is already stamped
+        
+        An up-to-date database costs a single ``PRAGMA user_version``
+        read instead of reflecting every table. Runs once per process.
+        
+        ``create_all`` skips tables that exist, indexes and all, so the
+        indexes of existing tables are created one by one. A unique index
+        the data does not satisfy yet is left out and the version is not
+        stamped, so the next start tries again.
+        """
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            with self._engine.connect() as connection:
+                version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+            if version != SCHEMA_VERSION:
+                Base.metadata.create_all(bind=self._engine)
+                if create_indexes(self._engine):
+                    with self._engine.begin() as connection:
+                        connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._schema_ready = True
+    
+    def apply_profile(self, profile: SQLiteProfile):
+        """Rebuild the engine with a different performance profile"""
+        old_engine = self._engine
+        self.profile = profile
+        self._engine = create_sqlite_engine(self.db_path, profile)
+        self.SessionLocal.configure(bind=self._engine)
+        self._move_instrumentation(old_engine)
+        old_engine.dispose()
+    
+    def use_engine(self, engine):
+        """Point every session at another database, e.g. a benchmark's
+        
+        The caller owns ``engine`` and is expected to have created its
+        tables; the application's engine is left open.
+        """
+        old_engine = self._engine
+        self._engine = engine
+        self.SessionLocal.configure(bind=engine)
+        self._move_instrumentation(old_engine)
+        self._schema_ready = True
+    
+    def instrument(self, instrumentation=None):
+        """Record statistics for every statement run on the engine
+        
+        Returns the :class:`SQLInstrumentation` in use, which follows the
+        engine if it is replaced.
+        """
+        if self.instrumentation is None:
+            self.instrumentation = instrumentation or SQLInstrumentation()
+            self.instrumentation.install(self._engine)
+        return self.instrumentation
+    
+    def _move_instrumentation(self, old_engine):
+        if self.instrumentation is not None:
+            self.instrumentation.uninstall(old_engine)
+            self.instrumentation.install(self._engine)
     
     def get_session(self) -> Session:
         """Get a new database session"""
+        self.ensure_schema()
         return self.SessionLocal()
     
+    @contextmanager
+    def session_scope(self, expire_on_commit=True):
+        """Provide a short-lived session that commits on success
+        
+        The session is rolled back if the block raises and is always
+        closed on exit. Pass ``expire_on_commit=False`` to keep using the
+        loaded objects after the block without reloading them.
+        """
+        self.ensure_schema()
+        session = self.SessionLocal(expire_on_commit=expire_on_commit)
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
+    # Reporting snapshots
+    
+    def take_snapshot(self):
+        """Copy the database into a new reporting snapshot and return it
+        
+        Also usable as a backup: the file is a complete, consistent
+        database as of the moment it was taken.
+        """
+        self.ensure_schema()
+        return self.snapshots.take(self._engine)
+    
+    def schedule_snapshots(self, interval, on_error=None):
+        """Take a snapshot every ``interval`` seconds; 0 stops the schedule
+        
+        The change log is pruned after each one, so it does not grow
+        without bound.
+        """
+        self.snapshots.schedule(
+            lambda: self.engine, interval, on_error,
+            after=lambda: change_log.ChangeFeed(self._engine).prune()
+        )
+    
+    @property
+    def reporting_engine(self):
+        """Read-only engine on the latest snapshot while snapshots are scheduled
+        
+        Falls back to the live engine when no schedule is running, or
+        when the newest snapshot is over two intervals old: one left
+        from an earlier run, or a schedule that has stopped keeping up.
+        """
+        interval = self.snapshots.interval
+        if interval:
+            engine = self.snapshots.engine(max_age=2 * interval)
+            if engine is not None:
+                return engine
+        return self.engine
+    
+    def get_reporting_session(self) -> Session:
+        """Session for long reads and exports, bound to the latest snapshot"""
+        return self.SessionLocal(bind=self.reporting_engine)
+    
     def drop_tables(self):
         """Drop all tables in the database"""
-        Base.metadata.drop_all(bind=self.engine)
+        Base.metadata.drop_all(bind=self._engine)
+        with self._engine.begin() as connection:
+            connection.exec_driver_sql("PRAGMA user_version = 0")
+        self._schema_ready = False
 
 # Singleton instance
 db_manager = DatabaseManager()
@@ -52,3 +310,11 @@ db_manager = DatabaseManager()
 def get_db_session():
     """Convenience function to get a database session"""
     return db_manager.get_session()
+
+def get_reporting_session():
+    """Convenience function to get a session on the reporting snapshot"""
+    return db_manager.get_reporting_session()
+
+def session_scope(expire_on_commit=True):
+    """Convenience function for a transactional session scope"""
+    return db_manager.session_scope(expire_on_commit=expire_on_commit)
@@ -0,0 +1,280 @@
+"""Per-day delivery counts, maintained as deliveries change.
+
+``delivery_day_counts`` holds one row per day, van, status and parcel
+type with the number of deliveries in it. SQLite triggers on
+``deliveries`` keep it current: an insert adds one with an UPSERT, a
+delete takes one away, and an update that moves a delivery to another
+day, van, status or parcel type does both. Like the change log, the
+triggers see every write, including Core statements and other processes.
+
+Reading a day's figures is then a primary key range scan over a few
+dozen rows, however long the delivery history grows. Signature totals
+are worked out when reading by joining the few parcel type rows, so
+changing a parcel type's ``requires_signature`` needs no recount.
+
+The counts key on the van stored on each delivery. The delivery list
+puts a delivery without one on its street's van for the number of vans
+running, which the triggers cannot know, so :meth:`DeliveryCounts.summary`
+does the same when given ``van_count``: the day's deliveries without a
+stored van are grouped by street, through the ``(delivery_date,
+van_number)`` index, and moved onto their street's van.
+
+Archiving deletes deliveries from the live table, but those days
+still happened. :meth:`DeliveryArchive.archive` calls :func:`add_counts`
+for the rows it moves before deleting them, so the counts for archived
+days stay as they were.
+"""
+from collections import Counter, namedtuple
+
+from sqlalchemy import and_, case, event, func, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .models import Base, Delivery, DeliveryDayCount, ParcelType, Patient, Street
+
+# Group key of a delivery row, with the same defaults the triggers use
+_KEY_SQL = ("{row}.delivery_date, COALESCE({row}.van_number, 0), "
+            "COALESCE({row}.status, ''), COALESCE({row}.parcel_type_id, 0)")
+_MATCH_SQL = ("delivery_date = {row}.delivery_date AND van_number = COALESCE({row}.van_number, 0) "
+              "AND status = COALESCE({row}.status, '') AND parcel_type_id = COALESCE({row}.parcel_type_id, 0)")
+_KEY_COLUMNS = "delivery_date, van_number, status, parcel_type_id"
+
+CountRow = namedtuple("CountRow", ["van_number", "status", "parcel_type_id", "count"])
+ParcelTypeInfo = namedtuple("ParcelTypeInfo", ["code", "description", "requires_signature"])
+
+
+def _increment(row):
+    # The WHERE makes SQLite parse ON CONFLICT as the upsert clause
+    return (f"INSERT INTO delivery_day_counts({_KEY_COLUMNS}, count) "
+            f"SELECT {_KEY_SQL.format(row=row)}, 1 WHERE {row}.delivery_date IS NOT NULL "
+            f"ON CONFLICT({_KEY_COLUMNS}) DO UPDATE SET count = count + 1;")
+
+
+def _decrement(row):
+    return f"UPDATE delivery_day_counts SET count = count - 1 WHERE {_MATCH_SQL.format(row=row)};"
+
+
+def trigger_ddl():
+    """CREATE TRIGGER statements that keep ``delivery_day_counts`` current"""
+    key_changed = " OR ".join(
+        f"OLD.{column} IS NOT NEW.{column}"
+        for column in ("delivery_date", "van_number", "status", "parcel_type_id")
+    )
+    return [
+        "CREATE TRIGGER IF NOT EXISTS delivery_counts_ai AFTER INSERT ON deliveries "
+        f"BEGIN {_increment('NEW')} END",
+        "CREATE TRIGGER IF NOT EXISTS delivery_counts_ad AFTER DELETE ON deliveries "
+        f"BEGIN {_decrement('OLD')} END",
+        "CREATE TRIGGER IF NOT EXISTS delivery_counts_au "
+        "AFTER UPDATE OF delivery_date, van_number, status, parcel_type_id ON deliveries "
+        f"WHEN {key_changed} "
+        f"BEGIN {_decrement('OLD')} {_increment('NEW')} END",
+    ]
+
+
+def install_triggers(connection):
+    for ddl in trigger_ddl():
+        connection.execute(text(ddl))
+
+
+def add_counts(connection, *criteria):
+    """Add the deliveries matching ``criteria`` (all of them if none) to the counts"""
+    live = Delivery.__table__
+    counts = DeliveryDayCount.__table__
+    key = [
+        live.c.delivery_date,
+        func.coalesce(live.c.van_number, 0),
+        func.coalesce(live.c.status, ""),
+        func.coalesce(live.c.parcel_type_id, 0),
+    ]
+    grouped = select(*key, func.count()).where(live.c.delivery_date.is_not(None), *criteria).group_by(*key)
+    stmt = sqlite_insert(counts).from_select(
+        ["delivery_date", "van_number", "status", "parcel_type_id", "count"], grouped
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["delivery_date", "van_number", "status", "parcel_type_id"],
+        set_={"count": counts.c.count + stmt.excluded.count},
+    )
+    connection.execute(stmt)
+
+
+def rebuild(connection):
+    """Recount everything from the live ``deliveries`` table
+
+    Counts kept for archived days are lost; use this only to repair the
+    table.
+    """
+    connection.execute(DeliveryDayCount.__table__.delete())
+    add_counts(connection)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_triggers(metadata, connection, tables=(), **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    # Newly added to an existing database: count what is already there
+    # before the triggers start counting new writes
+    if DeliveryDayCount.__table__ in tables:
+        add_counts(connection)
+    install_triggers(connection)
+
+
+class DaySummary:
+    """Delivery figures for a day or a range of days
+
+    ``rows`` are ``(van_number, status, parcel_type_id, count)``; van 0
+    and status '' stand for deliveries without one.
+    """
+
+    def __init__(self, start, end, rows, parcel_types):
+        self.start = start
+        self.end = end
+        self.rows = rows
+        # id -> ParcelTypeInfo for every parcel type that appears
+        self.parcel_types = parcel_types
+
+    @property
+    def total(self):
+        return sum(row.count for row in self.rows)
+
+    @property
+    def signature_required(self):
+        return sum(
+            row.count for row in self.rows
+            if row.parcel_type_id in self.parcel_types
+            and self.parcel_types[row.parcel_type_id].requires_signature
+        )
+
+    def _totals(self, key):
+        totals = {}
+        for row in self.rows:
+            totals[key(row)] = totals.get(key(row), 0) + row.count
+        return dict(sorted(totals.items()))
+
+    def by_van(self):
+        return self._totals(lambda row: row.van_number)
+
+    def by_status(self):
+        return self._totals(lambda row: row.status)
+
+    def by_parcel_type(self):
+        return self._totals(lambda row: row.parcel_type_id)
+
+    def by_van_and_status(self):
+        """``{van: {status: count}}``"""
+        table = {}
+        for row in self.rows:
+            statuses = table.setdefault(row.van_number, {})
+            statuses[row.status] = statuses.get(row.status, 0) + row.count
+        return dict(sorted(table.items()))
+
+
+class DeliveryCounts:
+    """Reads ``delivery_day_counts`` for the database behind ``engine``
+
+    ``streets`` is the street index used to place addresses that only
+    match a street once normalised; by default the shared index, or one
+    of its own for another ``engine``.
+    """
+
+    def __init__(self, engine=None, streets=None):
+        self.engine = engine
+        self._streets = streets
+
+    def _engine(self):
+        if self.engine is not None:
+            return self.engine
+        from .database import db_manager
+        return db_manager.engine
+
+    def streets(self):
+        if self._streets is None:
+            # Imported here: the services import this package
+            from src.services.street_index import StreetIndex, street_index
+            if self.engine is None:
+                self._streets = street_index
+            else:
+                from sqlalchemy.orm import sessionmaker
+                self._streets = StreetIndex(sessionmaker(bind=self.engine))
+        return self._streets
+
+    def summary(self, start, end=None, van_count=None):
+        """:class:`DaySummary` for ``start``, or ``start``..``end`` inclusive
+
+        Without ``van_count`` deliveries are counted under their stored
+        van. With it, those without one are counted under the van the
+        delivery list gives them for ``van_count`` vans.
+        """
+        end = end or start
+        counts = DeliveryDayCount.__table__
+        parcel_types = ParcelType.__table__
+        with self._engine().connect() as connection:
+            rows = connection.execute(
+                select(counts.c.van_number, counts.c.status, counts.c.parcel_type_id, func.sum(counts.c.count))
+                .where(counts.c.delivery_date.between(start, end), counts.c.count > 0)
+                .group_by(counts.c.van_number, counts.c.status, counts.c.parcel_type_id)
+            ).all()
+            rows = [CountRow(*row) for row in rows]
+            if van_count is not None and any(row.van_number == 0 for row in rows):
+                rows = self._street_vans(connection, start, end, rows, van_count)
+            ids = {row.parcel_type_id for row in rows}
+            types = connection.execute(
+                select(parcel_types.c.id, parcel_types.c.code, parcel_types.c.description,
+                       parcel_types.c.requires_signature)
+                .where(parcel_types.c.id.in_(ids))
+            ).all() if ids else []
+        return DaySummary(start, end, rows, {row.id: ParcelTypeInfo(*row[1:]) for row in types})
+
+    def _street_vans(self, connection, start, end, rows, van_count):
+        """``rows`` with the unassigned counts moved onto their streets' vans"""
+        live = Delivery.__table__
+        patients = Patient.__table__
+        streets = Street.__table__
+        van = streets.c.van_4_assignment if van_count == 4 else streets.c.van_3_assignment
+        # The street's name only matters when it has to be looked up in
+        # the index, so matched streets group together by van
+        unmatched = streets.c.id.is_(None)
+        key = [
+            van,
+            case((unmatched, patients.c.street_name)),
+            case((unmatched, patients.c.town)),
+            func.coalesce(live.c.status, ""),
+            func.coalesce(live.c.parcel_type_id, 0),
+        ]
+        grouped = connection.execute(
+            select(*key, func.count())
+            .select_from(
+                live.outerjoin(patients, patients.c.patient_id == live.c.patient_id)
+                .outerjoin(streets, and_(streets.c.road_name == patients.c.street_name,
+                                         streets.c.town == patients.c.town))
+            )
+            .where(live.c.delivery_date.between(start, end), live.c.van_number.is_(None))
+            .group_by(*key)
+        ).all()
+
+        moved = Counter()
+        for street_van, street_name, town, status, parcel_type_id, count in grouped:
+            if street_van is None and street_name:
+                street_van, _ = self.streets().van_for(street_name, town, van_count)
+            if street_van:
+                moved[(street_van, status, parcel_type_id)] += count
+
+        totals = Counter()
+        for row in rows:
+            totals[(row.van_number, row.status, row.parcel_type_id)] += row.count
+        for (street_van, status, parcel_type_id), count in moved.items():
+            # Archived days have no live rows to resolve and stay as counted
+            count = min(count, totals[(0, status, parcel_type_id)])
+            totals[(0, status, parcel_type_id)] -= count
+            totals[(street_van, status, parcel_type_id)] += count
+        return [CountRow(*key, count) for key, count in sorted(totals.items()) if count > 0]
+
+    def days(self, start, end):
+        """``{date: total deliveries}`` for every day in the range that had any"""
+        counts = DeliveryDayCount.__table__
+        with self._engine().connect() as connection:
+            return dict(connection.execute(
+                select(counts.c.delivery_date, func.sum(counts.c.count))
+                .where(counts.c.delivery_date.between(start, end), counts.c.count > 0)
+                .group_by(counts.c.delivery_date)
+                .order_by(counts.c.delivery_date)
+            ).all())
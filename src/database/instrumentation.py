@@ -0,0 +1,308 @@
+"""Opt-in SQL statistics for an engine.
+
+:class:`SQLInstrumentation` hooks ``before_cursor_execute`` and
+``after_cursor_execute`` and keeps, per distinct statement, a call count,
+total/max time and a latency histogram. On top of that it watches each
+transaction for N+1 patterns (the same SELECT run many times inside one
+unit of work) and writes statements slower than a threshold, together
+with their ``EXPLAIN QUERY PLAN``, to a slow-query log.
+
+The per-statement cost is two ``perf_counter`` calls and a few dict
+updates (a few microseconds, against tens for the cheapest query), so it
+can stay on in production. Turn it on for the application
+by setting ``DELIVERY_SQL_STATS=1``; the statistics are saved next to the
+database on exit and printed with::
+
+    python -m src.database.instrumentation --top 20
+
+Parameters are never logged, since they are patient data; only the SQL
+text and its plan are.
+"""
+import argparse
+import atexit
+import bisect
+import json
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+from sqlalchemy import event
+
+ENABLE_VARIABLE = "DELIVERY_SQL_STATS"
+# Upper bounds of the histogram buckets in milliseconds; the last bucket is open
+BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+BUCKET_LABELS = [f"<{bound:g}ms" for bound in BUCKETS_MS] + [f">={BUCKETS_MS[-1]:g}ms"]
+_BUCKETS = tuple(bound / 1000 for bound in BUCKETS_MS)
+
+_IN_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_SPACE = re.compile(r"\s+")
+_UOW_KEY = "sql_stats_unit_of_work"
+
+
+@lru_cache(maxsize=2048)
+def normalise(statement):
+    """Return ``(key, is_select)`` for a statement
+
+    Whitespace is collapsed and ``IN (?, ?, ...)`` lists of any length
+    become ``IN (?...)`` so they count as one statement.
+    """
+    key = _IN_LIST.sub("(?...)", _SPACE.sub(" ", statement).strip())
+    return key, key[:6].upper() in ("SELECT", "WITH ")
+
+
+class StatementStats:
+    __slots__ = ("statement", "count", "total", "max", "histogram", "n_plus_one")
+
+    def __init__(self, statement):
+        self.statement = statement
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(_BUCKETS) + 1)
+        # Units of work in which this statement ran N+1 style
+        self.n_plus_one = 0
+
+    def add(self, elapsed):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.histogram[bisect.bisect_right(_BUCKETS, elapsed)] += 1
+
+    def to_dict(self):
+        return {
+            "statement": self.statement,
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "histogram": dict(zip(BUCKET_LABELS, self.histogram)),
+            "n_plus_one": self.n_plus_one,
+        }
+
+
+class SQLInstrumentation:
+    """Statement counts, latency histograms, N+1 detection and a slow-query log
+
+    ``slow_threshold`` is in seconds. A SELECT run at least
+    ``n_plus_one_threshold`` times in one transaction is reported as an
+    N+1 pattern. ``slow_log`` is a file to append slow queries to; they
+    are also kept in memory (the most recent ``keep_slow``).
+    """
+
+    def __init__(self, slow_threshold=0.1, n_plus_one_threshold=20, slow_log=None,
+                 explain=True, keep_slow=100):
+        self.slow_threshold = slow_threshold
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_log = Path(slow_log) if slow_log else None
+        self.explain = explain
+        self.slow_queries = deque(maxlen=keep_slow)
+        self.started = datetime.now()
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._engines = []
+
+    # Engine hooks
+
+    def install(self, engine):
+        """Start recording statements run on ``engine``"""
+        if engine in self._engines:
+            return
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        event.listen(engine, "begin", self._begin)
+        event.listen(engine, "commit", self._end)
+        event.listen(engine, "rollback", self._end)
+        self._engines.append(engine)
+
+    def uninstall(self, engine=None):
+        """Stop recording on ``engine``, or on every engine if None"""
+        for installed in [engine] if engine is not None else list(self._engines):
+            if installed not in self._engines:
+                continue
+            event.remove(installed, "before_cursor_execute", self._before_execute)
+            event.remove(installed, "after_cursor_execute", self._after_execute)
+            event.remove(installed, "begin", self._begin)
+            event.remove(installed, "commit", self._end)
+            event.remove(installed, "rollback", self._end)
+            self._engines.remove(installed)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._sql_stats_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._sql_stats_started
+        key, is_select = normalise(statement)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StatementStats(key)
+            stats.add(elapsed)
+
+        if is_select and not executemany:
+            unit = conn.info.get(_UOW_KEY)
+            if unit is not None:
+                unit[key] = unit.get(key, 0) + 1
+
+        if elapsed >= self.slow_threshold:
+            self._record_slow(cursor, statement, key, parameters, elapsed, is_select and not executemany)
+
+    def _begin(self, conn):
+        conn.info[_UOW_KEY] = {}
+
+    def _end(self, conn):
+        unit = conn.info.pop(_UOW_KEY, None)
+        if not unit:
+            return
+        repeated = [(key, count) for key, count in unit.items() if count >= self.n_plus_one_threshold]
+        for key, count in repeated:
+            with self._lock:
+                stats = self._stats.get(key)
+                if stats is None:
+                    continue
+                stats.n_plus_one += 1
+                first = stats.n_plus_one == 1
+            if first:
+                self._write_log(f"N+1: ran {count} times in one transaction\n{key}\n")
+
+    # Slow queries
+
+    def _record_slow(self, cursor, statement, key, parameters, elapsed, can_explain):
+        plan = self._plan(cursor, statement, parameters) if self.explain and can_explain else []
+        entry = {
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "ms": round(elapsed * 1000, 1),
+            "statement": key,
+            "plan": plan,
+        }
+        self.slow_queries.append(entry)
+        lines = [f"{entry['at']} slow query: {entry['ms']} ms", key]
+        lines.extend(f"  {step}" for step in plan)
+        self._write_log("\n".join(lines) + "\n")
+
+    def _plan(self, cursor, statement, parameters):
+        # A separate cursor on the same connection, so the caller's
+        # results are untouched and no events fire
+        try:
+            explain = cursor.connection.cursor()
+            try:
+                explain.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+                rows = explain.fetchall()
+            finally:
+                explain.close()
+        except Exception as e:
+            return [f"(plan unavailable: {e})"]
+        depth = {0: 0}
+        plan = []
+        for node, parent, _, detail in rows:
+            depth[node] = depth.get(parent, 0) + 1
+            plan.append("  " * (depth[node] - 1) + detail)
+        return plan
+
+    def _write_log(self, text):
+        if self.slow_log is None:
+            return
+        with self._lock:
+            self.slow_log.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.slow_log, "a", encoding="utf-8") as handle:
+                handle.write(text + "\n")
+
+    # Results
+
+    def statements(self):
+        """Per-statement statistics, most total time first"""
+        with self._lock:
+            stats = [stats.to_dict() for stats in self._stats.values()]
+        return sorted(stats, key=lambda item: item["total"], reverse=True)
+
+    def snapshot(self):
+        """Everything recorded so far as a JSON-ready dict"""
+        return {
+            "since": self.started.isoformat(timespec="seconds"),
+            "saved": datetime.now().isoformat(timespec="seconds"),
+            "slow_threshold": self.slow_threshold,
+            "statements": self.statements(),
+            "slow_queries": list(self.slow_queries),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.slow_queries.clear()
+            self.started = datetime.now()
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(self.snapshot(), handle, indent=2)
+
+    def save_at_exit(self, path):
+        atexit.register(self.save, path)
+
+    def dump(self, stream=None, top=20, sort="total"):
+        print_report(self.snapshot(), stream, top, sort)
+
+
+def percentile(item, fraction):
+    """Upper bound in seconds of the bucket holding ``fraction`` of an item's calls"""
+    target, seen = fraction * item["count"], 0
+    for index, count in enumerate(item["histogram"].values()):
+        seen += count
+        if count and seen >= target:
+            return min(_BUCKETS[index], item["max"]) if index < len(_BUCKETS) else item["max"]
+    return 0.0
+
+
+def print_report(snapshot, stream=None, top=20, sort="total"):
+    """Print a saved or live snapshot as a table"""
+    stream = stream or sys.stdout
+    statements = sorted(snapshot["statements"], key=lambda item: item[sort], reverse=True)
+    calls = sum(item["count"] for item in statements)
+    total = sum(item["total"] for item in statements)
+    print(f"{calls} statements, {total:.2f}s in SQL since {snapshot['since']} "
+          f"({len(statements)} distinct)", file=stream)
+    print(f"{'count':>8} {'total ms':>10} {'mean ms':>8} {'p95 ms':>8} {'max ms':>8} {'N+1':>4}  statement",
+          file=stream)
+    for item in statements[:top]:
+        mean = item["total"] / item["count"] if item["count"] else 0.0
+        statement = item["statement"]
+        if len(statement) > 100:
+            statement = statement[:97] + "..."
+        print(f"{item['count']:>8} {item['total'] * 1000:>10.1f} {mean * 1000:>8.2f} "
+              f"{percentile(item, 0.95) * 1000:>8.1f} {item['max'] * 1000:>8.1f} {item['n_plus_one']:>4}  {statement}", file=stream)
+
+    slow = snapshot["slow_queries"]
+    if slow:
+        print(f"\n{len(slow)} slow queries (>= {snapshot['slow_threshold'] * 1000:.0f} ms), latest last:",
+              file=stream)
+        for entry in slow[-top:]:
+            print(f"{entry['at']} {entry['ms']:>8.1f} ms  {entry['statement'][:100]}", file=stream)
+            for step in entry["plan"]:
+                print(f"    {step}", file=stream)
+
+
+def main(argv=None):
+    from src.database.database import default_db_path
+
+    parser = argparse.ArgumentParser(description="Print the SQL statistics saved by the application")
+    parser.add_argument("path", nargs="?", default=str(default_db_path().with_name("sql_stats.json")))
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--sort", choices=["total", "count", "max", "n_plus_one"], default="total")
+    args = parser.parse_args(argv)
+
+    path = Path(args.path)
+    if not path.exists():
+        print(f"No statistics at {path}; run the application with {ENABLE_VARIABLE}=1 first")
+        return 1
+    with open(path, encoding="utf-8") as handle:
+        print_report(json.load(handle), top=args.top, sort=args.sort)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
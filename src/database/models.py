@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Boolean, Text, Index
 from sqlalchemy.orm import relationship, declarative_base
 
 Base = declarative_base()
@@ -14,6 +14,10 @@ class Patient(Base):
     
     # Relationships
     deliveries = relationship("Delivery", back_populates="patient")
+    
+    __table_args__ = (
+        Index('ix_patients_street_name_town', 'street_name', 'town'),
+    )
 
 class Street(Base):
     __tablename__ = 'streets'
@@ -24,6 +28,10 @@ class Street(Base):
     route_order = Column(Integer)
     van_3_assignment = Column(Integer)
     van_4_assignment = Column(Integer)
+    
+    __table_args__ = (
+        Index('uq_streets_road_name_town', 'road_name', 'town', unique=True),
+    )
 
 class Delivery(Base):
     __tablename__ = 'deliveries'
@@ -40,6 +48,13 @@ class Delivery(Base):
     # Relationships
     patient = relationship("Patient", back_populates="deliveries")
     parcel_type = relationship("ParcelType")
+    
+    # Daily list, per-van list, patient history and status queries
+    __table_args__ = (
+        Index('ix_deliveries_delivery_date_van_number', 'delivery_date', 'van_number'),
+        Index('ix_deliveries_patient_id_delivery_date', 'patient_id', 'delivery_date'),
+        Index('ix_deliveries_status_delivery_date', 'status', 'delivery_date'),
+    )
 
 class Vehicle(Base):
     __tablename__ = 'vehicles'
@@ -69,3 +84,36 @@ class SystemSetting(Base):
     key = Column(String, primary_key=True)
     value = Column(String)
     description = Column(Text)
+
+class ChangeLog(Base):
+    """Append-only record of row changes, written by triggers
+    
+    ``version`` only ever grows (AUTOINCREMENT), so "changes since N" is a
+    range scan on the primary key. See src/database/change_log.py.
+    """
+    __tablename__ = 'change_log'
+    
+    version = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    operation = Column(String, nullable=False)
+    changed_at = Column(DateTime)
+    
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class DeliveryDayCount(Base):
+    """Number of deliveries per day, van, status and parcel type
+    
+    Kept current by triggers on ``deliveries`` (see
+    src/database/delivery_counts.py). A missing van, status or parcel type
+    is stored as 0 or '' so that every combination has exactly one row.
+    """
+    __tablename__ = 'delivery_day_counts'
+    
+    delivery_date = Column(Date, primary_key=True)
+    van_number = Column(Integer, primary_key=True)
+    status = Column(String, primary_key=True)
+    parcel_type_id = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False)
+    
+    __table_args__ = {'sqlite_with_rowid': False}
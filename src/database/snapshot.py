@@ -0,0 +1,183 @@
+"""Point-in-time read-only copies of the database for reporting.
+
+A snapshot is taken with SQLite's online backup API: the copy reads the
+live database inside one read transaction, which under WAL never blocks
+the writers, and the result is a consistent database as of that moment.
+Reports and exports then read the snapshot through a read-only engine,
+so long scans never hold locks on the live file. A snapshot is also a
+complete backup of the database.
+
+Each snapshot is written to a new timestamped file and the previous one
+is kept until the next, so sessions still reading the old copy are not
+disturbed when the reporting engine moves on.
+"""
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+INTERVAL_SETTING = "snapshot_interval_minutes"
+SNAPSHOT_FILE = re.compile(r"^snapshot-(\d{8}-\d{6}-\d{6})\.sqlite$")
+TIMESTAMP_FORMAT = "%Y%m%d-%H%M%S-%f"
+
+
+def backup_database(engine, target):
+    """Copy the database behind ``engine`` to ``target`` with the backup API
+
+    The copy is written to a temporary name and renamed into place, and
+    switched to a rollback journal so it can be opened read-only without
+    WAL side files. Returns the target path.
+    """
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(target.name + ".partial")
+    if partial.exists():
+        partial.unlink()
+
+    source = engine.raw_connection()
+    try:
+        destination = sqlite3.connect(partial)
+        try:
+            # pages=-1 copies everything in one step, so the copy is
+            # taken from a single read transaction and never restarts
+            source.driver_connection.backup(destination, pages=-1)
+            destination.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            destination.close()
+    finally:
+        source.close()
+    partial.replace(target)
+    return target
+
+
+class Snapshot:
+    def __init__(self, path, taken_at):
+        self.path = path
+        self.taken_at = taken_at
+
+    @property
+    def age(self):
+        """Seconds since the snapshot was taken"""
+        return (datetime.now() - self.taken_at).total_seconds()
+
+
+class SnapshotStore:
+    """Timestamped snapshots in ``directory`` and a read-only engine on the latest
+
+    ``keep`` is how many snapshot files to leave on disk; at least two,
+    so the copy being replaced survives until its readers are done.
+    """
+
+    def __init__(self, directory, keep=2):
+        self.directory = Path(directory)
+        self.keep = max(keep, 2)
+        self._lock = threading.Lock()
+        self._take_lock = threading.Lock()
+        self._engine = None
+        self._engine_path = None
+        self._timer = None
+        # Seconds between scheduled snapshots; None when not scheduled
+        self.interval = None
+
+    def latest(self):
+        """The newest :class:`Snapshot`, or None if there is none"""
+        snapshots = self.snapshots()
+        return snapshots[-1] if snapshots else None
+
+    def snapshots(self):
+        """Every snapshot on disk, oldest first"""
+        if not self.directory.exists():
+            return []
+        found = []
+        for path in self.directory.iterdir():
+            match = SNAPSHOT_FILE.match(path.name)
+            if match:
+                found.append(Snapshot(path, datetime.strptime(match.group(1), TIMESTAMP_FORMAT)))
+        return sorted(found, key=lambda snapshot: snapshot.taken_at)
+
+    def take(self, engine):
+        """Snapshot the database behind ``engine`` and return the :class:`Snapshot`"""
+        with self._take_lock:
+            taken_at = datetime.now()
+            path = self.directory / f"snapshot-{taken_at.strftime(TIMESTAMP_FORMAT)}.sqlite"
+            backup_database(engine, path)
+            self._prune()
+            return Snapshot(path, taken_at)
+
+    def _prune(self):
+        for snapshot in self.snapshots()[:-self.keep]:
+            if snapshot.path == self._engine_path:
+                continue
+            try:
+                snapshot.path.unlink()
+            except OSError:
+                # Still open somewhere (Windows); removed on a later run
+                pass
+
+    def engine(self, max_age=None):
+        """Read-only engine on the latest snapshot
+
+        None if there is no snapshot, or the latest is more than
+        ``max_age`` seconds old.
+        """
+        from .database import create_sqlite_engine
+
+        latest = self.latest()
+        if latest is None or (max_age is not None and latest.age > max_age):
+            return None
+        with self._lock:
+            if self._engine_path != latest.path:
+                previous = self._engine
+                self._engine = create_sqlite_engine(latest.path, read_only=True)
+                self._engine_path = latest.path
+                if previous is not None:
+                    # Checked-out connections stay usable until returned
+                    previous.dispose()
+            return self._engine
+
+    # Scheduling
+
+    def schedule(self, get_engine, interval, on_error=None, after=None):
+        """Snapshot the engine returned by ``get_engine`` every ``interval`` seconds
+
+        Runs on a daemon timer thread; a zero or negative interval stops
+        the schedule. ``after`` is called once each snapshot is taken, for
+        other periodic upkeep. ``on_error`` is called with any exception
+        raised.
+        """
+        self.stop()
+        if interval <= 0:
+            return
+        self.interval = interval
+
+        def run():
+            try:
+                self.take(get_engine())
+                if after is not None:
+                    after()
+            except Exception as e:
+                if on_error is not None:
+                    on_error(e)
+            if self._timer is timer:
+                self.schedule(get_engine, interval, on_error, after)
+
+        timer = threading.Timer(interval, run)
+        timer.daemon = True
+        self._timer = timer
+        timer.start()
+
+    def stop(self):
+        self.interval = None
+        timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            if self._engine is not None:
+                self._engine.dispose()
+            self._engine = None
+            self._engine_path = None
+
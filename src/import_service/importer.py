@@ -0,0 +1,502 @@
+"""Streaming import of legacy Excel/CSV workbooks into the delivery database.
+
+Rows are read one at a time (openpyxl read-only mode for ``.xlsx``, the csv
+module for ``.csv``), mapped onto plain column dictionaries and written with
+Core ``INSERT`` executemany calls, one transaction per batch. Nothing holds
+more than a single batch in memory and no ORM objects are created.
+
+Rows whose natural key is already in the table (or earlier in the same
+file) are left out with ``ON CONFLICT DO NOTHING`` and reported as errors
+like any other bad row, so one duplicate does not abort the import.
+"""
+import csv
+import json
+import time
+from collections import Counter
+from datetime import date, datetime
+from pathlib import Path
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src.database.database import get_db_session
+from src.database.models import Patient, Street, Delivery, ParcelType, SystemSetting
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+CHECKPOINT_KEY_PREFIX = "import_checkpoint:"
+
+
+class ImportRowError(ValueError):
+    """Raised when a single source row cannot be mapped"""
+
+
+# Value converters
+
+def to_str(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+def to_int(value):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        raise ImportRowError(f"expected a whole number, got {value!r}")
+
+
+def to_date(value):
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    value = str(value).strip()
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ImportRowError(f"unrecognised date {value!r}")
+
+
+def normalise_header(name):
+    """Reduce a spreadsheet heading to a lower_snake_case lookup key"""
+    if name is None:
+        return ""
+    text = str(name).strip().lower()
+    for char in "/-.#()":
+        text = text.replace(char, " ")
+    return "_".join(text.split())
+
+
+# Import targets
+
+class ImportTarget:
+    """Maps spreadsheet columns onto the columns of one table.
+
+    ``columns`` maps a table column to ``(aliases, converter)``; the first
+    alias found in the sheet heading is used. ``key`` names the columns that
+    identify a row between imports, if the table has a natural key.
+    """
+
+    def __init__(self, name, model, columns, required=(), key=()):
+        self.name = name
+        self.model = model
+        self.table = model.__table__
+        self.columns = columns
+        self.required = tuple(required)
+        self.key = tuple(key)
+
+    def prepare(self, session):
+        """Load any lookup data needed before rows are converted"""
+
+    def plan(self, header):
+        """Return ``(column, position, converter)`` for each mapped column"""
+        positions = {normalise_header(name): index for index, name in enumerate(header)}
+        plan = []
+        for column, (aliases, converter) in self.columns.items():
+            for alias in aliases:
+                if alias in positions:
+                    plan.append((column, positions[alias], converter))
+                    break
+        return plan
+
+    def build_mapper(self, header):
+        """Return a function turning a raw row tuple into a column dict"""
+        plan = self.plan(header)
+        found = {column for column, _, _ in plan}
+        missing = [column for column in self.required if column not in found]
+        if missing:
+            raise ValueError(
+                f"{self.name} sheet is missing required column(s): {', '.join(missing)}"
+            )
+
+        required = self.required
+
+        def map_row(row):
+            if not any(value not in (None, "") for value in row):
+                return None
+            record = {}
+            for column, index, converter in plan:
+                value = row[index] if index < len(row) else None
+                try:
+                    record[column] = converter(value)
+                except ImportRowError as e:
+                    raise ImportRowError(f"{column}: {e}")
+            for column in required:
+                if record.get(column) is None:
+                    raise ImportRowError(f"{column} is required")
+            return record
+
+        return map_row
+
+
+class DeliveryImportTarget(ImportTarget):
+    """Delivery sheets may name the parcel type by code rather than id"""
+
+    def prepare(self, session):
+        self.parcel_type_ids = dict(
+            session.execute(select(ParcelType.code, ParcelType.id)).all()
+        )
+
+    def build_mapper(self, header):
+        map_row = super().build_mapper(header)
+        positions = {normalise_header(name): index for index, name in enumerate(header)}
+        code_index = next(
+            (positions[alias] for alias in ("parcel_type", "parcel_code", "parcel_type_code")
+             if alias in positions),
+            None
+        )
+        if code_index is None:
+            return map_row
+
+        parcel_type_ids = self.parcel_type_ids
+
+        def map_delivery(row):
+            record = map_row(row)
+            if record is None or record.get("parcel_type_id") is not None:
+                return record
+            code = to_str(row[code_index]) if code_index < len(row) else None
+            if code is not None:
+                if code not in parcel_type_ids:
+                    raise ImportRowError(f"unknown parcel type {code!r}")
+                record["parcel_type_id"] = parcel_type_ids[code]
+            return record
+
+        return map_delivery
+
+
+TARGETS = {
+    "patients": ImportTarget(
+        "patients",
+        Patient,
+        {
+            "patient_id": (("patient_id", "patient_no", "patient_number", "patient"), to_int),
+            "house_number": (("house_number", "house_no", "house", "number"), to_str),
+            "street_name": (("street_name", "street", "road_name", "road"), to_str),
+            "town": (("town", "city"), to_str),
+            "exemption_category": (("exemption_category", "exemption", "exemption_cat"), to_str),
+        },
+        required=("patient_id",),
+        key=("patient_id",)
+    ),
+    "streets": ImportTarget(
+        "streets",
+        Street,
+        {
+            "road_name": (("road_name", "road", "street_name", "street"), to_str),
+            "town": (("town", "city"), to_str),
+            "route_order": (("route_order", "route", "order"), to_int),
+            "van_3_assignment": (("van_3_assignment", "van_3", "van3"), to_int),
+            "van_4_assignment": (("van_4_assignment", "van_4", "van4"), to_int),
+        },
+        required=("road_name", "town"),
+        key=("road_name", "town")
+    ),
+    "deliveries": DeliveryImportTarget(
+        "deliveries",
+        Delivery,
+        {
+            "patient_id": (("patient_id", "patient_no", "patient_number", "patient"), to_int),
+            "delivery_date": (("delivery_date", "date"), to_date),
+            "van_number": (("van_number", "van"), to_int),
+            "route_order": (("route_order", "route", "order"), to_int),
+            "notes": (("notes", "note", "comments"), to_str),
+            "status": (("status",), to_str),
+            "parcel_type_id": (("parcel_type_id",), to_int),
+        },
+        required=("patient_id", "delivery_date")
+    ),
+}
+
+
+# Source readers
+
+def iter_source_rows(path, sheet_name=None):
+    """Return ``(header, rows)`` for an .xlsx or .csv file.
+
+    ``rows`` is a lazy iterator of tuples; the file is never fully loaded.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in (".xlsx", ".xlsm"):
+        return _iter_xlsx_rows(path, sheet_name)
+    if suffix in (".csv", ".txt"):
+        return _iter_csv_rows(path)
+    raise ValueError(f"Unsupported import file type: {path.suffix}")
+
+
+def _iter_xlsx_rows(path, sheet_name):
+    # openpyxl is only needed for imports, so keep it off the startup path
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    sheet = workbook[sheet_name] if sheet_name else workbook.active
+    rows = sheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        workbook.close()
+        raise ValueError(f"{path.name} is empty")
+
+    def generate():
+        try:
+            yield from rows
+        finally:
+            workbook.close()
+
+    return tuple(header), generate()
+
+
+def _iter_csv_rows(path):
+    handle = open(path, newline="", encoding="utf-8-sig")
+    reader = csv.reader(handle)
+    header = next(reader, None)
+    if header is None:
+        handle.close()
+        raise ValueError(f"{path.name} is empty")
+
+    def generate():
+        with handle:
+            for row in reader:
+                yield tuple(row)
+
+    return tuple(header), generate()
+
+
+def source_fingerprint(path):
+    """Identify a source file well enough to tell whether a checkpoint applies"""
+    stat = Path(path).stat()
+    return f"{Path(path).name}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+# Progress and results
+
+class ImportProgress:
+    def __init__(self, target, rows_read, rows_written, elapsed, resumed_from=0):
+        self.target = target
+        self.rows_read = rows_read
+        self.rows_written = rows_written
+        self.elapsed = elapsed
+        self.resumed_from = resumed_from
+
+    @property
+    def rows_per_sec(self):
+        # Rows skipped on a resume take no time, so leave them out
+        read = self.rows_read - self.resumed_from
+        return read / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return (f"ImportProgress({self.target}: {self.rows_read} read, "
+                f"{self.rows_written} written, {self.rows_per_sec:.0f} rows/s)")
+
+
+class ImportResult:
+    def __init__(self, target):
+        self.target = target
+        self.rows_read = 0
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.resumed_from = 0
+        self.elapsed = 0.0
+        self.errors = []
+
+    @property
+    def rows_per_sec(self):
+        read = self.rows_read - self.resumed_from
+        return read / self.elapsed if self.elapsed > 0 else 0.0
+
+    def add_error(self, row_number, message):
+        self.rows_skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+
+# Checkpointing
+
+class ImportCheckpoint:
+    """Resume position for an import, stored in ``system_settings``.
+
+    The checkpoint is written in the same transaction as the batch it
+    describes, so a crash can never leave it ahead of or behind the data.
+    """
+
+    def __init__(self, target, fingerprint):
+        self.key = f"{CHECKPOINT_KEY_PREFIX}{target}"
+        self.fingerprint = fingerprint
+
+    def load(self, session):
+        """Return the number of source rows already committed"""
+        value = session.execute(
+            select(SystemSetting.value).where(SystemSetting.key == self.key)
+        ).scalar()
+        if not value:
+            return 0
+        state = json.loads(value)
+        if state.get("source") != self.fingerprint:
+            return 0
+        return state.get("rows_done", 0)
+
+    def save(self, session, rows_done):
+        value = json.dumps({"source": self.fingerprint, "rows_done": rows_done})
+        stmt = sqlite_insert(SystemSetting).values(
+            key=self.key, value=value, description="Import resume position"
+        )
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[SystemSetting.key], set_={"value": value}
+        ))
+
+    def clear(self, session):
+        session.execute(delete(SystemSetting).where(SystemSetting.key == self.key))
+
+
+# Importer
+
+class StreamingImporter:
+    """Import a workbook into one table in constant memory.
+
+    ``progress_callback`` is called with an :class:`ImportProgress` after
+    every committed batch. With ``resume=True`` an interrupted import of the
+    same file continues after the last committed batch.
+    """
+
+    def __init__(self, session_factory=get_db_session, batch_size=DEFAULT_BATCH_SIZE,
+                 progress_callback=None, resume=True):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.progress_callback = progress_callback
+        self.resume = resume
+
+    def import_file(self, path, target="patients", sheet_name=None):
+        """Import ``path`` into ``target`` and return an :class:`ImportResult`"""
+        import_target = self._get_target(target)
+        header, rows = iter_source_rows(path, sheet_name)
+        checkpoint = ImportCheckpoint(import_target.name, source_fingerprint(path))
+        return self._run(import_target, header, rows, checkpoint)
+
+    def _get_target(self, target):
+        if target not in TARGETS:
+            raise ValueError(f"Unknown import target: {target}")
+        return TARGETS[target]
+
+    def _new_result(self, import_target):
+        return ImportResult(import_target.name)
+
+    def _start(self, session, import_target, header, result):
+        """Hook run once the heading row has been mapped"""
+
+    def _accept(self, record, row_number, result):
+        """Return the record to write, or None to leave it out of the batch"""
+        return record
+
+    def _write_batch(self, session, import_target, batch):
+        """Write ``batch`` and return the positions of records left out
+
+        Tables with a natural key insert with ``ON CONFLICT DO NOTHING``
+        and return the key of each row written; a record whose key did
+        not come back already existed, or repeated an earlier record
+        (the first occurrence is the one inserted).
+        """
+        table = import_target.table
+        if not import_target.key:
+            session.execute(insert(table), batch)
+            return []
+
+        key_columns = [table.c[column] for column in import_target.key]
+        stmt = sqlite_insert(table).on_conflict_do_nothing().returning(*key_columns)
+        written = Counter(tuple(row) for row in session.execute(stmt, batch))
+        skipped = []
+        for position, record in enumerate(batch):
+            key = tuple(record.get(column) for column in import_target.key)
+            if written[key]:
+                written[key] -= 1
+            else:
+                skipped.append(position)
+        return skipped
+
+    def _finish(self, session, import_target, result):
+        """Hook for work that must share the final transaction"""
+
+    def _run(self, import_target, header, rows, checkpoint):
+        result = self._new_result(import_target)
+        session = self.session_factory()
+        try:
+            import_target.prepare(session)
+            map_row = import_target.build_mapper(header)
+            self._start(session, import_target, header, result)
+
+            skip = checkpoint.load(session) if self.resume else 0
+            result.resumed_from = skip
+            started = time.perf_counter()
+            batch = []
+            batch_rows = []
+            row_number = 1  # the header is row 1
+
+            for row in rows:
+                row_number += 1
+                result.rows_read += 1
+                if result.rows_read <= skip:
+                    continue
+                try:
+                    record = map_row(row)
+                except ImportRowError as e:
+                    result.add_error(row_number, str(e))
+                    continue
+                if record is not None:
+                    record = self._accept(record, row_number, result)
+                if record is not None:
+                    batch.append(record)
+                    batch_rows.append(row_number)
+                if len(batch) >= self.batch_size:
+                    self._commit_batch(session, import_target, batch, batch_rows, checkpoint, result, started)
+                    batch = []
+                    batch_rows = []
+
+            if batch:
+                self._commit_batch(session, import_target, batch, batch_rows, checkpoint, result, started)
+            self._finish(session, import_target, result)
+            checkpoint.clear(session)
+            session.commit()
+            result.elapsed = time.perf_counter() - started
+            return result
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            close = getattr(rows, "close", None)
+            if close is not None:
+                close()
+            session.close()
+
+    def _commit_batch(self, session, import_target, batch, batch_rows, checkpoint, result, started):
+        skipped = self._write_batch(session, import_target, batch) or []
+        for position in skipped:
+            key = tuple(batch[position].get(column) for column in import_target.key)
+            result.add_error(batch_rows[position], f"{import_target.name} {key} already exists")
+        checkpoint.save(session, result.rows_read)
+        session.commit()
+        result.rows_written += len(batch) - len(skipped)
+
+        if self.progress_callback is not None:
+            self.progress_callback(ImportProgress(
+                import_target.name,
+                result.rows_read,
+                result.rows_written,
+                time.perf_counter() - started,
+                result.resumed_from
+            ))
+
+
+def import_file(path, target="patients", **options):
+    """Convenience wrapper around :class:`StreamingImporter`"""
+    sheet_name = options.pop("sheet_name", None)
+    return StreamingImporter(**options).import_file(path, target, sheet_name)
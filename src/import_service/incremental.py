@@ -0,0 +1,159 @@
+"""Incremental (diff) import for the weekly patient and street workbooks.
+
+Only the key and a short content hash of each existing row are loaded. Each
+source row is hashed the same way and classified as added, changed or
+unchanged; unchanged rows never reach the database, and the rest are sent
+as a bulk ``INSERT ... ON CONFLICT DO UPDATE``.
+"""
+import hashlib
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .importer import ImportResult, StreamingImporter, iter_source_rows
+
+# Marks a key that has already been seen in the current source file
+_SEEN = object()
+
+DELETE_CHUNK_SIZE = 500
+
+
+def content_hash(values):
+    """Short, stable digest of a row's values"""
+    return hashlib.blake2b(repr(tuple(values)).encode(), digest_size=8).digest()
+
+
+class DiffResult(ImportResult):
+    def __init__(self, target):
+        super().__init__(target)
+        self.added = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.duplicates = 0
+
+    def __repr__(self):
+        return (f"DiffResult({self.target}: +{self.added} ~{self.changed} "
+                f"={self.unchanged} -{self.removed})")
+
+
+class IncrementalImporter(StreamingImporter):
+    """Apply only the differences between a workbook and the database.
+
+    Rows present in the database but missing from the workbook are counted
+    as removed; they are deleted only when ``delete_missing`` is set.
+    Resuming is not supported because a re-run costs little more than the
+    diff itself.
+    """
+
+    def __init__(self, delete_missing=False, **options):
+        options["resume"] = False
+        super().__init__(**options)
+        self.delete_missing = delete_missing
+
+    def import_file(self, path, target="patients", sheet_name=None):
+        import_target = self._get_target(target)
+        if not import_target.key:
+            raise ValueError(f"{target} has no natural key and cannot be imported incrementally")
+        header, rows = iter_source_rows(path, sheet_name)
+        return self._run(import_target, header, rows, _NoCheckpoint())
+
+    def _new_result(self, import_target):
+        return DiffResult(import_target.name)
+
+    def _start(self, session, import_target, header, result):
+        self.key_columns = import_target.key
+        self.primary_key = import_target.table.primary_key.columns.values()[0].name
+        self.value_columns = [column for column, _, _ in import_target.plan(header)
+                              if column not in import_target.key]
+        self.existing = self._load_existing(session, import_target)
+
+    def _load_existing(self, session, import_target):
+        """Map each existing key to ``(primary key, content hash)``"""
+        table = import_target.table
+        stmt = select(
+            table.c[self.primary_key],
+            *(table.c[column] for column in self.key_columns),
+            *(table.c[column] for column in self.value_columns)
+        ).execution_options(yield_per=10000)
+
+        key_width = len(self.key_columns)
+        existing = {}
+        for row in session.execute(stmt):
+            key = tuple(row[1:1 + key_width])
+            existing[key] = (row[0], content_hash(row[1 + key_width:]))
+        return existing
+
+    def _accept(self, record, row_number, result):
+        key = tuple(record[column] for column in self.key_columns)
+        current = self.existing.get(key)
+
+        if current is _SEEN:
+            result.duplicates += 1
+            result.add_error(row_number, f"duplicate key {key}")
+            return None
+
+        self.existing[key] = _SEEN
+        if current is None:
+            result.added += 1
+            return record
+
+        row_id, digest = current
+        if digest == content_hash(record[column] for column in self.value_columns):
+            result.unchanged += 1
+            return None
+
+        result.changed += 1
+        record.setdefault(self.primary_key, row_id)
+        return record
+
+    def _write_batch(self, session, import_target, batch):
+        table = import_target.table
+        # Changed street rows carry their id so they conflict on the primary
+        # key; new rows do not. executemany needs one key set per call.
+        groups = {}
+        for record in batch:
+            groups.setdefault(frozenset(record), []).append(record)
+
+        for records in groups.values():
+            stmt = sqlite_insert(table)
+            update_columns = {
+                column: stmt.excluded[column]
+                for column in records[0]
+                if column != self.primary_key
+            }
+            session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[table.c[self.primary_key]], set_=update_columns
+                ),
+                records
+            )
+
+    def _finish(self, session, import_target, result):
+        missing = [key for key, value in self.existing.items() if value is not _SEEN]
+        result.removed = len(missing)
+        if self.delete_missing and missing:
+            table = import_target.table
+            key_columns = tuple_(*(table.c[column] for column in self.key_columns))
+            for start in range(0, len(missing), DELETE_CHUNK_SIZE):
+                session.execute(
+                    delete(table).where(key_columns.in_(missing[start:start + DELETE_CHUNK_SIZE]))
+                )
+        self.existing = {}
+
+
+class _NoCheckpoint:
+    def load(self, session):
+        return 0
+
+    def save(self, session, rows_done):
+        pass
+
+    def clear(self, session):
+        pass
+
+
+def import_changes(path, target="patients", **options):
+    """Convenience wrapper around :class:`IncrementalImporter`"""
+    sheet_name = options.pop("sheet_name", None)
+    return IncrementalImporter(**options).import_file(path, target, sheet_name)
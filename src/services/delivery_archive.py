@@ -0,0 +1,226 @@
+"""Per-year archive databases for old deliveries.
+
+Deliveries older than a cutoff move out of the live ``deliveries`` table
+into one SQLite file per year (``archive/deliveries_2024.sqlite`` next to
+the main database), so the daily queries only ever see recent rows. The
+files are ATTACHed to a connection when a read needs them.
+
+Reads that may reach into history go through :meth:`DeliveryArchive.deliveries`,
+which returns a UNION ALL of the live table and every archive year the
+date range touches; it has the same columns as ``deliveries``.
+"""
+import re
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy import Column, Index, MetaData, Table, insert, literal, select, union_all
+
+from src.database.change_log import ChangeFeed
+from src.database.delivery_counts import add_counts
+from src.database.models import Delivery
+
+DEFAULT_KEEP_DAYS = 365
+KEEP_DAYS_SETTING = "archive_keep_days"
+# SQLite allows ten attached databases by default; keep one spare
+MAX_ATTACHED = 9
+ARCHIVE_FILE = re.compile(r"^deliveries_(\d{4})\.sqlite$")
+
+_metadata = MetaData()
+_tables: dict[int, Table] = {}
+_tables_lock = threading.Lock()
+
+
+def schema_name(year):
+    return f"archive_{year}"
+
+
+def archive_table(year):
+    """The ``deliveries`` table inside one year's archive"""
+    with _tables_lock:
+        table = _tables.get(year)
+        if table is None:
+            # Same columns as the live table, without foreign keys: the
+            # archive file has no patients or parcel types to point at
+            table = Table(
+                "deliveries", _metadata,
+                *[Column(column.name, column.type, primary_key=column.primary_key)
+                  for column in Delivery.__table__.columns],
+                schema=schema_name(year),
+            )
+            Index(f"ix_archive_{year}_delivery_date", table.c.delivery_date)
+            Index(f"ix_archive_{year}_patient_id_delivery_date", table.c.patient_id, table.c.delivery_date)
+            _tables[year] = table
+        return table
+
+
+class ArchiveResult:
+    def __init__(self, cutoff):
+        self.cutoff = cutoff
+        # year -> deliveries moved
+        self.moved = {}
+
+    @property
+    def total(self):
+        return sum(self.moved.values())
+
+
+class DeliveryArchive:
+    """Moves old deliveries into yearly archive files and reads across them"""
+
+    def __init__(self, engine=None, directory=None, keep_days=None):
+        if engine is None:
+            from src.database.database import db_manager
+            engine = db_manager.engine
+            directory = directory or db_manager.db_path.parent / "archive"
+        self.engine = engine
+        if directory is None:
+            database = engine.url.database
+            if not database or database == ":memory:":
+                raise ValueError("An archive directory is needed for an in-memory database")
+            directory = Path(database).parent / "archive"
+        self.directory = Path(directory)
+        self.keep_days = keep_days
+
+    def path_for(self, year):
+        return self.directory / f"deliveries_{year}.sqlite"
+
+    def years(self):
+        """Years that have an archive file"""
+        if not self.directory.exists():
+            return []
+        return sorted(
+            int(match.group(1))
+            for match in map(ARCHIVE_FILE.match, (path.name for path in self.directory.iterdir()))
+            if match
+        )
+
+    def default_cutoff(self, today=None):
+        """First date kept in the live table"""
+        keep_days = self.keep_days
+        if keep_days is None:
+            from src.services.settings_manager import SettingsManager
+            keep_days = int(SettingsManager().get_system_setting(KEEP_DAYS_SETTING, DEFAULT_KEEP_DAYS))
+        return (today or date.today()) - timedelta(days=keep_days)
+
+    # Attaching
+
+    def attach(self, connection, years, create=False):
+        """Make the archives for ``years`` available on ``connection``
+
+        Attachments belong to the DBAPI connection, so they survive being
+        returned to the pool; the least recently used are detached once
+        the SQLite limit is near. Years without a file are skipped unless
+        ``create`` is set. Returns the years that are attached.
+        """
+        attached = connection.info.setdefault("archive_years", [])
+        available = []
+        for year in years:
+            if year in attached:
+                attached.remove(year)
+                attached.append(year)
+                available.append(year)
+                continue
+            path = self.path_for(year)
+            if not path.exists() and not create:
+                continue
+            while len(attached) >= MAX_ATTACHED:
+                connection.exec_driver_sql(f"DETACH DATABASE {schema_name(attached.pop(0))}")
+            self.directory.mkdir(parents=True, exist_ok=True)
+            connection.exec_driver_sql(f"ATTACH DATABASE ? AS {schema_name(year)}", (str(path),))
+            attached.append(year)
+            available.append(year)
+        return available
+
+    # Moving rows
+
+    def archive(self, cutoff=None):
+        """Move every delivery dated before ``cutoff`` into its year's archive
+
+        Each year is one transaction that copies the rows and then deletes
+        them from the live table. The copy uses INSERT OR REPLACE, so if a
+        run is interrupted between the two files a rerun finishes the job
+        without duplicating anything. The deletes fill the change log,
+        so it is pruned afterwards.
+        """
+        cutoff = cutoff or self.default_cutoff()
+        result = ArchiveResult(cutoff)
+        live = Delivery.__table__
+
+        oldest_query = select(live.c.delivery_date).order_by(live.c.delivery_date).limit(1)
+
+        with self.engine.connect() as connection:
+            # Each pass empties the oldest year left, so years without any
+            # deliveries never get an archive file
+            while True:
+                oldest = connection.execute(oldest_query).scalar()
+                if oldest is None or oldest >= cutoff:
+                    break
+                year = oldest.year
+                start, end = date(year, 1, 1), min(date(year + 1, 1, 1), cutoff)
+                in_range = (live.c.delivery_date >= start) & (live.c.delivery_date < end)
+                # ATTACH has to happen outside a transaction
+                connection.commit()
+                self.attach(connection, [year], create=True)
+                table = archive_table(year)
+                table.create(connection, checkfirst=True)
+                moved = connection.execute(
+                    insert(table).prefix_with("OR REPLACE").from_select(
+                        [column.name for column in live.columns],
+                        select(*live.columns).where(in_range)
+                    )
+                ).rowcount
+                # The days still happened: keep them in the daily counts
+                # that the delete trigger is about to take them out of
+                add_counts(connection, in_range)
+                connection.execute(live.delete().where(in_range))
+                connection.commit()
+                if moved:
+                    result.moved[year] = moved
+        if result.moved:
+            ChangeFeed(self.engine).prune()
+        return result
+
+    # Reading
+
+    def deliveries(self, connection, start_date=None, end_date=None):
+        """Subquery of deliveries from the live table and the archives
+
+        Only archives whose year overlaps ``start_date``..``end_date``
+        (either may be None for open-ended) are included, and they are
+        attached to ``connection`` as needed. A ``source`` column tells
+        which table a row came from (None for the live table).
+        """
+        live = Delivery.__table__
+        years = [
+            year for year in self.years()
+            if (start_date is None or year >= start_date.year)
+            and (end_date is None or year <= end_date.year)
+        ]
+        if len(years) > MAX_ATTACHED:
+            raise ValueError(
+                f"A single read can span at most {MAX_ATTACHED} archive years; "
+                f"narrow the date range ({len(years)} years requested)"
+            )
+        years = self.attach(connection, years)
+
+        def part(table, source):
+            stmt = select(*table.columns, literal(source).label("source"))
+            if start_date is not None:
+                stmt = stmt.where(table.c.delivery_date >= start_date)
+            if end_date is not None:
+                stmt = stmt.where(table.c.delivery_date <= end_date)
+            return stmt
+
+        parts = [part(live, None)] + [part(archive_table(year), year) for year in years]
+        return union_all(*parts).subquery("all_deliveries")
+
+    def patient_history(self, patient_id, start_date=None, end_date=None):
+        """Every delivery for a patient across the live table and archives, oldest first"""
+        with self.engine.connect() as connection:
+            deliveries = self.deliveries(connection, start_date, end_date)
+            return connection.execute(
+                select(deliveries)
+                .where(deliveries.c.patient_id == patient_id)
+                .order_by(deliveries.c.delivery_date, deliveries.c.id)
+            ).all()
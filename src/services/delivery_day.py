@@ -0,0 +1,343 @@
+"""A day's deliveries held as columns, for planning in memory.
+
+:class:`DeliveryDayService` loads a day with one Core select into a
+:class:`DeliveryDay`: numpy arrays for the numbers and plain lists for
+the text, with repeated strings (street names, towns, statuses, parcel
+codes) shared rather than copied per row. A 20,000 parcel day is a few
+megabytes and no ORM identity map, instead of one ``Delivery``,
+``Patient`` and ``ParcelType`` object graph per parcel.
+
+Planning (van balancing, list order, grouping by van for printing) runs
+on the arrays. :meth:`DeliveryDayService.save` then writes back every row
+whose van or route order was changed, in one executemany UPDATE.
+"""
+import sys
+
+import numpy as np
+from sqlalchemy import and_, select
+
+from src.database.database import get_db_session
+from src.database.models import Delivery, Patient, Street, ParcelType
+from src.services.delivery_list import DeliveryListEntry, VAN_ASSIGNMENT_COLUMNS, house_number_key
+from src.services.street_index import street_index
+
+def _int_column(values):
+    """int64 array with None stored as 0"""
+    return np.fromiter((value or 0 for value in values), dtype=np.int64, count=len(values))
+
+def _text_column(values, shared):
+    """List of the values, with equal strings sharing one object"""
+    return [shared.setdefault(value, value) for value in values]
+
+def _rank(values):
+    """Integer sort key for a list of strings (None sorts as '')"""
+    _, inverse = np.unique(np.array([value or "" for value in values], dtype=object), return_inverse=True)
+    return inverse
+
+class DeliveryDay:
+    """One day's deliveries as parallel columns
+
+    Row ``i`` is ``ids[i]``, ``van_numbers[i]``, ``street_names[i]`` and
+    so on. Van number and route order start as the day's list shows them:
+    the delivery's own, else its street's for ``van_count`` vans. A
+    missing number is 0. Use :meth:`entry` or :meth:`entries` where code
+    expects :class:`DeliveryListEntry` rows.
+
+    Change vans and route orders through :meth:`assign` or
+    :meth:`balance`, which mark the rows as planned; only planned rows
+    are saved.
+    """
+
+    __slots__ = (
+        "delivery_date", "van_count", "ids", "patient_ids", "house_numbers", "street_names",
+        "towns", "street_ids", "street_route_orders", "van_numbers", "route_orders",
+        "statuses", "notes", "parcel_codes", "requires_signature",
+        "_stored_vans", "_stored_routes", "_planned",
+    )
+
+    def __init__(self, delivery_date, van_count, ids, patient_ids, house_numbers, street_names,
+                 towns, street_ids, street_route_orders, van_numbers, route_orders,
+                 statuses, notes, parcel_codes, requires_signature):
+        self.delivery_date = delivery_date
+        self.van_count = van_count
+        self.ids = ids
+        self.patient_ids = patient_ids
+        self.house_numbers = house_numbers
+        self.street_names = street_names
+        self.towns = towns
+        self.street_ids = street_ids
+        self.street_route_orders = street_route_orders
+        self.van_numbers = van_numbers
+        self.route_orders = route_orders
+        self.statuses = statuses
+        self.notes = notes
+        self.parcel_codes = parcel_codes
+        self.requires_signature = requires_signature
+        # What the deliveries table holds, which may be 0 where the
+        # street supplies the value shown
+        self._stored_vans = van_numbers.copy()
+        self._stored_routes = route_orders.copy()
+        self._planned = np.zeros(len(ids), dtype=bool)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        """Memory held by the columns (shared strings counted once)"""
+        arrays = (self.ids, self.patient_ids, self.street_ids, self.street_route_orders,
+                  self.van_numbers, self.route_orders, self.requires_signature,
+                  self._stored_vans, self._stored_routes, self._planned)
+        lists = (self.house_numbers, self.street_names, self.towns, self.statuses,
+                 self.notes, self.parcel_codes)
+        strings = {id(value): value for column in lists for value in column if value is not None}
+        return (sum(array.nbytes for array in arrays)
+                + sum(sys.getsizeof(column) for column in lists)
+                + sum(sys.getsizeof(value) for value in strings.values()))
+
+    # Rows
+
+    def entry(self, index):
+        """Row ``index`` as a :class:`DeliveryListEntry`"""
+        return DeliveryListEntry(
+            int(self.ids[index]),
+            int(self.patient_ids[index]) or None,
+            self.house_numbers[index],
+            self.street_names[index],
+            self.towns[index],
+            int(self.street_ids[index]) or None,
+            int(self.van_numbers[index]) or None,
+            int(self.route_orders[index]) or None,
+            self.statuses[index],
+            self.notes[index],
+            self.parcel_codes[index],
+            bool(self.requires_signature[index]) if self.parcel_codes[index] is not None else None,
+        )
+
+    def entries(self, indices=None):
+        """Rows as entries; every row in list order if ``indices`` is None"""
+        if indices is None:
+            indices = self.list_order()
+        positions = np.asarray(indices).tolist()
+
+        def numbers(column):
+            return [value or None for value in column[positions].tolist()]
+
+        def texts(column):
+            return [column[position] for position in positions]
+
+        parcel_codes = texts(self.parcel_codes)
+        signatures = [
+            signature if code is not None else None
+            for signature, code in zip(self.requires_signature[positions].tolist(), parcel_codes)
+        ]
+        return list(map(DeliveryListEntry._make, zip(
+            self.ids[positions].tolist(), numbers(self.patient_ids),
+            texts(self.house_numbers), texts(self.street_names), texts(self.towns),
+            numbers(self.street_ids), numbers(self.van_numbers), numbers(self.route_orders),
+            texts(self.statuses), texts(self.notes), parcel_codes, signatures,
+        )))
+
+    # Planning
+
+    def house_keys(self):
+        """Leading number of each house number, as :func:`house_number_key` reads it"""
+        return np.fromiter(map(house_number_key, self.house_numbers), dtype=np.int64, count=len(self))
+
+    def list_order(self):
+        """Row indices in delivery list order
+
+        Van, then route order (missing ones last), street name and house
+        number: the order :meth:`DeliveryListService.generate` returns.
+        """
+        return np.lexsort((
+            _rank(self.house_numbers),
+            self.house_keys(),
+            _rank(self.street_names),
+            self.route_orders,
+            self.route_orders == 0,
+            self.van_numbers,
+            self.van_numbers == 0,
+        ))
+
+    def by_van(self):
+        """``{van number: row indices in list order}``; no van is None"""
+        order = self.list_order()
+        vans = self.van_numbers[order]
+        groups = {}
+        for van in np.unique(vans):
+            groups[int(van) or None] = order[vans == van]
+        return dict(sorted(groups.items(), key=lambda item: (item[0] is None, item[0] or 0)))
+
+    def assign(self, indices, van_number, route_orders=None):
+        """Put the rows at ``indices`` on ``van_number``, optionally with new route orders"""
+        self.van_numbers[indices] = van_number
+        if route_orders is not None:
+            self.route_orders[indices] = route_orders
+        self._planned[indices] = True
+
+    def balance(self, van_count):
+        """Split the day over ``van_count`` vans in contiguous runs of whole streets
+
+        Deliveries are put in route order (street route order, street,
+        house number) and cut as :class:`VanBalancer` does; every row's
+        van and route order are replaced. Returns parcels per van.
+        """
+        from src.services.van_balancer import balance_streets
+
+        if not len(self):
+            return np.zeros(van_count, dtype=np.int64)
+        # Streets without a route order go last, then addresses with no street
+        street_order = np.where(
+            self.street_route_orders > 0, self.street_route_orders, self.street_route_orders.max() + 1
+        )
+        # Addresses with no street are grouped by name under negative keys
+        streets = self.street_ids.copy()
+        unknown = streets == 0
+        if unknown.any():
+            names = [f"{self.street_names[index] or ''}|{self.towns[index] or ''}"
+                     for index in np.flatnonzero(unknown)]
+            streets[unknown] = -1 - _rank(names)
+
+        order = np.lexsort((self.ids, self.house_keys(), streets, street_order))
+        self.van_numbers[order] = balance_streets(streets[order], van_count) + 1
+        self.route_orders[:] = street_order
+        self._planned[:] = True
+        return np.bincount(self.van_numbers - 1, minlength=van_count)
+
+    # Saving
+
+    def changed(self):
+        """Indices of planned rows whose van or route order differ from the table
+
+        A planned row that only showed its street's van is written even
+        if the van is the same, so the plan no longer depends on the
+        street assignment.
+        """
+        return np.flatnonzero(self._planned & (
+            (self.van_numbers != self._stored_vans) | (self.route_orders != self._stored_routes)
+        ))
+
+    def mark_saved(self):
+        self._stored_vans = self.van_numbers.copy()
+        self._stored_routes = self.route_orders.copy()
+        self._planned[:] = False
+
+class DeliveryDayService:
+    """Loads and saves :class:`DeliveryDay` columns"""
+
+    def __init__(self, session_factory=get_db_session, streets=street_index):
+        self.session_factory = session_factory
+        self.streets = streets
+
+    def build_query(self, delivery_date, van_count=3):
+        try:
+            street_van = VAN_ASSIGNMENT_COLUMNS[van_count]
+        except KeyError:
+            raise ValueError(
+                f"No street assignment for {van_count} vans "
+                f"(expected one of {sorted(VAN_ASSIGNMENT_COLUMNS)})"
+            )
+        return (
+            select(
+                Delivery.id, Delivery.patient_id,
+                Patient.house_number, Patient.street_name, Patient.town,
+                Street.id, Street.route_order, street_van,
+                Delivery.van_number, Delivery.route_order,
+                Delivery.status, Delivery.notes,
+                ParcelType.code, ParcelType.requires_signature,
+            )
+            .select_from(Delivery)
+            .outerjoin(Patient, Patient.patient_id == Delivery.patient_id)
+            .outerjoin(Street, and_(
+                Street.road_name == Patient.street_name,
+                Street.town == Patient.town
+            ))
+            .outerjoin(ParcelType, ParcelType.id == Delivery.parcel_type_id)
+            .where(Delivery.delivery_date == delivery_date)
+        )
+
+    def load(self, delivery_date, van_count=3):
+        """The day's deliveries as a :class:`DeliveryDay`"""
+        session = self.session_factory()
+        try:
+            # Core rows: nothing here needs an ORM object
+            rows = session.connection().execute(self.build_query(delivery_date, van_count)).all()
+        finally:
+            session.close()
+
+        count = len(rows)
+        (ids, patient_ids, house_numbers, street_names, towns, street_ids, street_routes,
+         street_vans, vans, routes, statuses, notes, parcel_codes, signatures) = (
+            zip(*rows) if rows else [()] * 14
+        )
+        shared = {}
+        day = DeliveryDay(
+            delivery_date, van_count,
+            ids=_int_column(ids),
+            patient_ids=_int_column(patient_ids),
+            house_numbers=_text_column(house_numbers, shared),
+            street_names=_text_column(street_names, shared),
+            towns=_text_column(towns, shared),
+            street_ids=_int_column(street_ids),
+            street_route_orders=_int_column(street_routes),
+            # As on the day's list: the delivery's own, else its street's
+            van_numbers=_int_column([van or street_van for van, street_van in zip(vans, street_vans)]),
+            route_orders=_int_column([route or street_route for route, street_route in zip(routes, street_routes)]),
+            statuses=_text_column(statuses, shared),
+            notes=list(notes),
+            parcel_codes=_text_column(parcel_codes, shared),
+            requires_signature=np.fromiter((bool(value) for value in signatures), dtype=bool, count=count),
+        )
+        day._stored_vans = _int_column(vans)
+        day._stored_routes = _int_column(routes)
+        self._resolve_unmatched(day)
+        return day
+
+    def _resolve_unmatched(self, day):
+        """Street, and van and route order if unset, for addresses that only match once normalised"""
+        unmatched = np.flatnonzero(day.street_ids == 0)
+        resolved = {}
+        for index in unmatched:
+            street_name, town = day.street_names[index], day.towns[index]
+            if not street_name:
+                continue
+            key = (street_name, town)
+            if key not in resolved:
+                resolved[key] = self.streets.lookup(street_name, town)
+            street = resolved[key]
+            if street is None:
+                continue
+            day.street_ids[index] = street.id
+            day.street_route_orders[index] = street.route_order or 0
+            if not day.van_numbers[index]:
+                day.van_numbers[index] = street.van(day.van_count) or 0
+            if not day.route_orders[index]:
+                day.route_orders[index] = street.route_order or 0
+
+    def save(self, day):
+        """Write back the rows whose van or route order changed; returns how many"""
+        from src.services.van_balancer import ASSIGN_VAN
+
+        changed = day.changed()
+        if not len(changed):
+            return 0
+        assignments = [
+            (van or None, route_order or None, delivery_id)
+            for van, route_order, delivery_id in zip(
+                day.van_numbers[changed].tolist(),
+                day.route_orders[changed].tolist(),
+                day.ids[changed].tolist(),
+            )
+        ]
+        session = self.session_factory()
+        try:
+            session.connection().exec_driver_sql(ASSIGN_VAN, assignments)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        day.mark_saved()
+        return len(assignments)
@@ -0,0 +1,133 @@
+import csv
+import time
+from pathlib import Path
+
+from src.database.database import get_reporting_session
+from src.services.delivery_list import DeliveryListService
+
+# (header, DeliveryListEntry field); the delivery date comes first
+EXPORT_COLUMNS = [
+    ("Van", "van_number"),
+    ("Stop", "route_order"),
+    ("Patient ID", "patient_id"),
+    ("House", "house_number"),
+    ("Street", "street_name"),
+    ("Town", "town"),
+    ("Parcel", "parcel_code"),
+    ("Signature", "requires_signature"),
+    ("Status", "status"),
+    ("Notes", "notes"),
+]
+
+# Rows per worksheet allowed by Excel, less the header row
+XLSX_SHEET_ROWS = 1048576 - 1
+
+class ExportResult:
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self.days = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+class DeliveryExporter:
+    """Writes delivery lists for a range of dates to .xlsx or .csv
+
+    Rows are streamed from :meth:`DeliveryListService.iter_history` into
+    the file as they arrive: CSV through the csv module and Excel through
+    openpyxl's write-only mode, which spools rows to disk instead of
+    keeping cells in memory. No ORM objects or DataFrames are built, so a
+    year of history exports in the same memory as a single day.
+
+    By default the rows come from the reporting snapshot (see
+    ``DatabaseManager.reporting_engine``), so a long export never holds a
+    read lock on the live database; it reads the live database when
+    snapshots are not scheduled or the latest one is out of date.
+
+    ``progress_callback`` is called with the :class:`ExportResult` after
+    each day is written.
+    """
+
+    def __init__(self, list_service=None, batch_size=2000, progress_callback=None):
+        self.list_service = list_service or DeliveryListService(get_reporting_session)
+        self.batch_size = batch_size
+        self.progress_callback = progress_callback
+
+    def export(self, path, start_date, end_date=None, van_count=3):
+        """Export every list from ``start_date`` to ``end_date`` inclusive
+
+        The format follows the file extension (.xlsx or .csv).
+        """
+        path = Path(path)
+        suffix = path.suffix.lower()
+        if suffix not in (".xlsx", ".csv"):
+            raise ValueError(f"Unsupported export format: {path.suffix} (use .xlsx or .csv)")
+
+        started = time.perf_counter()
+        result = ExportResult(path)
+        rows = self._rows(start_date, end_date or start_date, van_count, result, started)
+        if suffix == ".xlsx":
+            self._write_xlsx(path, rows)
+        else:
+            self._write_csv(path, rows)
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def _rows(self, start_date, end_date, van_count, result, started):
+        fields = [field for _, field in EXPORT_COLUMNS]
+        signature = 1 + fields.index("requires_signature")
+        current = None
+        history = self.list_service.iter_history(start_date, end_date, van_count, self.batch_size)
+        for delivery_date, entry in history:
+            if delivery_date != current:
+                if current is not None:
+                    self._report(result, started)
+                current = delivery_date
+                result.days += 1
+            row = [delivery_date]
+            row.extend(getattr(entry, field) for field in fields)
+            # Shown as Yes/No rather than TRUE/FALSE or 1/0
+            row[signature] = "Yes" if row[signature] else "No"
+            result.rows += 1
+            yield row
+        if current is not None:
+            self._report(result, started)
+
+    def _report(self, result, started):
+        if self.progress_callback is not None:
+            result.elapsed = time.perf_counter() - started
+            self.progress_callback(result)
+
+    def _header(self):
+        return ["Date"] + [header for header, _ in EXPORT_COLUMNS]
+
+    def _write_csv(self, path, rows):
+        with open(path, "w", newline="", encoding="utf-8") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(self._header())
+            writer.writerows(rows)
+
+    def _write_xlsx(self, path, rows):
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+
+        workbook = Workbook(write_only=True)
+        sheet, sheet_rows = None, XLSX_SHEET_ROWS
+        for row in rows:
+            if sheet_rows == XLSX_SHEET_ROWS:
+                # Carry on in a new sheet once Excel's row limit is reached
+                title = "Deliveries" if sheet is None else f"Deliveries {len(workbook.worksheets) + 1}"
+                sheet = workbook.create_sheet(title)
+                sheet.append(self._header())
+                sheet_rows = 0
+            date_cell = WriteOnlyCell(sheet, value=row[0])
+            date_cell.number_format = "yyyy-mm-dd"
+            row[0] = date_cell
+            sheet.append(row)
+            sheet_rows += 1
+        if sheet is None:
+            workbook.create_sheet("Deliveries").append(self._header())
+        workbook.save(path)
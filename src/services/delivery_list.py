@@ -0,0 +1,238 @@
+import re
+from collections import namedtuple
+from sqlalchemy import Integer, and_, cast, func, select, update
+from src.database.database import get_db_session
+from src.database.models import Delivery, Patient, Street, ParcelType
+from src.services.street_index import street_index
+
+# Street column holding the van for each size of fleet on the road
+VAN_ASSIGNMENT_COLUMNS = {
+    3: Street.van_3_assignment,
+    4: Street.van_4_assignment,
+}
+
+# The leading integer SQLite's CAST(... AS INTEGER) reads from text
+_LEADING_INTEGER = re.compile(r"\s*([+-]?\d+)")
+
+DeliveryListEntry = namedtuple("DeliveryListEntry", [
+    "delivery_id", "patient_id", "house_number", "street_name", "town",
+    "street_id", "van_number", "route_order", "status", "notes",
+    "parcel_code", "requires_signature",
+])
+
+class DeliveryListService:
+    """Builds the daily delivery list in a single set-based query
+
+    Each delivery is joined to its patient and the patient's street. A van
+    set on the delivery itself wins; otherwise the street's assignment for
+    the number of vans running that day is used. Rows come back ordered by
+    van and then route order, ready to print.
+
+    Addresses whose spelling does not match the street exactly ("High St"
+    for "High Street") are resolved through the in-memory street index
+    rather than with a query per patient.
+    """
+
+    def __init__(self, session_factory=get_db_session, streets=street_index):
+        self.session_factory = session_factory
+        self.streets = streets
+
+    def _van_column(self, van_count):
+        try:
+            return VAN_ASSIGNMENT_COLUMNS[van_count]
+        except KeyError:
+            raise ValueError(
+                f"No street assignment for {van_count} vans "
+                f"(expected one of {sorted(VAN_ASSIGNMENT_COLUMNS)})"
+            )
+
+    def build_query(self, delivery_date, van_count=3):
+        """Return the select statement for a day's list"""
+        van_number = func.coalesce(Delivery.van_number, self._van_column(van_count))
+        route_order = func.coalesce(Delivery.route_order, Street.route_order)
+
+        return (
+            select(
+                Delivery.id.label("delivery_id"),
+                Delivery.patient_id,
+                Patient.house_number,
+                Patient.street_name,
+                Patient.town,
+                Street.id.label("street_id"),
+                van_number.label("van_number"),
+                route_order.label("route_order"),
+                Delivery.status,
+                Delivery.notes,
+                ParcelType.code.label("parcel_code"),
+                ParcelType.requires_signature,
+            )
+            .select_from(Delivery)
+            .outerjoin(Patient, Patient.patient_id == Delivery.patient_id)
+            .outerjoin(Street, and_(
+                Street.road_name == Patient.street_name,
+                Street.town == Patient.town
+            ))
+            .outerjoin(ParcelType, ParcelType.id == Delivery.parcel_type_id)
+            .where(Delivery.delivery_date == delivery_date)
+            .order_by(
+                van_number.nulls_last(),
+                route_order.nulls_last(),
+                Patient.street_name,
+                cast(Patient.house_number, Integer),
+                Patient.house_number,
+            )
+        )
+
+    def generate(self, delivery_date, van_count=3):
+        """Return the ordered :class:`DeliveryListEntry` rows for a date"""
+        session = self.session_factory()
+        try:
+            rows = session.execute(self.build_query(delivery_date, van_count)).all()
+        finally:
+            session.close()
+
+        entries = [DeliveryListEntry(*row) for row in rows]
+        unmatched = [
+            index for index, entry in enumerate(entries)
+            if entry.street_id is None and entry.street_name
+        ]
+        if not unmatched:
+            return entries
+
+        for index in unmatched:
+            entries[index] = self._resolve_street(entries[index], van_count)
+        entries.sort(key=_list_order)
+        return entries
+
+    def iter_history(self, start_date, end_date, van_count=3, batch_size=2000):
+        """Yield ``(delivery_date, entry)`` for every list from start to end date
+
+        Days come out in date order, each in list order, and rows are
+        fetched ``batch_size`` at a time as plain tuples, so memory stays
+        flat however long the range. Each day is its own query: sorting a
+        whole year in one statement would build the sort in SQLite's
+        in-memory temp store. Addresses that only match a street once
+        normalised get their van from the street index but keep their
+        place in the day's order.
+        """
+        days = self.days(start_date, end_date)
+        session = self.session_factory()
+        try:
+            for delivery_date in days:
+                stmt = self.build_query(delivery_date, van_count).execution_options(yield_per=batch_size)
+                # Core rows; the ORM result layer adds nothing for plain columns
+                for row in session.connection().execute(stmt):
+                    entry = DeliveryListEntry(*row)
+                    if entry.street_id is None and entry.street_name:
+                        entry = self._resolve_street(entry, van_count)
+                    yield delivery_date, entry
+        finally:
+            session.close()
+
+    def days(self, start_date, end_date):
+        """Dates from ``start_date`` to ``end_date`` that have deliveries, in order"""
+        session = self.session_factory()
+        try:
+            return session.scalars(
+                select(Delivery.delivery_date)
+                .where(Delivery.delivery_date.between(start_date, end_date))
+                .distinct()
+                .order_by(Delivery.delivery_date)
+            ).all()
+        finally:
+            session.close()
+
+    def _resolve_street(self, entry, van_count):
+        street = self.streets.lookup(entry.street_name, entry.town)
+        if street is None:
+            return entry
+        return entry._replace(
+            street_id=street.id,
+            van_number=entry.van_number if entry.van_number is not None else street.van(van_count),
+            route_order=entry.route_order if entry.route_order is not None else street.route_order,
+        )
+
+    def generate_by_van(self, delivery_date, van_count=3):
+        """Return the day's list grouped by van number
+
+        Deliveries whose street has no assignment are grouped under None.
+        """
+        vans = {}
+        for row in self.generate(delivery_date, van_count):
+            vans.setdefault(row.van_number, []).append(row)
+        return vans
+
+    def assign_vans(self, delivery_date, van_count=3, overwrite=False):
+        """Store van and route order on the day's deliveries
+
+        Runs as one UPDATE ... FROM statement. Deliveries that already have
+        a van keep it unless ``overwrite`` is set. Returns the number of
+        deliveries updated.
+        """
+        van_column = self._van_column(van_count)
+        stmt = (
+            update(Delivery)
+            .where(
+                Delivery.delivery_date == delivery_date,
+                Patient.patient_id == Delivery.patient_id,
+                Street.road_name == Patient.street_name,
+                Street.town == Patient.town,
+            )
+            .values(van_number=van_column, route_order=Street.route_order)
+            .execution_options(synchronize_session=False)
+        )
+        if not overwrite:
+            stmt = stmt.where(Delivery.van_number.is_(None))
+
+        session = self.session_factory()
+        try:
+            updated = session.execute(stmt).rowcount
+            updated += self._assign_unmatched(session, delivery_date, van_count, overwrite)
+            session.commit()
+            return updated
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _assign_unmatched(self, session, delivery_date, van_count, overwrite):
+        """Assign deliveries whose address only matches a street once normalised"""
+        stmt = (
+            select(Delivery.id, Patient.street_name, Patient.town)
+            .join(Patient, Patient.patient_id == Delivery.patient_id)
+            .outerjoin(Street, and_(
+                Street.road_name == Patient.street_name,
+                Street.town == Patient.town
+            ))
+            .where(Delivery.delivery_date == delivery_date, Street.id.is_(None))
+        )
+        if not overwrite:
+            stmt = stmt.where(Delivery.van_number.is_(None))
+
+        assignments = []
+        for delivery_id, street_name, town in session.execute(stmt):
+            van, route_order = self.streets.van_for(street_name, town, van_count)
+            if van is not None:
+                assignments.append({"id": delivery_id, "van_number": van, "route_order": route_order})
+        if assignments:
+            session.execute(update(Delivery), assignments)
+        return len(assignments)
+
+def house_number_key(house):
+    """The number ``CAST(house_number AS INTEGER)`` sorts a house by
+
+    The leading integer, so '12a' sorts with 12; 0 if there is none.
+    """
+    match = _LEADING_INTEGER.match(house or "")
+    return int(match.group(1)) if match else 0
+
+def _list_order(entry):
+    # Must agree with the ORDER BY in build_query
+    return (
+        entry.van_number is None, entry.van_number or 0,
+        entry.route_order is None, entry.route_order or 0,
+        entry.street_name or "",
+        house_number_key(entry.house_number),
+        entry.house_number or "",
+    )
@@ -0,0 +1,249 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+from src.services.delivery_list import DeliveryListService
+
+# Avery L7160 / 21 labels per A4 sheet, in millimetres
+LABEL_COLUMNS = 3
+LABEL_ROWS = 7
+LABEL_WIDTH = 63.5
+LABEL_HEIGHT = 38.1
+LABEL_PITCH_X = 66.04
+LABEL_TOP_MARGIN = 15.15
+LABEL_LEFT_MARGIN = 7.25
+
+SHEET_ROW_HEIGHT = 15
+BARCODE_CACHE_SIZE = 50000
+
+class SheetRunResult:
+    def __init__(self, delivery_date):
+        self.delivery_date = delivery_date
+        self.vans = {}
+        self.merged_path = None
+        self.deliveries = 0
+        self.pages = 0
+        self.elapsed = 0.0
+
+    @property
+    def pages_per_sec(self):
+        return self.pages / self.elapsed if self.elapsed > 0 else 0.0
+
+class DeliverySheetRenderer:
+    """Prints a day's delivery sheets and parcel labels as PDF
+
+    Each van gets one document: its delivery sheet in route order followed
+    by a barcode label for every parcel, with parcels that need a signature
+    flagged on both. The barcode encodes the delivery id, so a scan
+    identifies the parcel; the patient id is printed on the label as text. Vans are rendered in a process pool, one van per
+    worker, so a day's run uses as many cores as there are vans; the van
+    documents are then merged into a single file for printing.
+
+    The pool is kept between runs so each worker's barcode cache stays
+    warm. Call :meth:`close` (or use the renderer as a context manager)
+    when done.
+    """
+
+    def __init__(self, list_service=None, max_workers=None):
+        self.list_service = list_service or DeliveryListService()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def render_day(self, delivery_date, output_dir, van_count=3, merge=True):
+        """Render every van's sheet and labels for a date into ``output_dir``
+
+        Returns a :class:`SheetRunResult` with the per-van files and, when
+        ``merge`` is set and pypdf is installed, the merged document.
+        """
+        started = time.perf_counter()
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        result = SheetRunResult(delivery_date)
+
+        vans = self.list_service.generate_by_van(delivery_date, van_count)
+        jobs = []
+        for van_number in sorted(vans, key=lambda van: (van is None, van or 0)):
+            name = f"van-{van_number}" if van_number is not None else "unassigned"
+            path = output_dir / f"{delivery_date.isoformat()}-{name}.pdf"
+            jobs.append((delivery_date, van_number, vans[van_number], str(path)))
+            result.vans[van_number] = path
+            result.deliveries += len(vans[van_number])
+
+        if self.max_workers == 1 or len(jobs) <= 1:
+            pages = [render_van(*job) for job in jobs]
+        else:
+            pages = list(self._get_pool().map(render_van, *zip(*jobs)))
+        result.pages = sum(pages)
+
+        if merge and jobs:
+            result.merged_path = merge_documents(
+                list(result.vans.values()),
+                output_dir / f"{delivery_date.isoformat()}-all-vans.pdf"
+            )
+
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def _get_pool(self):
+        if self._pool is None:
+            # Spawned rather than forked: the GUI process has threads running
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+def merge_documents(paths, output_path):
+    """Concatenate PDF files into ``output_path``
+
+    Returns the output path, or None if pypdf is not installed; the
+    separate files are still there to print.
+    """
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        return None
+
+    writer = PdfWriter()
+    for path in paths:
+        writer.append(str(path))
+    with open(output_path, "wb") as output:
+        writer.write(output)
+    writer.close()
+    return Path(output_path)
+
+# Rendering; these run inside the worker processes
+
+@lru_cache(maxsize=BARCODE_CACHE_SIZE)
+def barcode_bars(code):
+    """Code 128 bars for ``code`` as ``(start, width)`` runs of modules
+
+    Cached per worker process. The bars are drawn as vector rectangles,
+    which is far cheaper than embedding a bitmap per label and prints
+    sharp at any resolution.
+    """
+    from barcode import Code128
+
+    pattern = Code128(code).build()[0]
+    bars, start = [], None
+    for position, module in enumerate(pattern + "0"):
+        if module == "1" and start is None:
+            start = position
+        elif module == "0" and start is not None:
+            bars.append((start, position - start))
+            start = None
+    return len(pattern), tuple(bars)
+
+def draw_barcode(canvas, code, x, y, width, height):
+    modules, bars = barcode_bars(code)
+    module_width = width / modules
+    path = canvas.beginPath()
+    for start, run in bars:
+        path.rect(x + start * module_width, y, run * module_width, height)
+    canvas.drawPath(path, stroke=0, fill=1)
+
+def render_van(delivery_date, van_number, entries, path):
+    """Write one van's sheet and labels to ``path`` and return the page count"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen.canvas import Canvas
+
+    canvas = Canvas(path, pagesize=A4, pageCompression=1)
+    title = f"Van {van_number}" if van_number is not None else "Unassigned"
+    pages = _draw_sheet(canvas, A4, title, delivery_date, entries)
+    pages += _draw_labels(canvas, A4, title, entries)
+    canvas.save()
+    return pages
+
+def _draw_sheet(canvas, pagesize, title, delivery_date, entries):
+    width, height = pagesize
+    columns = [(40, "Stop"), (75, "Patient"), (135, "Address"), (330, "Town"),
+               (420, "Parcel"), (470, "Sign")]
+    rows_per_page = int((height - 110) // SHEET_ROW_HEIGHT)
+    page_count = max(1, -(-len(entries) // rows_per_page))
+    signatures = sum(1 for entry in entries if entry.requires_signature)
+
+    for page in range(page_count):
+        canvas.setFont("Helvetica-Bold", 14)
+        canvas.drawString(40, height - 45, f"{title} - {delivery_date.strftime('%A %d %B %Y')}")
+        canvas.setFont("Helvetica", 9)
+        canvas.drawRightString(
+            width - 40, height - 45,
+            f"{len(entries)} parcels, {signatures} to sign - page {page + 1} of {page_count}"
+        )
+        canvas.setFont("Helvetica-Bold", 9)
+        y = height - 75
+        for x, heading in columns:
+            canvas.drawString(x, y, heading)
+        canvas.line(40, y - 4, width - 40, y - 4)
+
+        canvas.setFont("Helvetica", 9)
+        start = page * rows_per_page
+        for stop, entry in enumerate(entries[start:start + rows_per_page], start + 1):
+            y -= SHEET_ROW_HEIGHT
+            address = f"{entry.house_number or ''} {entry.street_name or ''}".strip()
+            canvas.drawString(40, y, str(stop))
+            canvas.drawString(75, y, str(entry.patient_id or ""))
+            canvas.drawString(135, y, address[:40])
+            canvas.drawString(330, y, (entry.town or "")[:18])
+            canvas.drawString(420, y, entry.parcel_code or "")
+            if entry.requires_signature:
+                canvas.rect(470, y - 3, 85, 12)
+        canvas.showPage()
+    return page_count
+
+def _draw_labels(canvas, pagesize, title, entries):
+    from reportlab.lib.units import mm
+
+    _, height = pagesize
+    per_page = LABEL_COLUMNS * LABEL_ROWS
+    pages = 0
+
+    for index, entry in enumerate(entries):
+        slot = index % per_page
+        if slot == 0 and index:
+            canvas.showPage()
+        if slot == 0:
+            pages += 1
+
+        column, row = slot % LABEL_COLUMNS, slot // LABEL_COLUMNS
+        left = (LABEL_LEFT_MARGIN + column * LABEL_PITCH_X) * mm + 3 * mm
+        top = height - (LABEL_TOP_MARGIN + row * LABEL_HEIGHT) * mm - 3 * mm
+        label_width = (LABEL_WIDTH - 6) * mm
+
+        canvas.setFont("Helvetica-Bold", 10)
+        canvas.drawString(left, top - 9, f"Patient {entry.patient_id}" if entry.patient_id is not None else "")
+        canvas.setFont("Helvetica", 8)
+        canvas.drawRightString(left + label_width, top - 9, f"{title} #{index + 1}")
+        address = f"{entry.house_number or ''} {entry.street_name or ''}".strip()
+        canvas.drawString(left, top - 19, address[:38])
+        canvas.drawString(left, top - 28, f"{entry.town or ''}  {entry.parcel_code or ''}"[:38])
+
+        draw_barcode(
+            canvas, str(entry.delivery_id),
+            left, top - 28 * mm, label_width * 0.7, 12 * mm
+        )
+        # Human-readable copy of the code, for when a scan fails
+        canvas.setFont("Helvetica", 7)
+        canvas.drawCentredString(left + label_width * 0.35, top - 28 * mm - 8, str(entry.delivery_id))
+        if entry.requires_signature:
+            canvas.setFont("Helvetica-Bold", 8)
+            canvas.drawRightString(left + label_width, top - 26 * mm, "SIGN")
+            canvas.rect(left + label_width * 0.72, top - 28 * mm, label_width * 0.28, 14 * mm)
+
+    if pages:
+        canvas.showPage()
+    return pages
@@ -0,0 +1,196 @@
+"""Type-ahead patient search backed by an SQLite FTS5 trigram index.
+
+``patients_fts`` is an external-content FTS5 table over a view of
+``patients``: it stores only the index, not a second copy of the rows, and
+is kept in sync by triggers on ``patients``, so Core bulk inserts and upserts from the importers
+are indexed too. Queries run entirely in SQLite and return at most
+``limit`` rows, best bm25 rank first. A term matching more than
+``MAX_CANDIDATES`` patients (a town, say) is ranked within its first
+``MAX_CANDIDATES`` matches only; type another word to narrow it down.
+"""
+import re
+import threading
+from collections import namedtuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import OperationalError
+
+from src.database.database import db_manager
+
+PatientMatch = namedtuple(
+    "PatientMatch", ["patient_id", "house_number", "street_name", "town", "rank"]
+)
+
+FTS_TABLE = "patients_fts"
+CONTENT_VIEW = "patients_fts_content"
+# The trigram tokenizer cannot match terms shorter than this
+MIN_TERM_LENGTH = 3
+# Matches scored per search. Fewer matches than this are ranked exactly;
+# a very common term is ranked within its first MAX_CANDIDATES matches by
+# rowid, so the work stays bounded however many patients it matches
+MAX_CANDIDATES = 1000
+
+# House numbers are indexed as "#12#" so that short numbers still form
+# trigrams and only match the whole number.
+_COLUMNS = "patient_id, house_key, street_name, town"
+_NEW_VALUES = "new.patient_id, '#' || new.house_number || '#', new.street_name, new.town"
+_OLD_VALUES = "old.patient_id, '#' || old.house_number || '#', old.street_name, old.town"
+
+SCHEMA = {
+    "view": (
+        CONTENT_VIEW,
+        f"CREATE VIEW {CONTENT_VIEW} AS SELECT patient_id, "
+        "'#' || house_number || '#' AS house_key, street_name, town FROM patients"
+    ),
+    "table": (
+        FTS_TABLE,
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({_COLUMNS}, "
+        f"content='{CONTENT_VIEW}', content_rowid='patient_id', tokenize='trigram')"
+    ),
+    "insert": (
+        "patients_fts_ai",
+        f"CREATE TRIGGER patients_fts_ai AFTER INSERT ON patients BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.patient_id, {_NEW_VALUES}); END"
+    ),
+    "delete": (
+        "patients_fts_ad",
+        f"CREATE TRIGGER patients_fts_ad AFTER DELETE ON patients BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_COLUMNS}) "
+        f"VALUES ('delete', old.patient_id, {_OLD_VALUES}); END"
+    ),
+    "update": (
+        "patients_fts_au",
+        f"CREATE TRIGGER patients_fts_au AFTER UPDATE ON patients BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_COLUMNS}) "
+        f"VALUES ('delete', old.patient_id, {_OLD_VALUES}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.patient_id, {_NEW_VALUES}); END"
+    ),
+}
+
+_TERM = re.compile(r"[^\s,]+")
+
+
+def ensure_search_index(connection):
+    """Create the FTS table, view and triggers if missing; return True if built
+
+    When anything had to be created the index is rebuilt from ``patients``
+    so it also covers rows written before the triggers existed.
+    """
+    names = [name for name, _ in SCHEMA.values()]
+    existing = {
+        name for (name,) in connection.execute(
+            text("SELECT name FROM sqlite_master WHERE name IN :names")
+            .bindparams(bindparam("names", expanding=True)),
+            {"names": names}
+        )
+    }
+    missing = [ddl for name, ddl in SCHEMA.values() if name not in existing]
+    if not missing:
+        return False
+    for ddl in missing:
+        connection.execute(text(ddl))
+    connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    return True
+
+
+def _quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+class PatientSearch:
+    """Ranked patient lookup by id, house number, street and town
+
+    Every search term must match. Words of three or more characters may
+    match anywhere in the patient id, street or town ("ill ro" finds
+    "Mill Road"); numbers also match the house number exactly, and one- or
+    two-digit numbers match only the house number. Shorter words such as
+    "St" are ignored. A query that is only a short patient id is answered
+    straight from the primary key.
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _engine(self):
+        return self.engine if self.engine is not None else db_manager.engine
+
+    def ensure_index(self):
+        """Make sure the FTS index exists before the first search"""
+        if self._ready:
+            return
+        with self._lock:
+            if not self._ready:
+                with self._engine().begin() as connection:
+                    ensure_search_index(connection)
+                self._ready = True
+
+    def rebuild(self):
+        """Rebuild the whole index from ``patients``"""
+        self.ensure_index()
+        with self._engine().begin() as connection:
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+    def search(self, query, limit=20):
+        """Return up to ``limit`` :class:`PatientMatch` rows, best first"""
+        terms = _TERM.findall(query or "")
+        if not terms or limit < 1:
+            return []
+
+        exact_id = next((int(term) for term in terms if term.isdigit()), None)
+        if len(terms) == 1 and exact_id is not None and len(terms[0]) < MIN_TERM_LENGTH:
+            return self._search_by_id(exact_id)
+
+        clauses = []
+        for term in terms:
+            if term.isdigit():
+                house = _quote(f"#{term}#")
+                if len(term) >= MIN_TERM_LENGTH:
+                    house = f"({house} OR {_quote(term)})"
+                clauses.append(house)
+            elif len(term) >= MIN_TERM_LENGTH:
+                clauses.append(_quote(term))
+        if not clauses:
+            return []
+
+        sql = (
+            "SELECT p.patient_id, p.house_number, p.street_name, p.town, c.rank "
+            # bm25() is the default rank, but ordering on the rank column
+            # costs half as much again. The rowid bound stops the scan
+            # after the first :candidates matches, before any are scored.
+            f"FROM (SELECT rowid, bm25({FTS_TABLE}) AS rank FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH :match AND rowid <= ("
+            f"SELECT max(rowid) FROM (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match "
+            "ORDER BY rowid LIMIT :candidates))) AS c "
+            "JOIN patients AS p ON p.patient_id = c.rowid "
+            "ORDER BY (p.patient_id = :exact_id) DESC, c.rank "
+            "LIMIT :limit"
+        )
+        params = {
+            "match": " AND ".join(clauses),
+            "candidates": max(MAX_CANDIDATES, limit),
+            "exact_id": exact_id,
+            "limit": limit,
+        }
+
+        self.ensure_index()
+        with self._engine().connect() as connection:
+            try:
+                rows = connection.execute(text(sql), params).all()
+            except OperationalError as e:
+                raise ValueError(f"Invalid search {query!r}: {e.orig}")
+        return [PatientMatch(*row) for row in rows]
+
+    def _search_by_id(self, patient_id):
+        with self._engine().connect() as connection:
+            row = connection.execute(
+                text("SELECT patient_id, house_number, street_name, town, 0.0 "
+                     "FROM patients WHERE patient_id = :patient_id"),
+                {"patient_id": patient_id}
+            ).first()
+        return [PatientMatch(*row)] if row else []
+
+
+# Shared search used by the UI
+patient_search = PatientSearch()
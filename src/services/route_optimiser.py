@@ -0,0 +1,295 @@
+"""Visiting order for each van's streets from a street distance matrix.
+
+The matrix is a square CSV: the header row and first column hold street
+ids, and each cell the distance from the row's street to the column's.
+A row and column labelled ``depot`` make every route a round trip from
+the depot; without one, routes are open paths. The solver treats the
+matrix as symmetric, averaging the two directions when they differ.
+
+Each van's streets are ordered with a nearest-neighbour tour improved by
+2-opt and Or-opt moves until no move helps or the time budget runs out.
+Vans are independent, so they can be solved in a process pool.
+``Street.route_order`` is then renumbered van by van in one bulk update.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sqlalchemy import select, update
+
+from src.database.database import get_db_session
+from src.database.models import Street
+from src.services.delivery_list import VAN_ASSIGNMENT_COLUMNS
+
+DEPOT = "depot"
+# Improvements smaller than this are rounding noise
+EPSILON = 1e-9
+OR_OPT_SEGMENTS = (1, 2, 3)
+
+
+class DistanceMatrix:
+    """Street-to-street distances; with ``depot`` set the last row is the depot"""
+
+    def __init__(self, street_ids, distances, depot=False):
+        self.street_ids = list(street_ids)
+        self.positions = {street_id: position for position, street_id in enumerate(self.street_ids)}
+        self.depot = depot
+        distances = np.asarray(distances, dtype=np.float64)
+        size = len(self.street_ids) + (1 if depot else 0)
+        if distances.shape != (size, size):
+            raise ValueError(f"Distance matrix must be {size} x {size}, got {distances.shape}")
+        self.distances = (distances + distances.T) / 2
+
+    @classmethod
+    def from_csv(cls, path):
+        """Read a square distance matrix labelled with street ids"""
+        import pandas as pd
+
+        # The label column mixes street ids with "depot"
+        frame = pd.read_csv(path, index_col=0, low_memory=False)
+        labels = [str(label).strip().lower() for label in frame.index]
+        columns = [str(label).strip().lower() for label in frame.columns]
+        if labels != columns:
+            raise ValueError(f"{path}: row and column labels of the distance matrix differ")
+
+        order = [position for position, label in enumerate(labels) if label != DEPOT]
+        try:
+            street_ids = [int(labels[position]) for position in order]
+        except ValueError as e:
+            raise ValueError(f"{path}: distance matrix labels must be street ids or '{DEPOT}' ({e})")
+        depot = DEPOT in labels
+        if depot:
+            order.append(labels.index(DEPOT))
+        distances = frame.to_numpy(dtype=np.float64)[np.ix_(order, order)]
+        return cls(street_ids, distances, depot)
+
+    def route_matrix(self, street_ids):
+        """Distances for one route, with the depot (or a free start) at 0"""
+        positions = [self.positions[street_id] for street_id in street_ids]
+        if self.depot:
+            positions = [len(self.street_ids)] + positions
+            return self.distances[np.ix_(positions, positions)]
+        # A node at distance 0 from every street turns an open path
+        # into a closed tour, so one solver handles both
+        matrix = np.zeros((len(positions) + 1,) * 2)
+        matrix[1:, 1:] = self.distances[np.ix_(positions, positions)]
+        return matrix
+
+
+# Solver; works on a route matrix whose node 0 starts and ends the tour
+
+def tour_length(matrix, tour):
+    return float(matrix[tour, np.roll(tour, -1)].sum())
+
+
+def nearest_neighbour(matrix):
+    count = len(matrix)
+    tour = np.empty(count, dtype=np.int64)
+    visited = np.zeros(count, dtype=bool)
+    tour[0], visited[0] = 0, True
+    for step in range(1, count):
+        distances = np.where(visited, np.inf, matrix[tour[step - 1]])
+        tour[step] = int(np.argmin(distances))
+        visited[tour[step]] = True
+    return tour
+
+
+def two_opt(matrix, tour, deadline):
+    """Reverse tour sections while that shortens the tour"""
+    count = len(tour)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(count - 2):
+            a, b = tour[i], tour[i + 1]
+            js = np.arange(i + 2, count if i else count - 1)
+            if not len(js):
+                continue
+            c, d = tour[js], tour[(js + 1) % count]
+            delta = matrix[a, c] + matrix[b, d] - matrix[a, b] - matrix[c, d]
+            best = int(np.argmin(delta))
+            if delta[best] < -EPSILON:
+                j = js[best]
+                tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1].copy()
+                improved = True
+            if time.perf_counter() >= deadline:
+                break
+    return tour
+
+
+def or_opt(matrix, tour, deadline):
+    """Move short runs of streets, either way round, to a cheaper place"""
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for length in OR_OPT_SEGMENTS:
+            i = 1
+            while i + length <= len(tour) and time.perf_counter() < deadline:
+                segment = tour[i:i + length]
+                first, last = segment[0], segment[-1]
+                before, after = tour[i - 1], tour[(i + length) % len(tour)]
+                removed = matrix[before, first] + matrix[last, after] - matrix[before, after]
+
+                rest = np.concatenate((tour[:i], tour[i + length:]))
+                u, v = rest, np.roll(rest, -1)
+                forward = matrix[u, first] + matrix[last, v] - matrix[u, v]
+                backward = matrix[u, last] + matrix[first, v] - matrix[u, v]
+                # Putting the segment back where it was gains nothing
+                forward[i - 1] = backward[i - 1] = np.inf
+
+                best_forward, best_backward = int(np.argmin(forward)), int(np.argmin(backward))
+                reverse = backward[best_backward] < forward[best_forward]
+                position = best_backward if reverse else best_forward
+                cost = backward[position] if reverse else forward[position]
+                if cost < removed - EPSILON:
+                    moved = segment[::-1] if reverse else segment
+                    tour[:] = np.concatenate((rest[:position + 1], moved, rest[position + 1:]))
+                    improved = True
+                else:
+                    i += 1
+    return tour
+
+
+def solve_route(matrix, time_budget):
+    """Return ``(order, length, initial_length)`` for a route matrix
+
+    ``order`` lists the route's streets as 0-based positions in the order
+    they were given, without the start node.
+    """
+    deadline = time.perf_counter() + time_budget
+    tour = nearest_neighbour(matrix)
+    initial = tour_length(matrix, tour)
+    # Alternate the two neighbourhoods until neither improves the tour
+    length = initial
+    while time.perf_counter() < deadline:
+        two_opt(matrix, tour, deadline)
+        or_opt(matrix, tour, deadline)
+        improved = tour_length(matrix, tour)
+        if improved >= length - EPSILON:
+            break
+        length = improved
+    return (tour[1:] - 1).tolist(), tour_length(matrix, tour), initial
+
+
+def _solve_van(van_number, street_ids, matrix, time_budget):
+    started = time.perf_counter()
+    order, length, initial = solve_route(matrix, time_budget)
+    current = tour_length(matrix, np.arange(len(matrix)))
+    return VanRoute(
+        van_number, [street_ids[position] for position in order],
+        current, initial, length, time.perf_counter() - started
+    )
+
+
+class VanRoute:
+    def __init__(self, van_number, street_ids, current_length, initial_length, length, elapsed):
+        self.van_number = van_number
+        self.street_ids = street_ids
+        # Length of the existing order, after nearest neighbour, and final
+        self.current_length = current_length
+        self.initial_length = initial_length
+        self.length = length
+        self.elapsed = elapsed
+
+
+class RouteResult:
+    def __init__(self):
+        self.routes = {}
+        # Streets with no row in the distance matrix, left in their old order
+        self.unmatched = []
+        self.elapsed = 0.0
+
+    @property
+    def current_length(self):
+        return sum(route.current_length for route in self.routes.values())
+
+    @property
+    def length(self):
+        return sum(route.length for route in self.routes.values())
+
+
+class RouteOptimiser:
+    """Recomputes ``Street.route_order`` van by van
+
+    Streets are grouped by their assignment for ``van_count`` vans and
+    numbered consecutively van after van, so each van's stretch of the
+    route stays together and the van balancer keeps cutting the route in
+    the same places. ``time_budget`` is the wall-clock limit in seconds
+    for the whole run.
+    """
+
+    def __init__(self, session_factory=get_db_session, max_workers=None):
+        self.session_factory = session_factory
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def optimise(self, matrix, van_count=3, time_budget=60.0, write=True):
+        """Solve every van's route and store the new route order
+
+        ``matrix`` is a :class:`DistanceMatrix` or the path of a CSV file.
+        With ``write=False`` the routes are computed but not saved.
+        """
+        started = time.perf_counter()
+        if not isinstance(matrix, DistanceMatrix):
+            matrix = DistanceMatrix.from_csv(matrix)
+        van_column = VAN_ASSIGNMENT_COLUMNS[van_count]
+        result = RouteResult()
+
+        session = self.session_factory()
+        try:
+            rows = session.execute(
+                select(Street.id, van_column).order_by(Street.route_order, Street.id)
+            ).all()
+        finally:
+            session.close()
+        vans, unmatched = {}, {}
+        for street_id, van_number in rows:
+            vans.setdefault(van_number, [])
+            if street_id in matrix.positions:
+                vans[van_number].append(street_id)
+            else:
+                unmatched.setdefault(van_number, []).append(street_id)
+                result.unmatched.append(street_id)
+        van_numbers = sorted(vans, key=lambda van: (van is None, van or 0))
+
+        jobs = [
+            (van_number, vans[van_number], matrix.route_matrix(vans[van_number]))
+            for van_number in van_numbers if vans[van_number]
+        ]
+        # Vans beyond the worker count queue up, so they share the budget
+        workers = min(self.max_workers, len(jobs)) or 1
+        van_budget = max(time_budget - (time.perf_counter() - started), 0) * workers / max(len(jobs), 1)
+
+        if workers == 1:
+            routes = [_solve_van(*job, van_budget) for job in jobs]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                routes = list(pool.map(_solve_van, *zip(*jobs), [van_budget] * len(jobs)))
+        for route in routes:
+            result.routes[route.van_number] = route
+
+        if write:
+            # Streets missing from the matrix keep their old order at the end of their van
+            order = []
+            for van_number in van_numbers:
+                route = result.routes.get(van_number)
+                order += route.street_ids if route else []
+                order += unmatched.get(van_number, [])
+            session = self.session_factory()
+            try:
+                session.execute(update(Street), [
+                    {"id": street_id, "route_order": position}
+                    for position, street_id in enumerate(order, 1)
+                ])
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+
+        result.elapsed = time.perf_counter() - started
+        return result
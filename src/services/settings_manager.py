@@ -1,38 +1,220 @@
-from src.database.database import get_db_session
+import threading
+from contextlib import contextmanager
+from src.database.database import session_scope
 from src.database.models import Vehicle, Driver, SystemSetting, ParcelType
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm.exc import NoResultFound
 
-class SettingsManager:
+class SettingsCache:
+    """Read-through cache for settings reference data
+    
+    Each region (vehicles, drivers, parcel types, system settings) is
+    loaded in one query the first time it is read and served from memory
+    until a write invalidates it. Cached ORM objects come from a session
+    that has already been closed, so they never expire or trigger lazy
+    loads.
+    """
+    
+    def __init__(self):
+        self._regions = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, region, loader):
+        """Return the cached value for a region, loading it on a miss"""
+        with self._lock:
+            if region in self._regions:
+                self.hits += 1
+                return self._regions[region]
+            self.misses += 1
+            value = loader()
+            self._regions[region] = value
+            return value
+    
+    def invalidate(self, *regions):
+        """Drop the given regions, or everything if none are named"""
+        with self._lock:
+            if not regions:
+                self._regions.clear()
+            for region in regions:
+                self._regions.pop(region, None)
+    
+    def stats(self):
+        """Return hit/miss counters and the regions currently cached"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "regions": sorted(self._regions),
+            }
+
+class BatchResult:
+    """Outcome of a batch edit
+    
+    ``done`` holds the ids of the rows written. Items that failed
+    validation or did not exist are listed in ``errors`` as
+    ``(item, message)``; they do not stop the rest of the batch.
+    """
+    
     def __init__(self):
-        self.session = get_db_session()
+        self.done = []
+        self.errors = []
+    
+    @property
+    def ok(self):
+        return not self.errors
+    
+    def fail(self, item, message):
+        self.errors.append((item, message))
+
+# Shared by every SettingsManager so that writes made through one
+# instance invalidate reads made through another
+settings_cache = SettingsCache()
+
+# Change log entity -> cache region holding it
+CACHE_REGIONS = {"Vehicle": "vehicles", "Driver": "drivers", "ParcelType": "parcel_types"}
+
+class SettingsManager:
+    """Service for vehicles, drivers, parcel types and system settings
+    
+    Every call runs in its own short-lived session. Wrap several calls in
+    ``with manager.batch():`` to make them one transaction with a single
+    commit.
+    """
+    
+    def __init__(self, cache=settings_cache):
+        self.cache = cache
+        self._local = threading.local()
+    
+    @contextmanager
+    def batch(self):
+        """Group edits made on this thread into one transaction
+        
+        Nothing is committed until the block exits; if it raises, every
+        edit in the block is rolled back. Reads inside the block see the
+        block's own uncommitted edits.
+        """
+        if getattr(self._local, "session", None) is not None:
+            # Nested batches join the outer transaction
+            yield self
+            return
+        
+        self._local.changed = set()
+        try:
+            with session_scope(expire_on_commit=False) as session:
+                self._local.session = session
+                yield self
+        finally:
+            self._local.session = None
+            self.cache.invalidate(*self._local.changed)
+    
+    @contextmanager
+    def _write(self, region):
+        """Session for one edit; commits unless inside a batch"""
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            yield session
+            session.flush()
+            self._local.changed.add(region)
+            return
+        
+        with session_scope(expire_on_commit=False) as session:
+            yield session
+        self.cache.invalidate(region)
+    
+    def _read(self, region, loader):
+        """Serve a region from the cache, or from the open batch"""
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            return loader(session)
+        
+        def load():
+            with session_scope(expire_on_commit=False) as session:
+                return loader(session)
+        
+        return self.cache.get(region, load)
+    
+    def _update_where_ids(self, region, model, ids, label, **values):
+        """One UPDATE over ``ids``; ids that match no row are reported"""
+        result, ids = BatchResult(), list(dict.fromkeys(ids))
+        if not ids:
+            return result
+        with self._write(region) as session:
+            result.done = list(session.execute(
+                update(model).where(model.id.in_(ids)).values(**values).returning(model.id),
+                execution_options={"synchronize_session": False}
+            ).scalars())
+        self._report_missing(result, ids, label)
+        return result
+    
+    def _delete_where_ids(self, region, model, ids, label):
+        """One DELETE over ``ids``; ids that match no row are reported"""
+        result, ids = BatchResult(), list(dict.fromkeys(ids))
+        if not ids:
+            return result
+        with self._write(region) as session:
+            result.done = list(session.execute(
+                delete(model).where(model.id.in_(ids)).returning(model.id),
+                execution_options={"synchronize_session": False}
+            ).scalars())
+        self._report_missing(result, ids, label)
+        return result
+    
+    def _report_missing(self, result, ids, label):
+        found = set(result.done)
+        for item in ids:
+            if item not in found:
+                result.fail(item, f"{label} with id {item} not found")
+    
+    # Queries for paged table views
+    def active_vehicles_query(self):
+        """Select for the vehicles table view"""
+        return select(Vehicle.id, Vehicle.registration, Vehicle.active).where(Vehicle.active.is_(True))
+    
+    def active_drivers_query(self):
+        """Select for the drivers table view"""
+        return select(Driver.id, Driver.name, Driver.active).where(Driver.active.is_(True))
+    
+    def parcel_types_query(self):
+        """Select for the parcel types table view"""
+        return select(
+            ParcelType.id, ParcelType.code, ParcelType.description, ParcelType.requires_signature
+        )
     
     # Vehicle Methods
     def get_active_vehicles(self):
         """Retrieve active vehicles"""
-        return self.session.query(Vehicle).filter_by(active=True).all()
+        return list(self._read(
+            "vehicles",
+            lambda session: session.query(Vehicle).filter_by(active=True).all()
+        ))
     
     def add_vehicle(self, registration):
         """Add a new vehicle"""
-        vehicle = Vehicle(
-            registration=registration,
-            active=True
-        )
-        self.session.add(vehicle)
-        self.session.commit()
+        with self._write("vehicles") as session:
+            vehicle = Vehicle(
+                registration=registration,
+                active=True
+            )
+            session.add(vehicle)
         return vehicle
     
     def update_vehicle(self, vehicle_id, registration=None, active=None):
         """Update an existing vehicle"""
         try:
-            vehicle = self.session.query(Vehicle).filter_by(id=vehicle_id).one()
-            
-            if registration is not None:
-                vehicle.registration = registration
+            with self._write("vehicles") as session:
+                vehicle = session.query(Vehicle).filter_by(id=vehicle_id).one()
+                
+                if registration is not None:
+                    vehicle.registration = registration
+                
+                if active is not None:
+                    vehicle.active = active
             
-            if active is not None:
-                vehicle.active = active
-            
-            self.session.commit()
             return vehicle
         except NoResultFound:
             raise ValueError(f"Vehicle with id {vehicle_id} not found")
@@ -40,39 +222,86 @@ class SettingsManager:
     def delete_vehicle(self, vehicle_id):
         """Delete a vehicle"""
         try:
-            vehicle = self.session.query(Vehicle).filter_by(id=vehicle_id).one()
-            self.session.delete(vehicle)
-            self.session.commit()
+            with self._write("vehicles") as session:
+                vehicle = session.query(Vehicle).filter_by(id=vehicle_id).one()
+                session.delete(vehicle)
         except NoResultFound:
             raise ValueError(f"Vehicle with id {vehicle_id} not found")
     
+    def add_vehicles(self, registrations):
+        """Add several vehicles in one INSERT
+        
+        Blank, repeated and already registered registrations are reported
+        in the result's errors; the rest are added.
+        """
+        result, rows = BatchResult(), {}
+        for registration in registrations:
+            registration = (registration or "").strip()
+            if not registration:
+                result.fail(registration, "Registration cannot be empty")
+            elif registration in rows:
+                result.fail(registration, f"{registration} is listed more than once")
+            else:
+                rows[registration] = {"registration": registration, "active": True}
+        if not rows:
+            return result
+        
+        with self._write("vehicles") as session:
+            added = dict(session.execute(
+                sqlite_insert(Vehicle.__table__)
+                .on_conflict_do_nothing(index_elements=["registration"])
+                .returning(Vehicle.registration, Vehicle.id),
+                list(rows.values())
+            ).all())
+        for registration in rows:
+            if registration in added:
+                result.done.append(added[registration])
+            else:
+                result.fail(registration, f"Vehicle {registration} already exists")
+        return result
+    
+    def activate_vehicles(self, vehicle_ids):
+        """Mark several vehicles active in one UPDATE"""
+        return self._update_where_ids("vehicles", Vehicle, vehicle_ids, "Vehicle", active=True)
+    
+    def deactivate_vehicles(self, vehicle_ids):
+        """Mark several vehicles inactive in one UPDATE"""
+        return self._update_where_ids("vehicles", Vehicle, vehicle_ids, "Vehicle", active=False)
+    
+    def delete_vehicles(self, vehicle_ids):
+        """Delete several vehicles in one DELETE"""
+        return self._delete_where_ids("vehicles", Vehicle, vehicle_ids, "Vehicle")
+    
     # Driver Methods
     def get_active_drivers(self):
         """Retrieve active drivers"""
-        return self.session.query(Driver).filter_by(active=True).all()
+        return list(self._read(
+            "drivers",
+            lambda session: session.query(Driver).filter_by(active=True).all()
+        ))
     
     def add_driver(self, name):
         """Add a new driver"""
-        driver = Driver(
-            name=name,
-            active=True
-        )
-        self.session.add(driver)
-        self.session.commit()
+        with self._write("drivers") as session:
+            driver = Driver(
+                name=name,
+                active=True
+            )
+            session.add(driver)
         return driver
     
     def update_driver(self, driver_id, name=None, active=None):
         """Update an existing driver"""
         try:
-            driver = self.session.query(Driver).filter_by(id=driver_id).one()
+            with self._write("drivers") as session:
+                driver = session.query(Driver).filter_by(id=driver_id).one()
+                
+                if name is not None:
+                    driver.name = name
+                
+                if active is not None:
+                    driver.active = active
             
-            if name is not None:
-                driver.name = name
-            
-            if active is not None:
-                driver.active = active
-            
-            self.session.commit()
             return driver
         except NoResultFound:
             raise ValueError(f"Driver with id {driver_id} not found")
@@ -80,43 +309,76 @@ class SettingsManager:
     def delete_driver(self, driver_id):
         """Delete a driver"""
         try:
-            driver = self.session.query(Driver).filter_by(id=driver_id).one()
-            self.session.delete(driver)
-            self.session.commit()
+            with self._write("drivers") as session:
+                driver = session.query(Driver).filter_by(id=driver_id).one()
+                session.delete(driver)
         except NoResultFound:
             raise ValueError(f"Driver with id {driver_id} not found")
     
+    def add_drivers(self, names):
+        """Add several drivers in one INSERT; blank names are reported"""
+        result, rows = BatchResult(), []
+        for name in names:
+            name = (name or "").strip()
+            if name:
+                rows.append({"name": name, "active": True})
+            else:
+                result.fail(name, "Name cannot be empty")
+        if not rows:
+            return result
+        
+        with self._write("drivers") as session:
+            result.done = list(session.execute(
+                Driver.__table__.insert().returning(Driver.id), rows
+            ).scalars())
+        return result
+    
+    def activate_drivers(self, driver_ids):
+        """Mark several drivers active in one UPDATE"""
+        return self._update_where_ids("drivers", Driver, driver_ids, "Driver", active=True)
+    
+    def deactivate_drivers(self, driver_ids):
+        """Mark several drivers inactive in one UPDATE"""
+        return self._update_where_ids("drivers", Driver, driver_ids, "Driver", active=False)
+    
+    def delete_drivers(self, driver_ids):
+        """Delete several drivers in one DELETE"""
+        return self._delete_where_ids("drivers", Driver, driver_ids, "Driver")
+    
     # Parcel Type Methods
     def get_parcel_types(self):
         """Retrieve all parcel types"""
-        return self.session.query(ParcelType).all()
+        return list(self._read(
+            "parcel_types",
+            lambda session: session.query(ParcelType).all()
+        ))
 
     def add_parcel_type(self, code, description, requires_signature=False):
         """Add a new parcel type"""
-        parcel_type = ParcelType(
-            code=code,
-            description=description,
-            requires_signature=requires_signature
-        )
-        self.session.add(parcel_type)
-        self.session.commit()
+        with self._write("parcel_types") as session:
+            parcel_type = ParcelType(
+                code=code,
+                description=description,
+                requires_signature=requires_signature
+            )
+            session.add(parcel_type)
         return parcel_type
 
     def update_parcel_type(self, parcel_type_id, code=None, description=None, requires_signature=None):
         """Update an existing parcel type"""
         try:
-            parcel_type = self.session.query(ParcelType).filter_by(id=parcel_type_id).one()
-            
-            if code is not None:
-                parcel_type.code = code
-            
-            if description is not None:
-                parcel_type.description = description
-            
-            if requires_signature is not None:
-                parcel_type.requires_signature = requires_signature
+            with self._write("parcel_types") as session:
+                parcel_type = session.query(ParcelType).filter_by(id=parcel_type_id).one()
+                
+                if code is not None:
+                    parcel_type.code = code
+                
+                if description is not None:
+                    parcel_type.description = description
+                
+                if requires_signature is not None:
+                    parcel_type.requires_signature = requires_signature
             
-            self.session.commit()
             return parcel_type
         except NoResultFound:
             raise ValueError(f"Parcel type with id {parcel_type_id} not found")
@@ -124,29 +386,72 @@ class SettingsManager:
     def delete_parcel_type(self, parcel_type_id):
         """Delete a parcel type"""
         try:
-            parcel_type = self.session.query(ParcelType).filter_by(id=parcel_type_id).one()
-            self.session.delete(parcel_type)
-            self.session.commit()
+            with self._write("parcel_types") as session:
+                parcel_type = session.query(ParcelType).filter_by(id=parcel_type_id).one()
+                session.delete(parcel_type)
         except NoResultFound:
             raise ValueError(f"Parcel type with id {parcel_type_id} not found")
     
+    def upsert_parcel_types(self, parcel_types):
+        """Add or update parcel types by code in one statement
+        
+        ``parcel_types`` is an iterable of dicts with ``code``,
+        ``description`` and optionally ``requires_signature``. Existing
+        codes have their description and signature flag replaced.
+        """
+        result, rows = BatchResult(), {}
+        for item in parcel_types:
+            code = (item.get("code") or "").strip()
+            description = (item.get("description") or "").strip()
+            if not code or not description:
+                result.fail(code or item, "Code and Description are required")
+            elif code in rows:
+                result.fail(code, f"{code} is listed more than once")
+            else:
+                rows[code] = {
+                    "code": code,
+                    "description": description,
+                    "requires_signature": bool(item.get("requires_signature", False)),
+                }
+        if not rows:
+            return result
+        
+        stmt = sqlite_insert(ParcelType.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["code"],
+            set_={
+                "description": stmt.excluded.description,
+                "requires_signature": stmt.excluded.requires_signature,
+            }
+        )
+        with self._write("parcel_types") as session:
+            result.done = list(session.execute(stmt.returning(ParcelType.id), list(rows.values())).scalars())
+        return result
+    
+    def delete_parcel_types(self, parcel_type_ids):
+        """Delete several parcel types in one DELETE"""
+        return self._delete_where_ids("parcel_types", ParcelType, parcel_type_ids, "Parcel type")
+    
     # System Settings Methods
     def get_system_setting(self, key, default=None):
         """Retrieve a system setting"""
-        setting = self.session.query(SystemSetting).filter_by(key=key).first()
-        return setting.value if setting else default
+        settings = self._read("system_settings", self._load_system_settings)
+        return settings.get(key, default)
+    
+    def get_system_settings(self):
+        """Retrieve all system settings as a key/value dict"""
+        return dict(self._read("system_settings", self._load_system_settings))
+    
+    def _load_system_settings(self, session):
+        return dict(session.query(SystemSetting.key, SystemSetting.value).all())
     
     def set_system_setting(self, key, value, description=None):
         """Set a system setting"""
-        setting = self.session.query(SystemSetting).filter_by(key=key).first()
-        if setting:
-            setting.value = value
-        else:
-            setting = SystemSetting(key=key, value=value, description=description)
-            self.session.add(setting)
-        self.session.commit()
+        with self._write("system_settings") as session:
+            setting = session.query(SystemSetting).filter_by(key=key).first()
+            if setting:
+                setting.value = value
+            else:
+                setting = SystemSetting(key=key, value=value, description=description)
+                session.add(setting)
         return setting
-    
-    def __del__(self):
-        """Ensure session is closed when object is deleted"""
-        self.session.close()
@@ -0,0 +1,120 @@
+"""In-memory index of streets keyed on normalised road and town names.
+
+The whole ``streets`` table is small (a few thousand rows), so it is loaded
+once with a single Core select and kept in a dict. Any session that writes
+to ``streets`` marks the index stale when it commits, and the next lookup
+reloads it.
+"""
+import threading
+from collections import namedtuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from src.database.database import get_db_session
+from src.database.models import Street
+from src.utils.address import street_key
+
+
+class StreetEntry(namedtuple(
+    "StreetEntry",
+    ["id", "road_name", "town", "route_order", "van_3_assignment", "van_4_assignment"]
+)):
+    __slots__ = ()
+
+    def van(self, van_count):
+        """Van this street is on when ``van_count`` vans are running"""
+        return self.van_4_assignment if van_count == 4 else self.van_3_assignment
+
+
+_STREETS_CHANGED = "streets_changed"
+
+
+class StreetIndex:
+    def __init__(self, session_factory=get_db_session):
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._entries = None
+        self._generation = 0
+        self._loaded_generation = -1
+
+    def invalidate(self):
+        """Mark the index stale; it is rebuilt on the next lookup"""
+        self._generation += 1
+
+    def refresh(self):
+        """Reload every street from the database"""
+        with self._lock:
+            generation = self._generation
+            session = self.session_factory()
+            try:
+                rows = session.execute(select(
+                    Street.id, Street.road_name, Street.town, Street.route_order,
+                    Street.van_3_assignment, Street.van_4_assignment
+                )).all()
+            finally:
+                session.close()
+
+            entries = {}
+            for row in rows:
+                entry = StreetEntry(*row)
+                # Keep the first street if two normalise to the same key
+                entries.setdefault(street_key(entry.road_name, entry.town), entry)
+            self._entries = entries
+            self._loaded_generation = generation
+            return entries
+
+    def _current(self):
+        entries = self._entries
+        if entries is None or self._loaded_generation != self._generation:
+            entries = self.refresh()
+        return entries
+
+    def lookup(self, street_name, town):
+        """Return the :class:`StreetEntry` for an address, or None"""
+        return self._current().get(street_key(street_name, town))
+
+    def van_for(self, street_name, town, van_count):
+        """Return ``(van_number, route_order)`` for an address"""
+        entry = self.lookup(street_name, town)
+        if entry is None:
+            return None, None
+        return entry.van(van_count), entry.route_order
+
+    def __len__(self):
+        return len(self._current())
+
+
+# Shared index used by the services
+street_index = StreetIndex()
+
+
+def _touches_streets(statement):
+    table = getattr(statement, "table", None)
+    return table is not None and getattr(table, "name", None) == Street.__tablename__
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_street_statements(orm_execute_state):
+    if (orm_execute_state.is_insert or orm_execute_state.is_update
+            or orm_execute_state.is_delete) and _touches_streets(orm_execute_state.statement):
+        orm_execute_state.session.info[_STREETS_CHANGED] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _track_street_objects(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Street):
+            session.info[_STREETS_CHANGED] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop(_STREETS_CHANGED, False):
+        street_index.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop(_STREETS_CHANGED, None)
@@ -0,0 +1,205 @@
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from src.database.database import get_db_session
+from src.database.models import Delivery, Patient, Street, Vehicle
+from src.services.street_index import street_index
+
+# Run through the driver's executemany with positional tuples: binding a
+# parameter dict per row through a Core statement costs more than SQLite
+# spends on the UPDATEs themselves
+ASSIGN_VAN = "UPDATE deliveries SET van_number = ?, route_order = ? WHERE id = ?"
+
+class BalanceResult:
+    def __init__(self, delivery_date):
+        self.delivery_date = delivery_date
+        # van number -> vehicle id / parcel count / street count
+        self.vehicles = {}
+        self.parcels = {}
+        self.streets = {}
+        self.deliveries = 0
+        self.updated = 0
+        self.load_time = 0.0
+        self.compute_time = 0.0
+        self.write_time = 0.0
+
+    @property
+    def elapsed(self):
+        return self.load_time + self.compute_time + self.write_time
+
+def balance_streets(streets, van_count):
+    """Return the 0-based van for each delivery, given their streets in route order
+
+    ``streets`` holds a key per delivery, with each street's deliveries
+    next to each other. The route is cut into ``van_count`` contiguous
+    runs of whole streets: a street goes to the van whose share of the
+    day's parcels contains the street's midpoint, so every van's load is
+    within one street of ``total / van_count``.
+    """
+    total = len(streets)
+    if total == 0 or van_count <= 0:
+        return np.zeros(total, dtype=np.int64)
+
+    streets = np.asarray(streets)
+    # Index of the first row of each street and how many parcels it has
+    starts = np.flatnonzero(np.r_[True, streets[1:] != streets[:-1]])
+    counts = np.diff(np.r_[starts, total])
+
+    midpoints = starts + counts / 2.0
+    street_vans = np.minimum((midpoints * van_count / total).astype(np.int64), van_count - 1)
+    return np.repeat(street_vans, counts)
+
+def balance_frame(frame, van_count):
+    """Return the 0-based van for each row of a sorted delivery frame
+
+    ``frame`` must be in route order and have a ``street`` column; see
+    :func:`balance_streets`.
+    """
+    return balance_streets(frame["street"].to_numpy(), van_count)
+
+class VanBalancer:
+    """Spreads a day's parcels evenly over the active vehicles
+
+    The day's deliveries are loaded into a pandas frame in one Core query,
+    put in route order (street route order, then house number) and split
+    into one contiguous stretch of streets per active vehicle with
+    :func:`balance_frame`, so a street is never shared between vans. Van
+    numbers are 1-based positions of the active vehicles ordered by id,
+    matching the numbering used on delivery lists.
+
+    The result is written back as a single executemany UPDATE of
+    ``van_number`` and ``route_order``, replacing any earlier assignment;
+    deliveries whose assignment is unchanged are not written.
+    """
+
+    def __init__(self, session_factory=get_db_session, streets=street_index):
+        self.session_factory = session_factory
+        self.streets = streets
+
+    def load_frame(self, session, delivery_date):
+        """Return the day's deliveries as a frame in route order"""
+        # Core rows: the ORM result layer would double the cost of the read
+        connection = session.connection()
+        rows = connection.execute(
+            select(
+                Delivery.id, Delivery.van_number, Delivery.route_order,
+                Patient.house_number, Patient.street_name, Patient.town
+            )
+            .outerjoin(Patient, Patient.patient_id == Delivery.patient_id)
+            .where(Delivery.delivery_date == delivery_date)
+        ).all()
+        frame = pd.DataFrame.from_records(rows, columns=[
+            "id", "van_number", "route_order", "house_number", "street_name", "town"
+        ])
+        # The streets table is small: a hash join here is cheaper than
+        # an index lookup per delivery in SQLite
+        streets = pd.DataFrame.from_records(
+            connection.execute(select(Street.road_name, Street.town, Street.id, Street.route_order)).all(),
+            columns=["street_name", "town", "street_id", "street_route_order"]
+        )
+        frame = frame.merge(streets, how="left", on=["street_name", "town"])
+        if frame.empty:
+            return frame.assign(street=pd.Series(dtype=np.int64))
+
+        self._resolve_unmatched(frame)
+
+        # Streets without a route order go last, then addresses with no street
+        last = frame["street_route_order"].max()
+        last = 0 if pd.isna(last) else int(last)
+        frame["street_route_order"] = frame["street_route_order"].fillna(last + 1)
+        # Integer key per street; addresses with no street get negative codes
+        street = frame["street_id"].to_numpy(dtype=float)
+        unknown = np.isnan(street)
+        if unknown.any():
+            addresses = frame.loc[unknown, "street_name"].fillna("") + "|" + frame.loc[unknown, "town"].fillna("")
+            street[unknown] = -1 - pd.factorize(addresses)[0]
+        frame["street"] = street.astype(np.int64)
+        house = pd.to_numeric(frame["house_number"], errors="coerce").fillna(0)
+
+        order = np.lexsort((
+            frame["id"].to_numpy(),
+            house.to_numpy(),
+            frame["street"].to_numpy(),
+            frame["street_route_order"].to_numpy(),
+        ))
+        return frame.iloc[order].reset_index(drop=True)
+
+    def _resolve_unmatched(self, frame):
+        """Fill street id and route order for addresses spelt differently"""
+        unmatched = frame["street_id"].isna() & frame["street_name"].notna()
+        if not unmatched.any():
+            return
+        addresses = frame.loc[unmatched, ["street_name", "town"]].drop_duplicates()
+        resolved = {}
+        for street_name, town in addresses.itertuples(index=False):
+            entry = self.streets.lookup(street_name, town)
+            if entry is not None:
+                resolved[(street_name, town)] = (entry.id, entry.route_order)
+        if not resolved:
+            return
+
+        keys = pd.MultiIndex.from_frame(frame.loc[unmatched, ["street_name", "town"]])
+        found = pd.DataFrame.from_dict(
+            resolved, orient="index", columns=["street_id", "street_route_order"]
+        ).reindex(keys)
+        frame.loc[unmatched, "street_id"] = found["street_id"].to_numpy()
+        frame.loc[unmatched, "street_route_order"] = found["street_route_order"].to_numpy()
+
+    def balance(self, delivery_date, vehicle_ids=None):
+        """Assign the day's deliveries to vans and store the result
+
+        ``vehicle_ids`` defaults to every active vehicle. Returns a
+        :class:`BalanceResult` with the load on each van.
+        """
+        result = BalanceResult(delivery_date)
+        session = self.session_factory()
+        try:
+            started = time.perf_counter()
+            if vehicle_ids is None:
+                vehicle_ids = session.scalars(
+                    select(Vehicle.id).where(Vehicle.active.is_(True)).order_by(Vehicle.id)
+                ).all()
+            if not vehicle_ids:
+                raise ValueError("No active vehicles to assign deliveries to")
+            frame = self.load_frame(session, delivery_date)
+            result.load_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            vans = balance_frame(frame, len(vehicle_ids)) + 1
+            route_order = frame["street_route_order"].to_numpy(dtype=np.int64)
+            # Only rows whose van or route order actually changes are written
+            changed = (
+                (frame["van_number"].to_numpy(dtype=float) != vans)
+                | (frame["route_order"].to_numpy(dtype=float) != route_order)
+            )
+            assignments = list(zip(
+                vans[changed].tolist(),
+                route_order[changed].tolist(),
+                frame["id"].to_numpy()[changed].tolist()
+            ))
+            result.compute_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            if assignments:
+                session.connection().exec_driver_sql(ASSIGN_VAN, assignments)
+            session.commit()
+            result.write_time = time.perf_counter() - started
+            result.updated = len(assignments)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        result.deliveries = len(frame)
+        parcels = np.bincount(vans - 1, minlength=len(vehicle_ids))
+        streets = pd.Series(frame["street"].to_numpy()).groupby(vans).nunique()
+        for position, vehicle_id in enumerate(vehicle_ids):
+            van_number = position + 1
+            result.vehicles[van_number] = vehicle_id
+            result.parcels[van_number] = int(parcels[position])
+            result.streets[van_number] = int(streets.get(van_number, 0))
+        return result
@@ -0,0 +1,226 @@
+"""Client for the sync server with a conditional-GET cache.
+
+:class:`SyncClient` keeps one HTTP/1.1 connection open to the server and
+remembers the ETag and body of every GET it makes. Repeating a request
+sends ``If-None-Match``; when nothing has changed the server answers
+``304 Not Modified`` with no body and the cached copy is used, so a
+dispatcher refreshing a list only downloads rows that changed.
+:meth:`SyncClient.changes_since` goes further and says which rows those
+are, so a client can fetch just them with :meth:`SyncClient.rows_by_id`.
+
+:class:`RemoteDeliveryListService` has the same ``generate``,
+``generate_by_van`` and ``iter_history`` methods as
+:class:`DeliveryListService`, so the delivery sheet renderer and exporter
+can work against a server instead of a local database file.
+
+A server started with a token (see :mod:`src.sync.server`) needs the
+same one here, passed as ``token`` or set in ``DELIVERY_SYNC_TOKEN``.
+"""
+import gzip
+import http.client
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from urllib.parse import urlencode, urlsplit
+
+from src.database.change_log import Change, ChangeSet
+from src.sync.server import TOKEN_VARIABLE
+from src.services.delivery_list import DeliveryListEntry
+
+DEFAULT_CACHE_SIZE = 512
+# Paths whose cached copies are stale after a delivery is edited
+DELIVERY_PATHS = ("/api/deliveries", "/api/delivery_list")
+
+
+class SyncError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+class SyncClient:
+    """Talks to a :class:`src.sync.server.SyncServer` at ``base_url``
+
+    Safe to share between threads; requests are serialised over the one
+    connection.
+    """
+
+    def __init__(self, base_url, timeout=10.0, cache_size=DEFAULT_CACHE_SIZE, token=None):
+        parts = urlsplit(base_url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"Expected an http:// URL, got {base_url!r}")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.token = token or os.environ.get(TOKEN_VARIABLE) or None
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_received = 0
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # HTTP
+
+    def _request(self, method, path, body=None, headers=None):
+        """Send one request, reconnecting once if the server closed the connection"""
+        headers = dict(headers or {})
+        headers["Accept-Encoding"] = "gzip"
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        for attempt in (1, 2):
+            if self._connection is None:
+                self._connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._connection.request(method, path, body=body, headers=headers)
+                response = self._connection.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                self._connection.close()
+                self._connection = None
+                if attempt == 2:
+                    raise
+        self.requests += 1
+        self.bytes_received += len(data)
+        if response.getheader("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        if response.getheader("Connection", "").lower() == "close":
+            self._connection.close()
+            self._connection = None
+        return response, data
+
+    def get(self, path, **params):
+        """GET ``path`` and return the decoded JSON, from the cache if unchanged"""
+        params = {name: value for name, value in params.items() if value is not None}
+        url = f"{path}?{urlencode(sorted(params.items()))}" if params else path
+        with self._lock:
+            cached = self._cache.get(url)
+            headers = {"If-None-Match": cached[0]} if cached else {}
+            response, data = self._request("GET", url, headers=headers)
+            if response.status == 304 and cached:
+                self.not_modified += 1
+                self._cache.move_to_end(url)
+                return cached[1]
+            payload = self._decode(response, data)
+            etag = response.getheader("ETag")
+            if etag:
+                self._cache[url] = (etag, payload)
+                self._cache.move_to_end(url)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return payload
+
+    def patch(self, path, fields):
+        with self._lock:
+            response, data = self._request("PATCH", path, body=json.dumps(fields).encode("utf-8"))
+            return self._decode(response, data)
+
+    def _decode(self, response, data):
+        payload = json.loads(data) if data else None
+        if response.status >= 400:
+            message = payload.get("error") if isinstance(payload, dict) else response.reason
+            raise SyncError(response.status, message)
+        return payload
+
+    def invalidate(self, prefix=""):
+        """Forget cached responses whose URL starts with ``prefix``"""
+        with self._lock:
+            for url in [url for url in self._cache if url.startswith(prefix)]:
+                del self._cache[url]
+
+    # Resources
+
+    def iter_rows(self, resource, page_size=None, **filters):
+        """Every row of a resource, a page at a time"""
+        after = None
+        while True:
+            page = self.get(f"/api/{resource}", after=after, limit=page_size, **filters)
+            yield from page["items"]
+            after = page["next"]
+            if after is None:
+                return
+
+    def rows(self, resource, **filters):
+        return list(self.iter_rows(resource, **filters))
+
+    def row(self, resource, row_id):
+        return self.get(f"/api/{resource}/{row_id}")
+
+    def rows_by_id(self, resource, ids, batch_size=500):
+        """Rows for ``ids`` in as few requests as possible, in id order"""
+        ids = sorted(set(ids))
+        found = []
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            found.extend(self.get(f"/api/{resource}", ids=",".join(map(str, chunk)))["items"])
+        return found
+
+    def changes_since(self, version, limit=None):
+        """:class:`ChangeSet` of the server's changes after ``version``"""
+        payload = self.get("/api/changes", since=version, limit=limit)
+        changes = [Change(*item) for item in payload["items"]]
+        return ChangeSet(version, payload["version"], changes, payload["complete"], payload["more"])
+
+    def search_patients(self, text, limit=20):
+        return self.get("/api/search", q=text, limit=limit)["items"]
+
+    def delivery_days(self, start_date, end_date):
+        """Dates in the range that have deliveries, oldest first"""
+        payload = self.get("/api/delivery_days", start=start_date.isoformat(), end=end_date.isoformat())
+        return [date.fromisoformat(day) for day in payload["items"]]
+
+    def delivery_list(self, delivery_date, van_count=3):
+        """The day's list as :class:`DeliveryListEntry` rows"""
+        payload = self.get("/api/delivery_list", date=delivery_date.isoformat(), vans=van_count)
+        return [DeliveryListEntry(**item) for item in payload["items"]]
+
+    def update_delivery(self, delivery_id, **fields):
+        """Change a delivery's status, notes, van or route order"""
+        row = self.patch(f"/api/deliveries/{delivery_id}", fields)
+        for prefix in DELIVERY_PATHS:
+            self.invalidate(prefix)
+        return row
+
+
+class RemoteDeliveryListService:
+    """Delivery lists from a sync server, for code written against DeliveryListService"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def generate(self, delivery_date, van_count=3):
+        return self.client.delivery_list(delivery_date, van_count)
+
+    def iter_history(self, start_date, end_date, van_count=3, batch_size=None):
+        """Yield ``(delivery_date, entry)`` for every list from start to end date
+
+        One request per day; ``batch_size`` is accepted for compatibility
+        with :meth:`DeliveryListService.iter_history` and not used.
+        """
+        for delivery_date in self.client.delivery_days(start_date, end_date):
+            for entry in self.client.delivery_list(delivery_date, van_count):
+                yield delivery_date, entry
+
+    def generate_by_van(self, delivery_date, van_count=3):
+        vans = {}
+        for row in self.generate(delivery_date, van_count):
+            vans.setdefault(row.van_number, []).append(row)
+        return vans
@@ -0,0 +1,543 @@
+"""HTTP/JSON service sharing one delivery database between workstations.
+
+Run it on the machine that holds the database::
+
+    DELIVERY_SYNC_TOKEN=<secret> python -m src.sync.server --host <LAN address>
+
+and point the desktop clients at it with :class:`src.sync.client.SyncClient`,
+giving them the same token. When a token is set every request must carry
+``Authorization: Bearer <token>`` or gets ``401 Unauthorized``. The server
+refuses to listen on anything but a loopback address without one, since
+it hands out patient names and addresses and accepts delivery edits.
+The server is plain asyncio (no web framework): the event loop parses
+requests and database work runs on a thread pool sized to the engine's
+connection pool, so every worker has a pooled connection of its own.
+
+Endpoints (all JSON):
+
+``GET /api/<resource>``
+    A page of rows ordered by id. ``after`` is the last id of the previous
+    page, ``limit`` the page size; ``ids=1,2,3`` reads a batch by id
+    instead. Deliveries also filter on ``date`` and ``patient_id``.
+    Returns ``{"items": [...], "next": <cursor or null>}``.
+``GET /api/<resource>/<id>``
+    One row.
+``GET /api/delivery_list?date=YYYY-MM-DD&vans=3``
+    The day's delivery list, as built by :class:`DeliveryListService`.
+``GET /api/delivery_days?start=YYYY-MM-DD&end=YYYY-MM-DD``
+    The dates in the range that have deliveries, oldest first; with
+    ``delivery_list`` this pages through a history a day at a time.
+``GET /api/search?q=...&limit=20``
+    Ranked patient search.
+``GET /api/changes?since=N&limit=5000``
+    Entity, id and operation of every change after version ``since``
+    (see :mod:`src.database.change_log`). Returns ``{"version": ...,
+    "complete": ..., "more": ..., "items": [[version, entity, id, op]]}``.
+``PATCH /api/deliveries/<id>``
+    Update ``status``, ``notes``, ``van_number`` or ``route_order``.
+
+Updates are checked against the column types: ``van_number`` and
+``route_order`` take an integer or null, ``status`` and ``notes`` a string
+or null; anything else is ``400 Bad Request``.
+
+Every GET response carries an ETag; a request with a matching
+``If-None-Match`` gets ``304 Not Modified`` and no body, so clients only
+download data that has changed. Encoded responses are kept in memory
+against the change log version they were built at, so while nothing has
+been written a repeated GET costs one lookup of the current version
+instead of a query. Bodies over 1 KB are gzipped for clients that accept
+it.
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import sessionmaker
+
+from src.database.change_log import ChangeCursor, ChangeFeed
+from src.database.models import Delivery, Driver, ParcelType, Patient, Street, Vehicle
+
+DEFAULT_PORT = 8765
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+GZIP_MIN_BYTES = 1024
+MAX_BODY_BYTES = 1024 * 1024
+RESPONSE_CACHE_SIZE = 256
+# Shared secret clients must send; read by the server and the client
+TOKEN_VARIABLE = "DELIVERY_SYNC_TOKEN"
+
+# resource -> (table, key column, query parameters usable as filters)
+RESOURCES = {
+    "patients": (Patient.__table__, Patient.__table__.c.patient_id, {}),
+    "streets": (Street.__table__, Street.__table__.c.id, {}),
+    "deliveries": (Delivery.__table__, Delivery.__table__.c.id, {
+        "date": (Delivery.__table__.c.delivery_date, date.fromisoformat),
+        "patient_id": (Delivery.__table__.c.patient_id, int),
+    }),
+    "vehicles": (Vehicle.__table__, Vehicle.__table__.c.id, {}),
+    "drivers": (Driver.__table__, Driver.__table__.c.id, {}),
+    "parcel_types": (ParcelType.__table__, ParcelType.__table__.c.id, {}),
+}
+# field -> JSON types it accepts (None allowed for all of them)
+DELIVERY_FIELDS = {
+    "status": (str,),
+    "notes": (str,),
+    "van_number": (int,),
+    "route_order": (int,),
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+def encode_json(payload):
+    return json.dumps(payload, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def make_etag(body):
+    # Weak, because the same entity may be sent gzipped or not
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or etag[2:] in tags
+
+
+class SyncServer:
+    """Serves the database behind ``engine`` (the application's by default)
+
+    ``token`` defaults to the ``DELIVERY_SYNC_TOKEN`` environment variable.
+    Without one only loopback addresses may be used for ``host``.
+    """
+
+    def __init__(self, engine=None, host="127.0.0.1", port=DEFAULT_PORT,
+                 page_size=DEFAULT_PAGE_SIZE, max_workers=None, cache_size=RESPONSE_CACHE_SIZE,
+                 token=None):
+        self.token = token or os.environ.get(TOKEN_VARIABLE) or None
+        if self.token is None and not is_loopback(host):
+            raise ValueError(f"Serving on {host} needs a token; set {TOKEN_VARIABLE} or pass token")
+        if engine is None:
+            from src.database.database import db_manager
+            engine = db_manager.engine
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.page_size = page_size
+        self.session_factory = sessionmaker(bind=engine)
+        pool_size = getattr(engine.pool, "size", lambda: 5)()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or pool_size,
+                                            thread_name_prefix="sync-db")
+        self._server = None
+        self._loop = None
+        self._thread = None
+        # Created on first use, from whichever executor thread gets there
+        self._services_lock = threading.Lock()
+        self._list_service = None
+        self._search = None
+        self.changes = ChangeFeed(engine)
+        # Streets edited by another process must reach the street index too
+        self._street_changes = ChangeCursor(self.changes, ["Street"])
+        # url -> (change log version, body, etag); only touched on the loop
+        self._responses = OrderedDict()
+        self.cache_size = cache_size
+
+    # Lifecycle
+
+    async def start(self):
+        """Start listening; the bound port is in ``self.port`` afterwards"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def run(self):
+        """Serve until interrupted"""
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._executor.shutdown(wait=False)
+
+    def start_in_thread(self):
+        """Serve from a background thread and return once listening"""
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+            self._server.close()
+            # Drop idle keep-alive connections before closing the loop
+            connections = asyncio.all_tasks(self._loop)
+            for task in connections:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*connections, return_exceptions=True))
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="sync-server", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        """Stop a server started with :meth:`start_in_thread`"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+        self._executor.shutdown(wait=True)
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    # HTTP
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._send(writer, HTTPStatus.BAD_REQUEST, encode_json({"error": "Bad request line"}))
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._send(writer, HTTPStatus.BAD_REQUEST,
+                                     encode_json({"error": "Invalid Content-Length"}))
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._send(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                     encode_json({"error": "Request body too large"}))
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload, extra = await self._respond(method, target, headers, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._send(writer, status, payload, extra, headers, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Server shutting down; end the connection quietly
+            pass
+        finally:
+            writer.close()
+
+    def _authorised(self, headers):
+        if self.token is None:
+            return True
+        scheme, _, credentials = headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(
+            credentials.strip().encode("utf-8"), self.token.encode("utf-8")
+        )
+
+    async def _respond(self, method, target, headers, body):
+        if not self._authorised(headers):
+            return (HTTPStatus.UNAUTHORIZED, encode_json({"error": "Missing or wrong token"}),
+                    {"WWW-Authenticate": "Bearer"})
+        try:
+            if method == "GET":
+                body, etag = await self._get(target)
+            else:
+                body = encode_json(await self._dispatch(method, target, body))
+                etag = make_etag(body)
+        except HTTPError as e:
+            return e.status, encode_json({"error": str(e)}), {}
+        except Exception as e:
+            print(f"Sync server error on {method} {target}: {e}", file=sys.stderr)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, encode_json({"error": "Internal server error"}), {}
+
+        extra = {"ETag": etag, "Cache-Control": "no-cache"}
+        if method == "GET" and etag_matches(headers.get("if-none-match"), etag):
+            return HTTPStatus.NOT_MODIFIED, b"", extra
+        return HTTPStatus.OK, body, extra
+
+    async def _get(self, target):
+        """Body and ETag for a GET, reusing the cached copy if nothing has changed
+
+        The version is read before the query, so a write landing in
+        between leaves the entry tagged with the older version and the
+        next request rebuilds it.
+        """
+        version = await self._run(self.changes.current_version)
+        cached = self._responses.get(target)
+        if cached is not None and cached[0] == version:
+            self._responses.move_to_end(target)
+            return cached[1], cached[2]
+
+        body = encode_json(await self._dispatch("GET", target, b""))
+        etag = make_etag(body)
+        self._responses[target] = (version, body, etag)
+        self._responses.move_to_end(target)
+        while len(self._responses) > self.cache_size:
+            self._responses.popitem(last=False)
+        return body, etag
+
+    async def _send(self, writer, status, body, extra=None, request_headers=None, keep_alive=False):
+        headers = {"Content-Type": "application/json", "Vary": "Accept-Encoding"}
+        headers.update(extra or {})
+        accepts = (request_headers or {}).get("accept-encoding", "")
+        if len(body) >= GZIP_MIN_BYTES and "gzip" in accepts:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        if status != HTTPStatus.NOT_MODIFIED:
+            headers["Content-Length"] = str(len(body))
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _dispatch(self, method, target, body):
+        parts = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+        path = [segment for segment in parts.path.split("/") if segment]
+        if len(path) < 2 or path[0] != "api":
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No such endpoint: {parts.path}")
+        resource, key = path[1], path[2] if len(path) > 2 else None
+
+        if method == "PATCH" and resource == "deliveries" and key is not None:
+            fields = self._parse_body(body)
+            return await self._run(self.update_delivery, self._parse_int(key, "id"), fields)
+        if method != "GET":
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not supported on {parts.path}")
+
+        if resource == "delivery_list":
+            delivery_date = self._parse_date(query.get("date"))
+            van_count = self._parse_int(query.get("vans", "3"), "vans")
+            return await self._run(self.delivery_list, delivery_date, van_count)
+        if resource == "delivery_days" and key is None:
+            start = self._parse_date(query.get("start"))
+            end = self._parse_date(query.get("end", query.get("start")))
+            return await self._run(self.delivery_days, start, end)
+        if resource == "changes" and key is None:
+            since = self._parse_int(query.get("since", "0"), "since")
+            limit = self._parse_limit(query.get("limit", MAX_PAGE_SIZE))
+            return await self._run(self.changes_since, since, limit)
+        if resource == "search":
+            limit = self._parse_limit(query.get("limit", "20"))
+            return await self._run(self.search, query.get("q", ""), limit)
+        if resource not in RESOURCES:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No such resource: {resource}")
+        if key is not None:
+            return await self._run(self.get_row, resource, self._parse_int(key, "id"))
+        return await self._run(self.list_rows, resource, query)
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _parse_body(self, body):
+        try:
+            fields = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+        if not isinstance(fields, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        return fields
+
+    def _parse_int(self, value, name):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer")
+
+    def _parse_limit(self, value):
+        limit = self._parse_int(value, "limit")
+        if limit < 1:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "limit must be at least 1")
+        return min(limit, MAX_PAGE_SIZE)
+
+    def _parse_date(self, value):
+        try:
+            return date.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "date must be YYYY-MM-DD")
+
+    # Database work, run on the executor
+
+    def list_rows(self, resource, query):
+        table, key, filters = RESOURCES[resource]
+        stmt = select(table).order_by(key)
+        if "ids" in query:
+            try:
+                ids = [int(item) for item in query["ids"].split(",") if item]
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "ids must be a comma separated list of integers")
+            if len(ids) > MAX_PAGE_SIZE:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"At most {MAX_PAGE_SIZE} ids per request")
+            with self.engine.connect() as connection:
+                rows = connection.execute(stmt.where(key.in_(ids))).mappings().all()
+            return {"items": [dict(row) for row in rows], "next": None}
+
+        limit = self._parse_limit(query.get("limit", self.page_size))
+        if "after" in query:
+            stmt = stmt.where(key > self._parse_int(query["after"], "after"))
+        for name, (column, convert) in filters.items():
+            if name in query:
+                try:
+                    stmt = stmt.where(column == convert(query[name]))
+                except ValueError:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid value for {name}")
+        with self.engine.connect() as connection:
+            rows = connection.execute(stmt.limit(limit + 1)).mappings().all()
+        items = [dict(row) for row in rows[:limit]]
+        more = len(rows) > limit
+        return {"items": items, "next": items[-1][key.name] if more else None}
+
+    def get_row(self, resource, row_id):
+        table, key, _ = RESOURCES[resource]
+        with self.engine.connect() as connection:
+            row = connection.execute(select(table).where(key == row_id)).mappings().first()
+        if row is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No {resource} with id {row_id}")
+        return dict(row)
+
+    def changes_since(self, since, limit):
+        changes = self.changes.changes_since(since, limit=limit)
+        return {
+            "version": changes.version,
+            "complete": changes.complete,
+            "more": changes.more,
+            "items": [list(change) for change in changes.changes],
+        }
+
+    def list_service(self):
+        """The delivery list service, its street index up to date with the served database"""
+        with self._services_lock:
+            if self._list_service is None:
+                from src.services.delivery_list import DeliveryListService
+                from src.services.street_index import StreetIndex
+                # Its own index: the shared one reads the application's database
+                self._list_service = DeliveryListService(
+                    self.session_factory, StreetIndex(self.session_factory)
+                )
+            street_changes = self._street_changes.poll()
+            if street_changes is not None and (street_changes.changes or not street_changes.complete):
+                self._list_service.streets.invalidate()
+            return self._list_service
+
+    def delivery_list(self, delivery_date, van_count):
+        service = self.list_service()
+        try:
+            entries = service.generate(delivery_date, van_count)
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+        return {"date": delivery_date, "items": [entry._asdict() for entry in entries]}
+
+    def delivery_days(self, start, end):
+        return {"items": self.list_service().days(start, end)}
+
+    def search(self, text, limit):
+        with self._services_lock:
+            if self._search is None:
+                from src.services.patient_search import PatientSearch
+                self._search = PatientSearch(self.engine)
+        return {"items": [match._asdict() for match in self._search.search(text, limit)]}
+
+    def update_delivery(self, delivery_id, fields):
+        unknown = set(fields) - set(DELIVERY_FIELDS)
+        if unknown:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Cannot update {', '.join(sorted(unknown))}")
+        for name, value in fields.items():
+            # bool is an int subclass, but True is not a van number
+            if value is not None and (isinstance(value, bool) or not isinstance(value, DELIVERY_FIELDS[name])):
+                expected = "an integer" if DELIVERY_FIELDS[name] == (int,) else "a string"
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be {expected} or null")
+        table = Delivery.__table__
+        with self.engine.begin() as connection:
+            if fields:
+                connection.execute(update(table).where(table.c.id == delivery_id).values(**fields))
+            row = connection.execute(select(table).where(table.c.id == delivery_id)).mappings().first()
+        if row is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No deliveries with id {delivery_id}")
+        return dict(row)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Share the delivery database over HTTP")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help=f"address to listen on; anything but loopback needs {TOKEN_VARIABLE} set")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", help="database file (default: the application's)")
+    args = parser.parse_args(argv)
+
+    engine = None
+    if args.db:
+        from src.database.database import create_sqlite_engine
+        from src.database.models import Base
+        engine = create_sqlite_engine(args.db)
+        Base.metadata.create_all(engine)
+    try:
+        server = SyncServer(engine, args.host, args.port)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"Serving {engine.url.database if engine else 'the application database'} on "
+          f"http://{args.host}:{args.port}")
+    server.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
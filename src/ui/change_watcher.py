@@ -0,0 +1,63 @@
+"""Keeps open views in step with the database without full reloads.
+
+The watcher asks the change feed (``src.database.change_log``) what has
+changed since its last poll, on the task runner so the GUI never waits on
+SQLite, and tells views which rows to re-read or drop.
+"""
+from PySide6.QtCore import QObject, QTimer, Signal
+from src.database.change_log import ChangeCursor
+from src.services.settings_manager import CACHE_REGIONS, settings_cache
+from src.ui.workers import get_task_runner
+
+class ChangeWatcher(QObject):
+    """Polls the change feed and reports what other code has written
+
+    ``changed`` is emitted on the GUI thread with ``{entity: {id:
+    operation}}`` for every poll that found changes, whoever made them:
+    this window, a background task or another process on the same file.
+    ``reset`` is emitted instead when the log no longer reaches back to
+    the last poll, and views should reload everything. Cached settings
+    regions for the changed entities are dropped before either signal.
+    """
+
+    changed = Signal(dict)
+    reset = Signal()
+
+    def __init__(self, entities=None, interval_ms=2000, parent=None):
+        super().__init__(parent)
+        self.cursor = ChangeCursor(entities=entities)
+        self._polling = False
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.poll)
+
+    def start(self):
+        """Record the current version now and poll on the timer from then on"""
+        self.poll()
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def poll(self):
+        # One poll at a time; a slow one just delays the next
+        if self._polling:
+            return
+        self._polling = True
+        get_task_runner().submit(self.cursor.poll, on_result=self._on_result, on_done=self._on_done)
+
+    def _on_done(self):
+        self._polling = False
+
+    def _on_result(self, changes):
+        if changes is None:
+            return
+        if not changes.complete:
+            settings_cache.invalidate()
+            self.reset.emit()
+        elif changes.changes:
+            by_entity = changes.by_entity()
+            settings_cache.invalidate(*(CACHE_REGIONS[entity] for entity in by_entity if entity in CACHE_REGIONS))
+            self.changed.emit(by_entity)
+        if changes.more:
+            QTimer.singleShot(0, self.poll)
@@ -0,0 +1,150 @@
+"""Daily operations dashboard for the main window.
+
+Everything shown comes from the ``delivery_day_counts`` rollup (see
+``src.database.delivery_counts``), never from ``deliveries`` itself, so
+the figures for a day take the same few milliseconds to load however
+much history the database holds, apart from the day's deliveries with
+no stored van, which are placed on their street's van for the chosen
+number of vans as the delivery list does. The view reloads on its own
+when the change feed reports edits to deliveries, parcel types, streets
+or patients.
+"""
+from PySide6.QtCore import QDate, Qt
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QDateEdit, QComboBox,
+    QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView
+)
+from src.ui.workers import get_task_runner
+
+NO_VAN = "Unassigned"
+# Fleet sizes the streets carry a van assignment for
+VAN_COUNTS = (3, 4)
+NO_STATUS = "(none)"
+
+def read_only_table(headers):
+    table = QTableWidget(0, len(headers))
+    table.setHorizontalHeaderLabels(headers)
+    table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+    table.setSelectionMode(QAbstractItemView.NoSelection)
+    table.verticalHeader().setVisible(False)
+    table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+    return table
+
+def fill_table(table, headers, rows):
+    table.setColumnCount(len(headers))
+    table.setHorizontalHeaderLabels(headers)
+    table.setRowCount(len(rows))
+    for row_number, row in enumerate(rows):
+        for column, value in enumerate(row):
+            item = QTableWidgetItem(str(value))
+            if isinstance(value, int):
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            table.setItem(row_number, column, item)
+
+class DashboardWidget(QWidget):
+    """Counts for one day by van, status and parcel type"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.counts = None
+        self.change_watcher = None
+
+        layout = QVBoxLayout(self)
+
+        header = QHBoxLayout()
+        header.addWidget(QLabel("Deliveries on"))
+        self.date_edit = QDateEdit(QDate.currentDate())
+        self.date_edit.setCalendarPopup(True)
+        self.date_edit.setEnabled(False)
+        self.date_edit.dateChanged.connect(self.load)
+        header.addWidget(self.date_edit)
+        today_button = QPushButton("Today")
+        today_button.clicked.connect(lambda: self.date_edit.setDate(QDate.currentDate()))
+        header.addWidget(today_button)
+        header.addWidget(QLabel("Vans running"))
+        self.van_count_combo = QComboBox()
+        for van_count in VAN_COUNTS:
+            self.van_count_combo.addItem(str(van_count), van_count)
+        self.van_count_combo.currentIndexChanged.connect(self.load)
+        header.addWidget(self.van_count_combo)
+        header.addStretch()
+        layout.addLayout(header)
+
+        self.totals_label = QLabel("Opening database...")
+        layout.addWidget(self.totals_label)
+
+        self.van_table = read_only_table(["Van", "Total"])
+        layout.addWidget(self.van_table)
+        self.parcel_type_table = read_only_table(["Parcel Type", "Description", "Signature", "Total"])
+        layout.addWidget(self.parcel_type_table)
+
+    def start(self):
+        """Load the first figures; call once the database is ready"""
+        # Imported here so SQLAlchemy loads after the window is on screen
+        from src.database.delivery_counts import DeliveryCounts
+        from src.ui.change_watcher import ChangeWatcher
+
+        self.counts = DeliveryCounts()
+        self.date_edit.setEnabled(True)
+        # Streets and patients decide the van of deliveries without one
+        self.change_watcher = ChangeWatcher(
+            entities=["Delivery", "ParcelType", "Street", "Patient"], parent=self
+        )
+        self.change_watcher.changed.connect(self.on_changes)
+        self.change_watcher.reset.connect(self.on_changes)
+        self.change_watcher.start()
+        self.load()
+
+    def stop(self):
+        if self.change_watcher is not None:
+            self.change_watcher.stop()
+
+    def selected_date(self):
+        return self.date_edit.date().toPython()
+
+    def selected_van_count(self):
+        return self.van_count_combo.currentData()
+
+    def on_changes(self, changes=None):
+        # Another process may have moved a street to another van
+        if changes is None or "Street" in changes:
+            self.counts.streets().invalidate()
+        self.load()
+
+    def load(self, *args):
+        if self.counts is None:
+            return
+        get_task_runner().submit(
+            self.counts.summary, self.selected_date(), van_count=self.selected_van_count(),
+            on_result=self.show_summary,
+            on_error=lambda e: self.totals_label.setText(f"Could not load figures: {e}")
+        )
+
+    def show_summary(self, summary):
+        # A slow load for a date the user has already moved away from
+        if summary.start != self.selected_date():
+            return
+
+        by_status = summary.by_status()
+        self.totals_label.setText(
+            f"{summary.total} deliveries, {summary.signature_required} needing a signature"
+            if summary.total else "No deliveries"
+        )
+
+        statuses = list(by_status)
+        rows = [
+            [van or NO_VAN] + [counts.get(status, 0) for status in statuses] + [sum(counts.values())]
+            for van, counts in summary.by_van_and_status().items()
+        ]
+        if rows:
+            rows.append(["All vans"] + [by_status[status] for status in statuses] + [summary.total])
+        fill_table(self.van_table, ["Van"] + [status or NO_STATUS for status in statuses] + ["Total"], rows)
+
+        parcel_rows = []
+        for parcel_type_id, count in summary.by_parcel_type().items():
+            info = summary.parcel_types.get(parcel_type_id)
+            if info is None:
+                parcel_rows.append(["(none)", "", "", count])
+            else:
+                parcel_rows.append([info.code, info.description, "Yes" if info.requires_signature else "No", count])
+        fill_table(self.parcel_type_table, ["Parcel Type", "Description", "Signature", "Total"], parcel_rows)
@@ -1,12 +1,93 @@
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QTabWidget,
-    QWidget, QTableWidget, QTableWidgetItem,
+    QWidget, QTableView, QAbstractItemView,
     QPushButton, QHBoxLayout, QLabel,
     QLineEdit, QCheckBox, QMessageBox,
-    QDialogButtonBox
+    QDialogButtonBox, QInputDialog
 )
-from PySide6.QtCore import Qt
 from src.services.settings_manager import SettingsManager
+from src.database.models import Vehicle, Driver, ParcelType
+from src.ui.table_model import QueryTableModel, ActionButtonDelegate, yes_no
+from src.ui.change_watcher import ChangeWatcher
+from src.ui.workers import get_task_runner
+
+def run_in_background(widget, fn, *args, on_result=None, **kwargs):
+    """Run a service call off the GUI thread, reporting errors on ``widget``"""
+    return get_task_runner().submit(
+        fn, *args,
+        on_result=on_result,
+        on_error=lambda e: QMessageBox.critical(widget, "Error", str(e)),
+        **kwargs
+    )
+
+def create_table_view(model, on_action, parent=None):
+    """Table view over a QueryTableModel with button delegates for its actions"""
+    table = QTableView(parent)
+    table.setModel(model)
+    table.setSelectionBehavior(QAbstractItemView.SelectRows)
+    table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+    table.horizontalHeader().setStretchLastSection(True)
+    table.verticalHeader().setVisible(False)
+    
+    delegate = ActionButtonDelegate(table)
+    delegate.clicked.connect(on_action)
+    for offset in range(len(model.actions)):
+        table.setItemDelegateForColumn(len(model.columns) + offset, delegate)
+    # Keep a reference so the delegate lives as long as the view
+    table.action_delegate = delegate
+    return table
+
+def create_button_row(buttons):
+    """Row of push buttons from ``(label, slot)`` pairs"""
+    row_layout = QHBoxLayout()
+    for label, slot in buttons:
+        button = QPushButton(label)
+        button.clicked.connect(slot)
+        row_layout.addWidget(button)
+    row_layout.addStretch()
+    return row_layout
+
+def selected_rows(table):
+    """Database rows for the selected lines of a table view"""
+    model = table.model()
+    return [model.row(index) for index in table.selectionModel().selectedRows()]
+
+def confirm_selected(widget, rows, verb, noun):
+    """Ask before acting on a selection; False if nothing is selected"""
+    if not rows:
+        QMessageBox.information(widget, "Nothing Selected", f"Select one or more {noun} first")
+        return False
+    reply = QMessageBox.question(
+        widget,
+        f"Confirm {verb}",
+        f"Are you sure you want to {verb.lower()} {len(rows)} {noun}?",
+        QMessageBox.Yes | QMessageBox.No
+    )
+    return reply == QMessageBox.Yes
+
+def ask_for_lines(widget, title, label):
+    """Multi-line text prompt; returns the non-blank lines, or [] if cancelled"""
+    text, accepted = QInputDialog.getMultiLineText(widget, title, label)
+    if not accepted:
+        return []
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+def apply_batch_result(widget, model, result, removed=False):
+    """Update ``model`` for the rows a batch edit touched and report its errors"""
+    if removed:
+        for key in result.done:
+            model.remove_row(key)
+    else:
+        model.refresh_rows(result.done)
+    if result.errors:
+        lines = [message for _, message in result.errors[:20]]
+        if len(result.errors) > 20:
+            lines.append(f"... and {len(result.errors) - 20} more")
+        QMessageBox.warning(
+            widget,
+            "Some Items Were Skipped",
+            f"{len(result.done)} done, {len(result.errors)} skipped:\n\n" + "\n".join(lines)
+        )
 
 class EditDialog(QDialog):
     def __init__(self, title, fields, parent=None):
@@ -67,43 +148,43 @@ class VehiclesTab(QWidget):
         layout.addLayout(add_layout)
         
         # Vehicles table
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Registration", "Active", "Edit", "Delete"])
-        self.table.horizontalHeader().setStretchLastSection(True)
+        self.model = QueryTableModel(
+            self.settings_manager.active_vehicles_query(),
+            key=Vehicle.id,
+            columns=[
+                ("Registration", "registration", None),
+                ("Active", "active", yes_no)
+            ],
+            actions=["Edit", "Delete"],
+            parent=self
+        )
+        self.table = create_table_view(self.model, self.on_action, self)
         self.load_vehicles()
         layout.addWidget(self.table)
         
+        # Actions on several vehicles at once
+        layout.addLayout(create_button_row([
+            ("Add Several...", self.add_vehicles),
+            ("Deactivate Selected", self.deactivate_selected),
+            ("Delete Selected", self.delete_selected),
+        ]))
+        
         self.setLayout(layout)
     
     def load_vehicles(self):
-        vehicles = self.settings_manager.get_active_vehicles()
-        self.table.setRowCount(len(vehicles))
-        
-        for row, vehicle in enumerate(vehicles):
-            # Registration (non-editable)
-            reg_item = QTableWidgetItem(vehicle.registration)
-            reg_item.setFlags(reg_item.flags() & ~Qt.ItemIsEditable)
-            self.table.setItem(row, 0, reg_item)
-            
-            # Active status (non-editable)
-            active_item = QTableWidgetItem("Yes" if vehicle.active else "No")
-            active_item.setFlags(active_item.flags() & ~Qt.ItemIsEditable)
-            self.table.setItem(row, 1, active_item)
-            
-            # Edit button
-            edit_btn = QPushButton("Edit")
-            edit_btn.clicked.connect(lambda _, v=vehicle: self.edit_vehicle(v))
-            self.table.setCellWidget(row, 2, edit_btn)
-            
-            # Delete button
-            delete_btn = QPushButton("Delete")
-            delete_btn.clicked.connect(lambda _, v=vehicle: self.delete_vehicle(v))
-            self.table.setCellWidget(row, 3, delete_btn)
+        self.model.reload()
         
         # Resize columns to content
         self.table.resizeColumnsToContents()
     
+    def on_action(self, index):
+        vehicle = self.model.row(index)
+        action = self.model.action_for(index)
+        if action == "Edit":
+            self.edit_vehicle(vehicle)
+        elif action == "Delete":
+            self.delete_vehicle(vehicle)
+    
     def add_vehicle(self):
         registration = self.reg_input.text().strip()
         
@@ -111,12 +192,13 @@ class VehiclesTab(QWidget):
             QMessageBox.warning(self, "Error", "Registration cannot be empty")
             return
         
-        try:
-            self.settings_manager.add_vehicle(registration)
-            self.load_vehicles()
-            self.reg_input.clear()
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        run_in_background(
+            self,
+            self.settings_manager.add_vehicle,
+            registration,
+            on_result=lambda vehicle: self.model.refresh_row(vehicle.id)
+        )
+        self.reg_input.clear()
     
     def edit_vehicle(self, vehicle):
         # Create edit dialog
@@ -130,16 +212,15 @@ class VehiclesTab(QWidget):
         )
         
         if edit_dialog.exec():
-            try:
-                values = edit_dialog.get_values()
-                self.settings_manager.update_vehicle(
-                    vehicle.id,
-                    registration=values["Registration"],
-                    active=values["Active"]
-                )
-                self.load_vehicles()
-            except Exception as e:
-                QMessageBox.critical(self, "Error", str(e))
+            values = edit_dialog.get_values()
+            run_in_background(
+                self,
+                self.settings_manager.update_vehicle,
+                vehicle.id,
+                registration=values["Registration"],
+                active=values["Active"],
+                on_result=lambda _: self.model.refresh_row(vehicle.id)
+            )
     
     def delete_vehicle(self, vehicle):
         reply = QMessageBox.question(
@@ -150,11 +231,42 @@ class VehiclesTab(QWidget):
         )
         
         if reply == QMessageBox.Yes:
-            try:
-                self.settings_manager.delete_vehicle(vehicle.id)
-                self.load_vehicles()
-            except Exception as e:
-                QMessageBox.critical(self, "Error", str(e))
+            run_in_background(
+                self,
+                self.settings_manager.delete_vehicle,
+                vehicle.id,
+                on_result=lambda _: self.model.remove_row(vehicle.id)
+            )
+    
+    def add_vehicles(self):
+        registrations = ask_for_lines(self, "Add Vehicles", "Registrations, one per line:")
+        if registrations:
+            run_in_background(
+                self,
+                self.settings_manager.add_vehicles,
+                registrations,
+                on_result=lambda result: apply_batch_result(self, self.model, result)
+            )
+    
+    def deactivate_selected(self):
+        vehicles = selected_rows(self.table)
+        if confirm_selected(self, vehicles, "Deactivate", "vehicles"):
+            run_in_background(
+                self,
+                self.settings_manager.deactivate_vehicles,
+                [vehicle.id for vehicle in vehicles],
+                on_result=lambda result: apply_batch_result(self, self.model, result)
+            )
+    
+    def delete_selected(self):
+        vehicles = selected_rows(self.table)
+        if confirm_selected(self, vehicles, "Delete", "vehicles"):
+            run_in_background(
+                self,
+                self.settings_manager.delete_vehicles,
+                [vehicle.id for vehicle in vehicles],
+                on_result=lambda result: apply_batch_result(self, self.model, result, removed=True)
+            )
 
 class DriversTab(QWidget):
     def __init__(self, settings_manager):
@@ -178,43 +290,43 @@ class DriversTab(QWidget):
         layout.addLayout(add_layout)
         
         # Drivers table
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Name", "Active", "Edit", "Delete"])
-        self.table.horizontalHeader().setStretchLastSection(True)
+        self.model = QueryTableModel(
+            self.settings_manager.active_drivers_query(),
+            key=Driver.id,
+            columns=[
+                ("Name", "name", None),
+                ("Active", "active", yes_no)
+            ],
+            actions=["Edit", "Delete"],
+            parent=self
+        )
+        self.table = create_table_view(self.model, self.on_action, self)
         self.load_drivers()
         layout.addWidget(self.table)
         
+        # Actions on several drivers at once
+        layout.addLayout(create_button_row([
+            ("Add Several...", self.add_drivers),
+            ("Deactivate Selected", self.deactivate_selected),
+            ("Delete Selected", self.delete_selected),
+        ]))
+        
         self.setLayout(layout)
     
     def load_drivers(self):
-        drivers = self.settings_manager.get_active_drivers()
-        self.table.setRowCount(len(drivers))
-        
-        for row, driver in enumerate(drivers):
-            # Name (non-editable)
-            name_item = QTableWidgetItem(driver.name)
-            name_item.setFlags(name_item.flags() & ~Qt.ItemIsEditable)
-            self.table.setItem(row, 0, name_item)
-            
-            # Active status (non-editable)
-            active_item = QTableWidgetItem("Yes" if driver.active else "No")
-            active_item.setFlags(active_item.flags() & ~Qt.ItemIsEditable)
-            self.table.setItem(row, 1, active_item)
-            
-            # Edit button
-            edit_btn = QPushButton("Edit")
-            edit_btn.clicked.connect(lambda _, d=driver: self.edit_driver(d))
-            self.table.setCellWidget(row, 2, edit_btn)
-            
-            # Delete button
-            delete_btn = QPushButton("Delete")
-            delete_btn.clicked.connect(lambda _, d=driver: self.delete_driver(d))
-            self.table.setCellWidget(row, 3, delete_btn)
+        self.model.reload()
         
         # Resize columns to content
         self.table.resizeColumnsToContents()
     
+    def on_action(self, index):
+        driver = self.model.row(index)
+        action = self.model.action_for(index)
+        if action == "Edit":
+            self.edit_driver(driver)
+        elif action == "Delete":
+            self.delete_driver(driver)
+    
     def add_driver(self):
         name = self.name_input.text().strip()
         
@@ -222,12 +334,13 @@ class DriversTab(QWidget):
             QMessageBox.warning(self, "Error", "Name cannot be empty")
             return
         
-        try:
-            self.settings_manager.add_driver(name)
-            self.load_drivers()
-            self.name_input.clear()
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        run_in_background(
+            self,
+            self.settings_manager.add_driver,
+            name,
+            on_result=lambda driver: self.model.refresh_row(driver.id)
+        )
+        self.name_input.clear()
     
     def edit_driver(self, driver):
         # Create edit dialog
@@ -241,16 +354,15 @@ class DriversTab(QWidget):
         )
         
         if edit_dialog.exec():
-            try:
-                values = edit_dialog.get_values()
-                self.settings_manager.update_driver(
-                    driver.id,
-                    name=values["Name"],
-                    active=values["Active"]
-                )
-                self.load_drivers()
-            except Exception as e:
-                QMessageBox.critical(self, "Error", str(e))
+            values = edit_dialog.get_values()
+            run_in_background(
+                self,
+                self.settings_manager.update_driver,
+                driver.id,
+                name=values["Name"],
+                active=values["Active"],
+                on_result=lambda _: self.model.refresh_row(driver.id)
+            )
     
     def delete_driver(self, driver):
         reply = QMessageBox.question(
@@ -261,11 +373,42 @@ class DriversTab(QWidget):
         )
         
         if reply == QMessageBox.Yes:
-            try:
-                self.settings_manager.delete_driver(driver.id)
-                self.load_drivers()
-            except Exception as e:
-                QMessageBox.critical(self, "Error", str(e))
+            run_in_background(
+                self,
+                self.settings_manager.delete_driver,
+                driver.id,
+                on_result=lambda _: self.model.remove_row(driver.id)
+            )
+    
+    def add_drivers(self):
+        names = ask_for_lines(self, "Add Drivers", "Names, one per line:")
+        if names:
+            run_in_background(
+                self,
+                self.settings_manager.add_drivers,
+                names,
+                on_result=lambda result: apply_batch_result(self, self.model, result)
+            )
+    
+    def deactivate_selected(self):
+        drivers = selected_rows(self.table)
+        if confirm_selected(self, drivers, "Deactivate", "drivers"):
+            run_in_background(
+                self,
+                self.settings_manager.deactivate_drivers,
+                [driver.id for driver in drivers],
+                on_result=lambda result: apply_batch_result(self, self.model, result)
+            )
+    
+    def delete_selected(self):
+        drivers = selected_rows(self.table)
+        if confirm_selected(self, drivers, "Delete", "drivers"):
+            run_in_background(
+                self,
+                self.settings_manager.delete_drivers,
+                [driver.id for driver in drivers],
+                on_result=lambda result: apply_batch_result(self, self.model, result, removed=True)
+            )
 
 class ParcelTypeTab(QWidget):
     def __init__(self, settings_manager):
@@ -301,48 +444,44 @@ class ParcelTypeTab(QWidget):
         layout.addLayout(add_layout)
         
         # Parcel types table
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["Code", "Description", "Signature Required", "Edit", "Delete"])
-        self.table.horizontalHeader().setStretchLastSection(True)
+        self.model = QueryTableModel(
+            self.settings_manager.parcel_types_query(),
+            key=ParcelType.id,
+            columns=[
+                ("Code", "code", None),
+                ("Description", "description", None),
+                ("Signature Required", "requires_signature", yes_no)
+            ],
+            actions=["Edit", "Delete"],
+            parent=self
+        )
+        self.table = create_table_view(self.model, self.on_action, self)
         self.load_parcel_types()
         layout.addWidget(self.table)
         
+        # Actions on several parcel types at once
+        layout.addLayout(create_button_row([
+            ("Signature On for Selected", lambda: self.set_signature_selected(True)),
+            ("Signature Off for Selected", lambda: self.set_signature_selected(False)),
+            ("Delete Selected", self.delete_selected),
+        ]))
+        
         self.setLayout(layout)
     
     def load_parcel_types(self):
-        parcel_types = self.settings_manager.get_parcel_types()
-        self.table.setRowCount(len(parcel_types))
-        
-        for row, parcel_type in enumerate(parcel_types):
-            # Code (non-editable)
-            code_item = QTableWidgetItem(parcel_type.code)
-            code_item.setFlags(code_item.flags() & ~Qt.ItemIsEditable)
-            self.table.setItem(row, 0, code_item)
-            
-            # Description (non-editable)
-            desc_item = QTableWidgetItem(parcel_type.description)
-            desc_item.setFlags(desc_item.flags() & ~Qt.ItemIsEditable)
-            self.table.setItem(row, 1, desc_item)
-            
-            # Signature Required (non-editable)
-            sig_item = QTableWidgetItem("Yes" if parcel_type.requires_signature else "No")
-            sig_item.setFlags(sig_item.flags() & ~Qt.ItemIsEditable)
-            self.table.setItem(row, 2, sig_item)
-            
-            # Edit button
-            edit_btn = QPushButton("Edit")
-            edit_btn.clicked.connect(lambda _, pt=parcel_type: self.edit_parcel_type(pt))
-            self.table.setCellWidget(row, 3, edit_btn)
-            
-            # Delete button
-            delete_btn = QPushButton("Delete")
-            delete_btn.clicked.connect(lambda _, pt=parcel_type: self.delete_parcel_type(pt))
-            self.table.setCellWidget(row, 4, delete_btn)
+        self.model.reload()
         
         # Resize columns to content
         self.table.resizeColumnsToContents()
     
+    def on_action(self, index):
+        parcel_type = self.model.row(index)
+        action = self.model.action_for(index)
+        if action == "Edit":
+            self.edit_parcel_type(parcel_type)
+        elif action == "Delete":
+            self.delete_parcel_type(parcel_type)
+    
     def add_parcel_type(self):
         code = self.code_input.text().strip()
         description = self.desc_input.text().strip()
@@ -351,18 +490,17 @@ class ParcelTypeTab(QWidget):
             QMessageBox.warning(self, "Error", "Code and Description are required")
             return
         
-        try:
-            self.settings_manager.add_parcel_type(
-                code,
-                description,
-                self.sig_required.isChecked()
-            )
-            self.load_parcel_types()
-            self.code_input.clear()
-            self.desc_input.clear()
-            self.sig_required.setChecked(False)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        run_in_background(
+            self,
+            self.settings_manager.add_parcel_type,
+            code,
+            description,
+            self.sig_required.isChecked(),
+            on_result=lambda parcel_type: self.model.refresh_row(parcel_type.id)
+        )
+        self.code_input.clear()
+        self.desc_input.clear()
+        self.sig_required.setChecked(False)
     
     def edit_parcel_type(self, parcel_type):
         # Create edit dialog
@@ -377,17 +515,16 @@ class ParcelTypeTab(QWidget):
         )
         
         if edit_dialog.exec():
-            try:
-                values = edit_dialog.get_values()
-                self.settings_manager.update_parcel_type(
-                    parcel_type.id,
-                    code=values["Code"],
-                    description=values["Description"],
-                    requires_signature=values["Requires Signature"]
-                )
-                self.load_parcel_types()
-            except Exception as e:
-                QMessageBox.critical(self, "Error", str(e))
+            values = edit_dialog.get_values()
+            run_in_background(
+                self,
+                self.settings_manager.update_parcel_type,
+                parcel_type.id,
+                code=values["Code"],
+                description=values["Description"],
+                requires_signature=values["Requires Signature"],
+                on_result=lambda _: self.model.refresh_row(parcel_type.id)
+            )
     
     def delete_parcel_type(self, parcel_type):
         reply = QMessageBox.question(
@@ -398,11 +535,41 @@ class ParcelTypeTab(QWidget):
         )
         
         if reply == QMessageBox.Yes:
-            try:
-                self.settings_manager.delete_parcel_type(parcel_type.id)
-                self.load_parcel_types()
-            except Exception as e:
-                QMessageBox.critical(self, "Error", str(e))
+            run_in_background(
+                self,
+                self.settings_manager.delete_parcel_type,
+                parcel_type.id,
+                on_result=lambda _: self.model.remove_row(parcel_type.id)
+            )
+    
+    def set_signature_selected(self, requires_signature):
+        parcel_types = selected_rows(self.table)
+        if not parcel_types:
+            QMessageBox.information(self, "Nothing Selected", "Select one or more parcel types first")
+            return
+        run_in_background(
+            self,
+            self.settings_manager.upsert_parcel_types,
+            [
+                {
+                    "code": parcel_type.code,
+                    "description": parcel_type.description,
+                    "requires_signature": requires_signature,
+                }
+                for parcel_type in parcel_types
+            ],
+            on_result=lambda result: apply_batch_result(self, self.model, result)
+        )
+    
+    def delete_selected(self):
+        parcel_types = selected_rows(self.table)
+        if confirm_selected(self, parcel_types, "Delete", "parcel types"):
+            run_in_background(
+                self,
+                self.settings_manager.delete_parcel_types,
+                [parcel_type.id for parcel_type in parcel_types],
+                on_result=lambda result: apply_batch_result(self, self.model, result, removed=True)
+            )
 
 class SettingsDialog(QDialog):
     def __init__(self, parent=None):
@@ -431,9 +598,33 @@ class SettingsDialog(QDialog):
         
         layout.addWidget(tabs)
         
+        # Pick up edits made elsewhere (another window, an import, another
+        # machine on the same file) row by row instead of reloading
+        self.tab_models = {
+            "Vehicle": vehicles_tab.model,
+            "Driver": drivers_tab.model,
+            "ParcelType": parcel_types_tab.model,
+        }
+        self.change_watcher = ChangeWatcher(entities=list(self.tab_models), parent=self)
+        self.change_watcher.changed.connect(self.apply_changes)
+        self.change_watcher.reset.connect(self.reload_all)
+        self.change_watcher.start()
+        
         # Close button
         close_btn = QPushButton("Close")
         close_btn.clicked.connect(self.close)
         layout.addWidget(close_btn)
         
         self.setLayout(layout)
+    
+    def apply_changes(self, changes):
+        for entity, rows in changes.items():
+            self.tab_models[entity].apply_changes(rows)
+    
+    def reload_all(self):
+        for model in self.tab_models.values():
+            model.reload()
+    
+    def done(self, result):
+        self.change_watcher.stop()
+        super().done(result)
@@ -3,7 +3,8 @@ from PySide6.QtWidgets import (
     QLabel, QPushButton
 )
 from PySide6.QtGui import QFont
-from src.ui.dialogs.settings_dialog import SettingsDialog
+from src.ui.dashboard import DashboardWidget
+from src.ui.workers import get_task_runner
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -11,7 +12,7 @@ class MainWindow(QMainWindow):
         
         # Set window properties
         self.setWindowTitle("Delivery Management System")
-        self.resize(800, 600)
+        self.resize(800, 700)
         
         # Create central widget and layout
         central_widget = QWidget()
@@ -22,6 +23,10 @@ class MainWindow(QMainWindow):
         welcome_label.setFont(QFont("Arial", 16))
         layout.addWidget(welcome_label)
         
+        # Today's figures, filled in once the database is open
+        self.dashboard = DashboardWidget()
+        layout.addWidget(self.dashboard)
+        
         # Add a test button
         test_button = QPushButton("Click Me!")
         test_button.clicked.connect(self.on_button_click)
@@ -35,10 +40,22 @@ class MainWindow(QMainWindow):
         # Set the central widget
         self.setCentralWidget(central_widget)
     
+    def on_database_ready(self, _=None):
+        self.dashboard.start()
+    
     def open_settings(self):
+        # Imported on first use: it pulls in SQLAlchemy and the models
+        from src.ui.dialogs.settings_dialog import SettingsDialog
+        
         # Create and show the settings dialog
         settings_dialog = SettingsDialog(self)
         settings_dialog.exec()
     
+    def closeEvent(self, event):
+        # Let background database work finish before the window goes
+        self.dashboard.stop()
+        get_task_runner().shutdown()
+        super().closeEvent(event)
+    
     def on_button_click(self):
         print("Button was clicked!")
@@ -0,0 +1,267 @@
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, Signal
+from PySide6.QtWidgets import (
+    QStyledItemDelegate, QStyleOptionButton, QStyle, QApplication
+)
+from src.database.database import session_scope
+from src.ui.workers import get_task_runner
+
+# Role returning the whole database row for an index
+RowRole = Qt.ItemDataRole.UserRole + 1
+
+# Keys per IN (...) when re-reading changed rows
+REFRESH_BATCH = 500
+
+def yes_no(value):
+    return "Yes" if value else "No"
+
+def _read_rows(stmt):
+    with session_scope() as session:
+        return session.execute(stmt).all()
+
+def _read_keyed(query, key, keys):
+    rows = []
+    with session_scope() as session:
+        for start in range(0, len(keys), REFRESH_BATCH):
+            batch = keys[start:start + REFRESH_BATCH]
+            rows.extend(session.execute(query.where(key.in_(batch))).all())
+    return rows
+
+class QueryTableModel(QAbstractTableModel):
+    """Table model over a SQLAlchemy select, fetched a page at a time
+
+    ``columns`` is a list of ``(header, field, formatter)`` where ``field``
+    names a column of the select and ``formatter`` (optional) turns the
+    value into display text. ``actions`` adds trailing button columns
+    (e.g. "Edit", "Delete") drawn by :class:`ActionButtonDelegate`.
+
+    Rows are read in pages ordered by ``key`` using keyset pagination, so
+    opening a view over a large table only reads the rows that are shown.
+    After an edit call :meth:`refresh_row` or :meth:`remove_row` instead of
+    reloading everything.
+
+    Pages and refreshed rows are read on the task runner and applied when
+    they arrive, so scrolling and change-feed updates never block the GUI
+    thread. While a page is being read :meth:`canFetchMore` is False.
+    Results that arrive after :meth:`reload` are dropped.
+    """
+
+    def __init__(self, query, key, columns, actions=(), page_size=200, parent=None):
+        super().__init__(parent)
+        self.query = query
+        self.key = key
+        self.columns = columns
+        self.actions = list(actions)
+        self.page_size = page_size
+        self._rows = []
+        self._positions = {}
+        self._exhausted = False
+        self._fetching = False
+        self._generation = 0
+
+    # Qt model interface
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns) + len(self.actions)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or orientation != Qt.Horizontal:
+            return None
+        if section < len(self.columns):
+            return self.columns[section][0]
+        return self.actions[section - len(self.columns)]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        column = index.column()
+
+        if role == RowRole:
+            return row
+        if role != Qt.DisplayRole:
+            return None
+        if column >= len(self.columns):
+            return self.actions[column - len(self.columns)]
+
+        _, field, formatter = self.columns[column]
+        value = getattr(row, field)
+        if formatter is not None:
+            return formatter(value)
+        return "" if value is None else str(value)
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable if index.isValid() else Qt.NoItemFlags
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted or self._fetching:
+            return
+        stmt = self.query.order_by(self.key).limit(self.page_size)
+        if self._rows:
+            stmt = stmt.where(self.key > self._key_of(self._rows[-1]))
+
+        self._fetching = True
+        generation = self._generation
+        get_task_runner().submit(
+            _read_rows, stmt,
+            on_result=lambda page: self._append_page(generation, page),
+            on_done=lambda: self._fetch_done(generation)
+        )
+
+    def _fetch_done(self, generation):
+        if generation == self._generation:
+            self._fetching = False
+
+    def _append_page(self, generation, page):
+        if generation != self._generation:
+            return
+        if len(page) < self.page_size:
+            self._exhausted = True
+        # A row refreshed while the page was being read is already here
+        page = [row for row in page if self._key_of(row) not in self._positions]
+        if not page:
+            return
+
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        for offset, row in enumerate(page):
+            self._rows.append(row)
+            self._positions[self._key_of(row)] = first + offset
+        self.endInsertRows()
+
+    # Row access and incremental updates
+    def _key_of(self, row):
+        return getattr(row, self.key.key)
+
+    def row(self, index):
+        """Return the database row at a model index or row number"""
+        position = index.row() if isinstance(index, QModelIndex) else index
+        return self._rows[position]
+
+    def action_for(self, index):
+        """Return the action name for an index, or None for data columns"""
+        column = index.column() - len(self.columns)
+        return self.actions[column] if 0 <= column < len(self.actions) else None
+
+    def reload(self):
+        """Drop every loaded row and fetch the first page again"""
+        self.beginResetModel()
+        self._rows = []
+        self._positions = {}
+        self._exhausted = False
+        self._fetching = False
+        self._generation += 1
+        self.endResetModel()
+        self.fetchMore()
+
+    def refresh_row(self, key):
+        """Re-read one row after an insert or update"""
+        self.refresh_rows([key])
+
+    def refresh_rows(self, keys):
+        """Re-read rows after inserts or updates, in one background query
+
+        A row that no longer matches the query is removed. A new row is
+        appended if every earlier page has been loaded; otherwise it will
+        arrive with a later page.
+        """
+        keys = list(keys)
+        if not keys:
+            return
+        generation = self._generation
+        get_task_runner().submit(
+            _read_keyed, self.query, self.key, keys,
+            on_result=lambda rows: self._apply_rows(generation, keys, rows)
+        )
+
+    def _apply_rows(self, generation, keys, rows):
+        if generation != self._generation:
+            return
+        found = {self._key_of(row): row for row in rows}
+        for key in keys:
+            row = found.get(key)
+            position = self._positions.get(key)
+            if row is None:
+                if position is not None:
+                    self.remove_row(key)
+            elif position is not None:
+                self._rows[position] = row
+                self.dataChanged.emit(
+                    self.index(position, 0),
+                    self.index(position, self.columnCount() - 1)
+                )
+            elif self._exhausted or (self._rows and key < self._key_of(self._rows[-1])):
+                self._insert_sorted(row)
+
+    def apply_changes(self, changes, reload_above=200):
+        """Bring loaded rows up to date with ``{key: operation}`` from the change feed
+
+        Deleted rows are dropped straight away; the rest are re-read
+        together with :meth:`refresh_rows`. Past ``reload_above`` changes
+        the model reloads instead.
+        """
+        if len(changes) > reload_above:
+            self.reload()
+            return
+        updated = []
+        for key, operation in changes.items():
+            if operation == "delete":
+                self.remove_row(key)
+            else:
+                updated.append(key)
+        self.refresh_rows(updated)
+
+    def _insert_sorted(self, row):
+        key = self._key_of(row)
+        position = len(self._rows)
+        while position > 0 and self._key_of(self._rows[position - 1]) > key:
+            position -= 1
+        self.beginInsertRows(QModelIndex(), position, position)
+        self._rows.insert(position, row)
+        self._reindex(position)
+        self.endInsertRows()
+
+    def remove_row(self, key):
+        """Drop a row that has been deleted"""
+        position = self._positions.get(key)
+        if position is None:
+            return
+        self.beginRemoveRows(QModelIndex(), position, position)
+        del self._rows[position]
+        del self._positions[key]
+        self._reindex(position)
+        self.endRemoveRows()
+
+    def _reindex(self, start):
+        for position in range(start, len(self._rows)):
+            self._positions[self._key_of(self._rows[position])] = position
+
+class ActionButtonDelegate(QStyledItemDelegate):
+    """Draws an action column as push buttons without creating widgets
+
+    ``clicked`` is emitted with the model index when a button is released.
+    """
+
+    clicked = Signal(QModelIndex)
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = index.data()
+        button.state = QStyle.State_Enabled
+        if option.state & QStyle.State_MouseOver:
+            button.state |= QStyle.State_MouseOver
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, button, painter)
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.MouseButtonRelease
+                and event.button() == Qt.LeftButton
+                and option.rect.contains(event.position().toPoint())):
+            self.clicked.emit(index)
+            return True
+        return super().editorEvent(event, model, option, index)
@@ -0,0 +1,156 @@
+"""Background execution of service calls for the Qt UI.
+
+Database work and imports run on a QThreadPool so the event loop never
+waits on SQLite. Results, errors and progress come back as Qt signals,
+which are delivered on the GUI thread.
+
+Service calls open their own short-lived sessions (see
+``session_scope``), so every worker thread uses its own connection from
+the engine's pool. A TaskContext's ``progress`` method fits straight into
+the importer's progress callback::
+
+    runner.submit(
+        lambda context: StreamingImporter(progress_callback=context.progress).import_file(path),
+        with_context=True, on_progress=show_progress, on_result=import_done
+    )
+"""
+import threading
+import traceback
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+
+class TaskCancelled(Exception):
+    """Raised inside a task when it has been cancelled"""
+
+class TaskContext:
+    """Handed to tasks submitted with ``with_context=True``
+
+    Long-running work should call :meth:`progress` now and then; it also
+    raises :class:`TaskCancelled` once the task has been cancelled, so a
+    cancelled import stops at the next batch boundary.
+    """
+
+    def __init__(self, signals):
+        self._signals = signals
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        """Raise TaskCancelled if the task has been cancelled"""
+        if self._cancelled.is_set():
+            raise TaskCancelled()
+
+    def progress(self, value):
+        """Report progress to the GUI thread and honour cancellation"""
+        self.check()
+        self._signals.progress.emit(value)
+
+class TaskSignals(QObject):
+    progress = Signal(object)
+    finished = Signal(object)
+    failed = Signal(object)
+    cancelled = Signal()
+    done = Signal()
+
+class Task(QRunnable):
+    """A function call run on the thread pool"""
+
+    def __init__(self, fn, args=(), kwargs=None, with_context=False):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.with_context = with_context
+        self.signals = TaskSignals()
+        self.context = TaskContext(self.signals)
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        """Ask the task to stop; a task that has not started never runs"""
+        self.context.cancel()
+
+    @property
+    def cancelled(self):
+        return self.context.cancelled
+
+    def run(self):
+        try:
+            self.context.check()
+            args = (self.context, *self.args) if self.with_context else self.args
+            result = self.fn(*args, **self.kwargs)
+        except TaskCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            e.formatted_traceback = traceback.format_exc()
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(result)
+        finally:
+            self.signals.done.emit()
+
+class TaskRunner(QObject):
+    """Submits tasks to a thread pool and keeps them alive until done"""
+
+    def __init__(self, max_threads=None, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        if max_threads:
+            self.pool.setMaxThreadCount(max_threads)
+        self._active = set()
+
+    def submit(self, fn, *args, on_result=None, on_error=None, on_progress=None,
+               on_cancelled=None, on_done=None, with_context=False, **kwargs):
+        """Run ``fn(*args, **kwargs)`` in the pool and return its Task
+
+        The ``on_*`` callbacks are called on the GUI thread; ``on_done``
+        follows whichever of the others applies. They are connected
+        before the task starts, so connect to ``task.signals`` afterwards
+        only for signals a fast task cannot already have sent. With
+        ``with_context=True`` the function receives a :class:`TaskContext`
+        as its first argument for progress reporting and cancellation.
+        """
+        task = Task(fn, args, kwargs, with_context)
+        if on_result is not None:
+            task.signals.finished.connect(on_result)
+        if on_error is not None:
+            task.signals.failed.connect(on_error)
+        if on_progress is not None:
+            task.signals.progress.connect(on_progress)
+        if on_cancelled is not None:
+            task.signals.cancelled.connect(on_cancelled)
+        if on_done is not None:
+            task.signals.done.connect(on_done)
+        task.signals.done.connect(lambda: self._active.discard(task))
+
+        self._active.add(task)
+        self.pool.start(task)
+        return task
+
+    @property
+    def active_count(self):
+        return len(self._active)
+
+    def cancel_all(self):
+        for task in list(self._active):
+            task.cancel()
+
+    @Slot()
+    def shutdown(self, timeout_ms=5000):
+        """Cancel outstanding work and wait for running tasks to finish"""
+        self.cancel_all()
+        return self.pool.waitForDone(timeout_ms)
+
+_runner = None
+
+def get_task_runner():
+    """Return the application's shared TaskRunner"""
+    global _runner
+    if _runner is None:
+        _runner = TaskRunner()
+    return _runner
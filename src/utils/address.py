@@ -0,0 +1,83 @@
+"""Address normalisation for matching patient addresses to streets.
+
+The legacy spreadsheets spell the same road many ways ("High St",
+"HIGH STREET", "High Street."), so lookups compare normalised keys rather
+than the raw text.
+"""
+import re
+
+# Abbreviated road types, expanded when they end the road name
+ROAD_TYPES = {
+    "rd": "road",
+    "st": "street",
+    "str": "street",
+    "ave": "avenue",
+    "av": "avenue",
+    "ln": "lane",
+    "cl": "close",
+    "dr": "drive",
+    "gdns": "gardens",
+    "gdn": "gardens",
+    "cres": "crescent",
+    "ct": "court",
+    "pl": "place",
+    "sq": "square",
+    "tce": "terrace",
+    "terr": "terrace",
+    "gr": "grove",
+    "gro": "grove",
+    "pk": "park",
+    "hl": "hill",
+    "wy": "way",
+    "pde": "parade",
+    "mws": "mews",
+}
+
+# Abbreviations that can appear anywhere in the name
+WORDS = {
+    "&": "and",
+    "mt": "mount",
+    "gt": "great",
+    "lt": "little",
+    "upr": "upper",
+    "lwr": "lower",
+}
+
+_APOSTROPHES = re.compile(r"['’`]")
+_SEPARATORS = re.compile(r"[^\w&]+")
+
+
+def _tokens(text):
+    if not text:
+        return []
+    text = _APOSTROPHES.sub("", str(text).lower())
+    return [token for token in _SEPARATORS.split(text) if token]
+
+
+def normalise_road_name(name):
+    """Return the comparison key for a road name
+
+    >>> normalise_road_name("St. Mary's Rd")
+    'saint marys road'
+    """
+    tokens = [WORDS.get(token, token) for token in _tokens(name)]
+    if not tokens:
+        return ""
+    last = len(tokens) - 1
+    for index, token in enumerate(tokens):
+        if index == last and index > 0:
+            tokens[index] = ROAD_TYPES.get(token, token)
+        elif token == "st":
+            # "St" before other words is Saint, as in "St Mary's Road"
+            tokens[index] = "saint"
+    return " ".join(tokens)
+
+
+def normalise_town(town):
+    """Return the comparison key for a town name"""
+    return " ".join(WORDS.get(token, token) for token in _tokens(town))
+
+
+def street_key(road_name, town):
+    """Key used to index streets and look up patient addresses"""
+    return normalise_road_name(road_name), normalise_town(town)
@@ -0,0 +1,45 @@
+"""Fixtures shared by the tests
+
+HOME points at a temporary directory before anything under ``src`` is
+imported, so the application's own database singleton never opens a real
+file. Tests that need a database use the ``engine`` fixture, a fresh file
+with the full schema (triggers included) in the test's tmp_path.
+"""
+import os
+import tempfile
+
+os.environ["HOME"] = os.environ["USERPROFILE"] = tempfile.mkdtemp(prefix="delivery-tests-")
+os.environ.pop("DELIVERY_SYNC_TOKEN", None)
+os.environ.pop("DELIVERY_SQL_STATS", None)
+
+import csv
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import create_sqlite_engine
+from src.database.models import Base
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_sqlite_engine(tmp_path / "test.sqlite")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    """Write ``rows`` (heading first) to a CSV file and return its path"""
+    def write(name, rows):
+        path = tmp_path / name
+        with open(path, "w", newline="", encoding="utf-8") as handle:
+            csv.writer(handle).writerows(rows)
+        return path
+    return write
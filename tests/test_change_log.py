@@ -0,0 +1,92 @@
+from sqlalchemy import insert, update
+
+from src.database.change_log import ChangeCursor, ChangeFeed
+from src.database.models import Patient, Street, Vehicle
+
+
+def add_patients(engine, *patient_ids):
+    with engine.begin() as connection:
+        connection.execute(insert(Patient.__table__), [{"patient_id": patient_id} for patient_id in patient_ids])
+
+
+def test_triggers_record_inserts_updates_and_deletes(engine):
+    feed = ChangeFeed(engine)
+    add_patients(engine, 1, 2)
+    patients = Patient.__table__
+    with engine.begin() as connection:
+        connection.execute(update(patients).where(patients.c.patient_id == 1).values(town="Ashford"))
+        connection.execute(patients.delete().where(patients.c.patient_id == 2))
+
+    changes = feed.changes_since(0)
+
+    assert [(change.entity, change.entity_id, change.operation) for change in changes.changes] == [
+        ("Patient", 1, "insert"),
+        ("Patient", 2, "insert"),
+        ("Patient", 1, "update"),
+        ("Patient", 2, "delete"),
+    ]
+    assert changes.version == feed.current_version() == 4
+    assert changes.complete and not changes.more
+    assert changes.by_entity() == {"Patient": {1: "update", 2: "delete"}}
+
+
+def test_update_that_changes_nothing_is_not_recorded(engine):
+    feed = ChangeFeed(engine)
+    add_patients(engine, 1)
+    version = feed.current_version()
+    patients = Patient.__table__
+    with engine.begin() as connection:
+        connection.execute(update(patients).values(town=None))
+
+    assert feed.changes_since(version).changes == []
+
+
+def test_limit_splits_changes_into_pages(engine):
+    feed = ChangeFeed(engine)
+    add_patients(engine, *range(1, 6))
+
+    first = feed.changes_since(0, limit=3)
+    second = feed.changes_since(first.version, limit=3)
+
+    assert [change.entity_id for change in first.changes] == [1, 2, 3]
+    assert first.more and first.version == 3
+    assert [change.entity_id for change in second.changes] == [4, 5]
+    assert not second.more and second.version == 5
+
+
+def test_filtered_read_still_advances_past_other_entities(engine):
+    feed = ChangeFeed(engine)
+    add_patients(engine, 1, 2)
+
+    changes = feed.changes_since(0, entities=["Street"])
+
+    assert changes.changes == []
+    assert changes.version == feed.current_version()
+
+
+def test_pruned_range_is_reported_incomplete(engine):
+    feed = ChangeFeed(engine)
+    add_patients(engine, *range(1, 11))
+
+    assert feed.prune(keep=4) == 6
+    assert not feed.changes_since(2).complete
+    assert feed.changes_since(6).complete
+    assert [change.entity_id for change in feed.changes_since(6).changes] == [7, 8, 9, 10]
+    assert feed.prune(keep=100) == 0
+
+
+def test_cursor_first_poll_only_records_the_version(engine):
+    cursor = ChangeCursor(ChangeFeed(engine), entities=["Street", "Vehicle"])
+    add_patients(engine, 1)
+
+    assert cursor.poll() is None
+    assert cursor.poll().changes == []
+
+    with engine.begin() as connection:
+        connection.execute(insert(Street.__table__).values(road_name="High Street", town="Ashford"))
+        connection.execute(insert(Patient.__table__).values(patient_id=2))
+        connection.execute(insert(Vehicle.__table__).values(registration="AB12 CDE"))
+
+    changes = cursor.poll()
+    assert [change.entity for change in changes.changes] == ["Street", "Vehicle"]
+    assert cursor.poll().changes == []
@@ -0,0 +1,42 @@
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import pytest
+from PySide6.QtWidgets import QApplication
+from sqlalchemy import insert
+
+from src.database.change_log import ChangeCursor, ChangeFeed
+from src.database.models import Vehicle
+from src.ui.change_watcher import ChangeWatcher
+from src.ui.workers import get_task_runner
+
+
+@pytest.fixture
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def synchronous_runner(monkeypatch):
+    """Run submitted tasks inline, as a pool thread that wins the race would"""
+    runner = get_task_runner()
+    monkeypatch.setattr(runner.pool, "start", lambda task: task.run())
+    return runner
+
+
+def test_fast_poll_does_not_leave_the_watcher_stuck(app, engine, synchronous_runner):
+    watcher = ChangeWatcher(entities=["Vehicle"])
+    watcher.cursor = ChangeCursor(ChangeFeed(engine), ["Vehicle"])
+    seen = []
+    watcher.changed.connect(seen.append)
+
+    watcher.poll()
+    assert not watcher._polling
+
+    with engine.begin() as connection:
+        connection.execute(insert(Vehicle.__table__).values(id=7, registration="AB12 CDE"))
+    watcher.poll()
+
+    assert not watcher._polling
+    assert seen == [{"Vehicle": {7: "insert"}}]
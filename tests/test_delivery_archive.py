@@ -0,0 +1,91 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from src.database.delivery_counts import DeliveryCounts
+from src.database.models import Delivery, Patient
+from src.services.delivery_archive import DeliveryArchive
+
+DATES = [date(2019, 5, 1), date(2022, 3, 1), date(2022, 11, 30), date(2023, 6, 1), date(2024, 2, 1)]
+
+
+@pytest.fixture
+def archive(engine, tmp_path):
+    with engine.begin() as connection:
+        connection.execute(insert(Patient.__table__), [{"patient_id": 1}, {"patient_id": 2}])
+        connection.execute(insert(Delivery.__table__), [
+            {"patient_id": 1 + index % 2, "delivery_date": day, "van_number": 1, "status": "Delivered"}
+            for index, day in enumerate(DATES)
+        ])
+    return DeliveryArchive(engine, tmp_path / "archive")
+
+
+def live_dates(engine):
+    live = Delivery.__table__
+    with engine.connect() as connection:
+        return connection.execute(select(live.c.delivery_date).order_by(live.c.delivery_date)).scalars().all()
+
+
+def test_archive_moves_old_rows_into_yearly_files(engine, archive):
+    result = archive.archive(date(2024, 1, 1))
+
+    assert result.moved == {2019: 1, 2022: 2, 2023: 1}
+    assert result.total == 4
+    assert live_dates(engine) == [date(2024, 2, 1)]
+    # Years without deliveries, and the cutoff's own year, get no file
+    assert archive.years() == [2019, 2022, 2023]
+
+
+def test_archive_rerun_moves_nothing(engine, archive):
+    archive.archive(date(2024, 1, 1))
+
+    assert archive.archive(date(2024, 1, 1)).moved == {}
+    assert archive.archive(date(2019, 1, 1)).moved == {}
+    assert archive.years() == [2019, 2022, 2023]
+
+
+def test_archived_days_keep_their_counts(engine, archive):
+    archive.archive(date(2024, 1, 1))
+
+    summary = DeliveryCounts(engine).summary(date(2022, 1, 1), date(2022, 12, 31))
+
+    assert summary.total == 2
+    assert summary.by_van() == {1: 2}
+
+
+def test_deliveries_reads_across_live_table_and_archives(engine, archive):
+    archive.archive(date(2023, 1, 1))
+
+    with engine.connect() as connection:
+        deliveries = archive.deliveries(connection)
+        rows = connection.execute(
+            select(deliveries.c.delivery_date, deliveries.c.source).order_by(deliveries.c.delivery_date)
+        ).all()
+        counted = connection.execute(
+            select(func.count()).select_from(archive.deliveries(connection, date(2022, 6, 1), date(2023, 12, 31)))
+        ).scalar()
+
+    assert rows == [
+        (date(2019, 5, 1), 2019),
+        (date(2022, 3, 1), 2022),
+        (date(2022, 11, 30), 2022),
+        (date(2023, 6, 1), None),
+        (date(2024, 2, 1), None),
+    ]
+    assert counted == 2
+
+
+def test_patient_history_spans_archives(engine, archive):
+    archive.archive(date(2024, 1, 1))
+
+    history = archive.patient_history(1)
+
+    assert [(row.delivery_date, row.source) for row in history] == [
+        (date(2019, 5, 1), 2019),
+        (date(2022, 11, 30), 2022),
+        (date(2024, 2, 1), None),
+    ]
+    assert [row.delivery_date for row in archive.patient_history(2, start_date=date(2023, 1, 1))] == [
+        date(2023, 6, 1)
+    ]
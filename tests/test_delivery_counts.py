@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import insert
+
+from src.database.delivery_counts import DeliveryCounts
+from src.database.models import Delivery, Patient, Street
+from src.services.delivery_list import DeliveryListService
+from src.services.street_index import StreetIndex
+
+DAY = date(2024, 3, 4)
+
+
+@pytest.fixture
+def streets(engine, session_factory):
+    with engine.begin() as connection:
+        connection.execute(insert(Street.__table__), [
+            {"id": 1, "road_name": "High Street", "town": "Ashford", "route_order": 1,
+             "van_3_assignment": 1, "van_4_assignment": 4},
+            {"id": 2, "road_name": "Low Road", "town": "Ashford", "route_order": 2,
+             "van_3_assignment": 2, "van_4_assignment": 3},
+        ])
+        connection.execute(insert(Patient.__table__), [
+            {"patient_id": 1, "house_number": "10", "street_name": "High Street", "town": "Ashford"},
+            {"patient_id": 2, "house_number": "9", "street_name": "high st", "town": "Ashford"},
+            {"patient_id": 3, "house_number": "2A", "street_name": "Low Road", "town": "Ashford"},
+            {"patient_id": 4, "house_number": "1", "street_name": "Nowhere Lane", "town": "Ashford"},
+            {"patient_id": 5, "house_number": "2", "street_name": "High Street", "town": "Ashford"},
+        ])
+        connection.execute(insert(Delivery.__table__), [
+            {"patient_id": patient_id, "delivery_date": DAY, "status": status, "van_number": van}
+            for patient_id, status, van in [
+                (1, "Pending", None), (2, "Pending", None), (3, "Pending", None),
+                (3, "Delivered", 2), (4, "Pending", None), (5, "Pending", None),
+            ]
+        ])
+    return StreetIndex(session_factory)
+
+
+def test_stored_vans_only_without_a_fleet_size(engine, streets):
+    summary = DeliveryCounts(engine, streets).summary(DAY)
+
+    assert summary.by_van() == {0: 5, 2: 1}
+    assert summary.by_status() == {"Delivered": 1, "Pending": 5}
+
+
+@pytest.mark.parametrize("van_count", [3, 4])
+def test_unassigned_deliveries_counted_on_their_list_van(engine, session_factory, streets, van_count):
+    entries = DeliveryListService(session_factory, streets).generate(DAY, van_count)
+    listed = {}
+    for entry in entries:
+        van = entry.van_number if entry.van_number is not None else 0
+        listed[van] = listed.get(van, 0) + 1
+
+    summary = DeliveryCounts(engine, streets).summary(DAY, van_count=van_count)
+
+    assert summary.by_van() == dict(sorted(listed.items()))
+    assert summary.total == 6
+
+
+def test_list_orders_by_van_route_and_house_number(session_factory, streets):
+    entries = DeliveryListService(session_factory, streets).generate(DAY, 3)
+
+    assert [entry.van_number for entry in entries] == [1, 1, 1, 2, 2, None]
+    # Numerically, not as text
+    assert [entry.house_number for entry in entries if entry.street_name == "High Street"] == ["2", "10"]
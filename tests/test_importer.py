@@ -0,0 +1,134 @@
+from sqlalchemy import func, select
+
+import pytest
+
+from src.database.models import Patient, Street
+from src.import_service.importer import StreamingImporter
+from src.import_service.incremental import IncrementalImporter
+
+PATIENT_HEADING = ["Patient No", "House No", "Street", "Town"]
+
+
+class Interrupted(Exception):
+    pass
+
+
+def patient_rows(count, start=1):
+    return [[number, str(number), "High Street", "Ashford"] for number in range(start, start + count)]
+
+
+def count_rows(session_factory, model):
+    with session_factory() as session:
+        return session.scalar(select(func.count()).select_from(model))
+
+
+def test_import_reports_duplicates_without_aborting(session_factory, write_csv):
+    path = write_csv("patients.csv", [PATIENT_HEADING, *patient_rows(3), [2, "9", "Low Road", "Ashford"]])
+
+    result = StreamingImporter(session_factory, batch_size=2).import_file(path)
+
+    assert result.rows_read == 4
+    assert result.rows_written == 3
+    assert result.rows_skipped == 1
+    assert result.errors == [(5, "patients (2,) already exists")]
+    with session_factory() as session:
+        # The first occurrence wins
+        assert session.get(Patient, 2).street_name == "High Street"
+
+
+def test_reimport_skips_rows_already_in_the_table(session_factory, write_csv):
+    path = write_csv("patients.csv", [PATIENT_HEADING, *patient_rows(3)])
+    StreamingImporter(session_factory).import_file(path)
+
+    result = StreamingImporter(session_factory).import_file(path)
+
+    assert result.resumed_from == 0
+    assert result.rows_written == 0
+    assert result.rows_skipped == 3
+    assert count_rows(session_factory, Patient) == 3
+
+
+def test_bad_rows_are_reported_and_skipped(session_factory, write_csv):
+    path = write_csv("patients.csv", [PATIENT_HEADING, [1, "1", "A Road", "Ashford"], ["x", "2", "B Road", "Ashford"]])
+
+    result = StreamingImporter(session_factory).import_file(path)
+
+    assert result.rows_written == 1
+    assert result.errors == [(3, "patient_id: expected a whole number, got 'x'")]
+
+
+def test_interrupted_import_resumes_after_last_batch(session_factory, write_csv):
+    path = write_csv("patients.csv", [PATIENT_HEADING, *patient_rows(10)])
+
+    def stop_after_first_batch(progress):
+        raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        StreamingImporter(session_factory, batch_size=4, progress_callback=stop_after_first_batch).import_file(path)
+    assert count_rows(session_factory, Patient) == 4
+
+    result = StreamingImporter(session_factory, batch_size=4).import_file(path)
+
+    assert result.resumed_from == 4
+    assert result.rows_written == 6
+    assert result.errors == []
+    assert count_rows(session_factory, Patient) == 10
+
+
+def test_changed_file_does_not_resume(session_factory, write_csv):
+    path = write_csv("patients.csv", [PATIENT_HEADING, *patient_rows(6)])
+
+    def stop(progress):
+        raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        StreamingImporter(session_factory, batch_size=2, progress_callback=stop).import_file(path)
+
+    write_csv("patients.csv", [PATIENT_HEADING, *patient_rows(8)])
+    result = StreamingImporter(session_factory, batch_size=2).import_file(path)
+
+    assert result.resumed_from == 0
+    assert result.rows_written == 6
+    assert count_rows(session_factory, Patient) == 8
+
+
+def test_incremental_import_applies_only_the_differences(session_factory, write_csv):
+    path = write_csv("patients.csv", [PATIENT_HEADING, *patient_rows(4)])
+    StreamingImporter(session_factory).import_file(path)
+
+    path = write_csv("patients.csv", [
+        PATIENT_HEADING,
+        [1, "1", "High Street", "Ashford"],
+        [2, "2A", "High Street", "Ashford"],
+        [3, "3", "High Street", "Ashford"],
+        [5, "5", "Low Road", "Ashford"],
+        [5, "5", "Low Road", "Ashford"],
+    ])
+    result = IncrementalImporter(session_factory=session_factory).import_file(path)
+
+    assert (result.added, result.changed, result.unchanged, result.removed) == (1, 1, 2, 1)
+    assert result.duplicates == 1
+    assert result.errors == [(6, "duplicate key (5,)")]
+    with session_factory() as session:
+        assert session.get(Patient, 2).house_number == "2A"
+        assert session.get(Patient, 5).street_name == "Low Road"
+        # Missing rows are only counted unless delete_missing is set
+        assert session.get(Patient, 4) is not None
+
+
+def test_incremental_import_deletes_missing_rows_when_asked(session_factory, write_csv):
+    heading = ["Road", "Town", "Route", "Van 3", "Van 4"]
+    path = write_csv("streets.csv", [heading, ["High Street", "Ashford", 1, 1, 1], ["Low Road", "Ashford", 2, 2, 2]])
+    StreamingImporter(session_factory).import_file(path, "streets")
+    with session_factory() as session:
+        high_street_id = session.scalar(select(Street.id).where(Street.road_name == "High Street"))
+
+    path = write_csv("streets.csv", [heading, ["High Street", "Ashford", 1, 3, 4]])
+    result = IncrementalImporter(delete_missing=True, session_factory=session_factory).import_file(path, "streets")
+
+    assert (result.added, result.changed, result.removed) == (0, 1, 1)
+    with session_factory() as session:
+        streets = session.scalars(select(Street)).all()
+        assert [(street.id, street.van_3_assignment, street.van_4_assignment) for street in streets] == [
+            (high_street_id, 3, 4)
+        ]
@@ -0,0 +1,190 @@
+import csv
+import socket
+from datetime import date
+
+import pytest
+from sqlalchemy import insert, update
+
+from src.database.database import session_scope
+from src.database.models import Delivery, Patient, Street
+from src.services.delivery_export import DeliveryExporter
+from src.services.delivery_list import DeliveryListService
+from src.services.street_index import StreetIndex
+from src.sync.client import RemoteDeliveryListService, SyncClient, SyncError
+from src.sync.server import MAX_PAGE_SIZE, SyncServer
+
+TOKEN = "test-token"
+MONDAY, TUESDAY = date(2024, 3, 4), date(2024, 3, 5)
+
+
+@pytest.fixture
+def server(engine):
+    with engine.begin() as connection:
+        connection.execute(insert(Street.__table__), [
+            {"id": 1, "road_name": "High Street", "town": "Ashford", "route_order": 2,
+             "van_3_assignment": 1, "van_4_assignment": 4},
+            {"id": 2, "road_name": "Low Road", "town": "Ashford", "route_order": 1,
+             "van_3_assignment": 2, "van_4_assignment": 3},
+        ])
+        connection.execute(insert(Patient.__table__), [
+            # Only matches its street once the address is normalised
+            {"patient_id": 1, "house_number": "4", "street_name": "high st", "town": "Ashford"},
+            {"patient_id": 2, "house_number": "10", "street_name": "Low Road", "town": "Ashford"},
+        ])
+        connection.execute(insert(Delivery.__table__), [
+            {"id": 1, "patient_id": 1, "delivery_date": MONDAY, "status": "Pending"},
+            {"id": 2, "patient_id": 2, "delivery_date": MONDAY, "status": "Pending"},
+            {"id": 3, "patient_id": 1, "delivery_date": TUESDAY, "status": "Pending"},
+        ])
+    server = SyncServer(engine, port=0, token=TOKEN).start_in_thread()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(server):
+    with SyncClient(server.url, token=TOKEN) as client:
+        yield client
+
+
+def raw_request(server, request):
+    with socket.create_connection((server.host, server.port), timeout=5) as connection:
+        connection.sendall(request.encode("latin-1"))
+        return connection.recv(65536).decode("latin-1")
+
+
+def test_requests_without_the_token_are_refused(server):
+    with SyncClient(server.url, token="wrong") as client:
+        with pytest.raises(SyncError) as error:
+            client.rows("patients")
+    assert error.value.status == 401
+
+
+def test_server_needs_a_token_off_loopback(engine):
+    with pytest.raises(ValueError):
+        SyncServer(engine, host="0.0.0.0")
+
+
+def test_unchanged_responses_are_revalidated(client):
+    first = client.rows("patients")
+    second = client.rows("patients")
+
+    assert first == second
+    assert [row["patient_id"] for row in first] == [1, 2]
+    assert client.not_modified == 1
+
+
+def test_rows_are_paged(client):
+    page = client.get("/api/deliveries", limit=2)
+
+    assert [row["id"] for row in page["items"]] == [1, 2]
+    assert page["next"] == 2
+    assert [row["id"] for row in client.rows("deliveries", page_size=1)] == [1, 2, 3]
+    assert [row["id"] for row in client.rows("deliveries", date=TUESDAY.isoformat())] == [3]
+    assert [row["id"] for row in client.rows_by_id("deliveries", [3, 1])] == [1, 3]
+
+
+@pytest.mark.parametrize("path", ["/api/patients", "/api/changes", "/api/search"])
+def test_limit_below_one_is_rejected(client, path):
+    with pytest.raises(SyncError) as error:
+        client.get(path, limit=0)
+    assert error.value.status == 400
+
+
+def test_limit_is_capped(client):
+    assert len(client.get("/api/changes", limit=MAX_PAGE_SIZE * 10)["items"]) <= MAX_PAGE_SIZE
+
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_invalid_content_length_is_rejected(server, length):
+    response = raw_request(
+        server,
+        f"PATCH /api/deliveries/1 HTTP/1.1\r\nAuthorization: Bearer {TOKEN}\r\n"
+        f"Content-Length: {length}\r\n\r\n"
+    )
+    assert response.startswith("HTTP/1.1 400")
+    assert "Invalid Content-Length" in response
+
+
+@pytest.mark.parametrize("fields", [
+    {"van_number": "2"},
+    {"van_number": True},
+    {"route_order": 1.5},
+    {"status": 5},
+    {"patient_id": 2},
+])
+def test_patch_checks_field_types(client, fields):
+    with pytest.raises(SyncError) as error:
+        client.update_delivery(1, **fields)
+    assert error.value.status == 400
+
+
+def test_patch_updates_the_delivery_and_the_list(client):
+    assert client.delivery_list(MONDAY)[0].van_number == 1
+
+    row = client.update_delivery(1, van_number=3, notes=None)
+
+    assert row["van_number"] == 3
+    assert {entry.delivery_id: entry.van_number for entry in client.delivery_list(MONDAY)}[1] == 3
+    with pytest.raises(SyncError) as error:
+        client.update_delivery(99, status="Delivered")
+    assert error.value.status == 404
+
+
+def test_delivery_list_uses_the_served_database_streets(client):
+    # A street of the same name in the application's own database must
+    # not be what the server resolves against
+    with session_scope() as session:
+        session.add(Street(road_name="High Street", town="Ashford", route_order=1,
+                           van_3_assignment=9, van_4_assignment=9))
+
+    entries = client.delivery_list(MONDAY)
+    assert [(entry.delivery_id, entry.street_id, entry.van_number) for entry in entries] == [
+        (1, 1, 1), (2, 2, 2)
+    ]
+    assert [entry.van_number for entry in client.delivery_list(MONDAY, van_count=4)] == [3, 4]
+
+
+def test_street_edits_reach_the_delivery_list(engine, client):
+    assert client.delivery_list(MONDAY)[0].van_number == 1
+
+    streets = Street.__table__
+    with engine.begin() as connection:
+        connection.execute(update(streets).where(streets.c.id == 1).values(van_3_assignment=5))
+
+    assert {entry.delivery_id: entry.van_number for entry in client.delivery_list(MONDAY)}[1] == 5
+
+
+def test_delivery_list_rejects_unknown_fleet_size(client):
+    with pytest.raises(SyncError) as error:
+        client.delivery_list(MONDAY, van_count=7)
+    assert error.value.status == 400
+
+
+def test_delivery_days(client):
+    assert client.delivery_days(date(2024, 3, 1), date(2024, 3, 31)) == [MONDAY, TUESDAY]
+    assert client.delivery_days(TUESDAY, TUESDAY) == [TUESDAY]
+    assert client.delivery_days(date(2024, 4, 1), date(2024, 4, 30)) == []
+
+
+def test_remote_export_matches_local_export(engine, session_factory, client, tmp_path):
+    remote = DeliveryExporter(RemoteDeliveryListService(client)).export(
+        tmp_path / "remote.csv", MONDAY, TUESDAY
+    )
+    local = DeliveryExporter(DeliveryListService(session_factory, StreetIndex(session_factory))).export(
+        tmp_path / "local.csv", MONDAY, TUESDAY
+    )
+
+    assert (remote.days, remote.rows) == (2, 3)
+    # The same rows; a local export streams each day and leaves rows that
+    # only match a street once normalised where the query put them
+    with open(remote.path, newline="") as remote_file, open(local.path, newline="") as local_file:
+        assert sorted(csv.reader(remote_file)) == sorted(csv.reader(local_file))
+
+
+def test_changes_endpoint(client):
+    changes = client.changes_since(0)
+
+    assert changes.complete
+    assert len(changes.changes) == 7
+    assert client.changes_since(changes.version).changes == []